@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Btime 养生堂/卫视 爬虫共用的持久化月度缓存
+#
+# infoFlow 接口按 list_id + 年 + 月 分页，已经结束的月份内容不会再变化，
+# 所以按月存到本地 SQLite（namespace 区分各爬虫不同的视频记录格式）：
+#   - 已结束的月份（且是在月末之后抓取的、非空的结果）永久有效
+#   - 当前月份 / 空结果 只在 ttl 秒内有效，过期后重新抓取
+# 需要与爬虫文件放在同一目录。
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+
+BEIJING = timezone(timedelta(hours=8))
+
+DEFAULT_PATH = os.environ.get(
+    'BTIME_CACHE_PATH',
+    os.path.join(tempfile.gettempdir(), 'btime_cache.sqlite3'))
+
+
+def month_end(year, month):
+    """返回该月结束（下月1日 0 点，北京时间）的时间戳"""
+    if month == 12:
+        year, month = year + 1, 1
+    else:
+        month += 1
+    return datetime(year, month, 1, tzinfo=BEIJING).timestamp()
+
+
+class MonthCache:
+    """namespace/list_id/year/month → 视频列表 的持久化缓存，可在多个线程中共用"""
+
+    def __init__(self, namespace, path=None, ttl=1800):
+        self.namespace = namespace
+        self.path = path or DEFAULT_PATH
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = None
+        try:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS months ('
+                ' namespace TEXT NOT NULL,'
+                ' list_id TEXT NOT NULL,'
+                ' year INTEGER NOT NULL,'
+                ' month INTEGER NOT NULL,'
+                ' fetched_at REAL NOT NULL,'
+                ' videos TEXT NOT NULL,'
+                ' PRIMARY KEY (namespace, list_id, year, month))')
+            self._conn.commit()
+        except sqlite3.Error as e:
+            # 缓存不可用时退化为不缓存，不影响爬虫本身
+            print(f"[MonthCache] 无法打开缓存 {self.path}: {e}")
+            self._conn = None
+
+    def is_fresh(self, year, month, fetched_at, count, now=None):
+        """已结束月份的完整结果永久有效，其余按 ttl 判断"""
+        now = time.time() if now is None else now
+        end = month_end(year, month)
+        if count and now >= end and fetched_at >= end:
+            return True
+        return now - fetched_at < self.ttl
+
+    def get(self, list_id, year, month, stale_ok=False):
+        """命中且未过期时返回视频列表，否则返回 None；stale_ok 时忽略过期"""
+        if self._conn is None:
+            return None
+        year, month = int(year), int(month)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT fetched_at, videos FROM months'
+                ' WHERE namespace = ? AND list_id = ? AND year = ? AND month = ?',
+                (self.namespace, list_id, year, month)).fetchone()
+        if row is None:
+            return None
+        fetched_at, payload = row
+        try:
+            videos = json.loads(payload)
+        except ValueError:
+            return None
+        if not stale_ok and not self.is_fresh(year, month, fetched_at, len(videos)):
+            return None
+        return videos
+
+    def put(self, list_id, year, month, videos):
+        """写入（覆盖）某个月的视频列表"""
+        if self._conn is None:
+            return
+        payload = json.dumps(videos, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            try:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO months'
+                    ' (namespace, list_id, year, month, fetched_at, videos)'
+                    ' VALUES (?, ?, ?, ?, ?, ?)',
+                    (self.namespace, list_id, int(year), int(month), time.time(), payload))
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"[MonthCache] 写入失败 {list_id} {year}-{month}: {e}")
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+            self._conn = None
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Btime 爬虫共用的单条视频页解析
+#
+# vod_id 索引未命中时（例如重启后还没抓过对应月份），直接请求
+# https://item.btime.com/{gid}，从 og:title / og:image / og:description
+# 还原出视频记录。vod_remarks / vod_year 留空，由各爬虫按自己的格式补全。
+# 需要与爬虫文件放在同一目录。
+
+from bs4 import BeautifulSoup
+
+ITEM_URL = 'https://item.btime.com/{gid}'
+
+
+def fetch_video_item(session, gid, headers=None, timeout=10):
+    """请求并解析单条视频页，返回视频记录；失败或页面无标题时返回 None"""
+    if not gid:
+        return None
+
+    url = ITEM_URL.format(gid=gid)
+    try:
+        response = session.get(url, headers=headers, timeout=timeout)
+        response.raise_for_status()
+    except Exception as e:
+        print(f"Error fetching item {gid}: {e}")
+        return None
+
+    soup = BeautifulSoup(response.text, 'html.parser')
+
+    def meta(*names):
+        for name in names:
+            tag = soup.find('meta', attrs={'property': name}) or soup.find('meta', attrs={'name': name})
+            if tag and tag.get('content'):
+                return tag['content'].strip()
+        return ''
+
+    title = meta('og:title')
+    if not title and soup.title and soup.title.string:
+        title = soup.title.string.strip()
+    if not title:
+        return None
+
+    return {
+        'vod_id': gid,
+        'vod_name': title,
+        'vod_pic': meta('og:image'),
+        'vod_url': url,
+        'vod_content': meta('og:description', 'description'),
+        'vod_remarks': '',
+        'vod_year': ''
+    }
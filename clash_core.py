@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""Measure per-proxy latency through a local mihomo/clash core.
+
+ClashCore starts the core binary against a copy of the fetched config, with its
+own external-controller port and secret and without the rules section. It then
+asks the core itself to test each proxy via GET /proxies/{name}/delay. Unlike
+clash_latency.http_probe, every node gets its own measurement.
+
+StubCore serves the same controller API from an in-process HTTP server with
+fixed delays. It lets the updater and the tester run without a core binary or
+network access.
+
+Both expose `probe(node, url, timeout)`, so they plug into LatencyTester:
+
+    with ClashCore(config_data, binary='mihomo') as core:
+        ranking = LatencyTester(probe=core.probe).run(node_urls)
+"""
+
+import json
+import os
+import secrets
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlsplit, parse_qs
+
+import requests
+import yaml
+from requests.adapters import HTTPAdapter
+
+# Top-level keys that would make the test core listen on public ports or
+# capture traffic on the runner
+_LISTENER_KEYS = ('port', 'socks-port', 'redir-port', 'tproxy-port', 'mixed-port',
+                  'tun', 'dns', 'listeners', 'external-ui', 'rule-providers')
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def probe_config(config_data, controller, secret):
+    """Copy of the config trimmed down for delay testing only"""
+    config = {key: value for key, value in config_data.items()
+              if key not in _LISTENER_KEYS}
+    config.update({
+        'allow-lan': False,
+        'mode': 'rule',
+        'log-level': 'warning',
+        'geo-auto-update': False,
+        'external-controller': controller,
+        'secret': secret,
+        # Rules are irrelevant to /delay and GEOIP rules would pull geodata at startup
+        'rules': ['MATCH,DIRECT'],
+    })
+    return config
+
+
+class CoreController:
+    """Client for the external-controller delay API"""
+
+    def __init__(self, controller, secret='', pool_size=32):
+        self.controller = controller
+        self.secret = secret
+        self.session = requests.Session()
+        # One keep-alive connection per concurrent probe
+        self.session.mount('http://', HTTPAdapter(pool_maxsize=pool_size))
+        if secret:
+            self.session.headers['Authorization'] = f'Bearer {secret}'
+
+    @property
+    def base_url(self):
+        return f'http://{self.controller}'
+
+    def wait_ready(self, timeout=15):
+        """Poll /version until the controller answers"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                if self.session.get(f'{self.base_url}/version', timeout=1).ok:
+                    return True
+            except requests.exceptions.RequestException:
+                pass
+            time.sleep(0.2)
+        return False
+
+    def delay(self, name, url, timeout):
+        """Delay in ms measured by the core, or None on timeout/error"""
+        try:
+            response = self.session.get(
+                f"{self.base_url}/proxies/{quote(name, safe='')}/delay",
+                params={'url': url, 'timeout': int(timeout * 1000)},
+                # The core waits up to `timeout` for the proxy, allow for that
+                timeout=timeout + 5)
+        except requests.exceptions.RequestException as e:
+            print(f"Controller error testing {name} to {url}: {e}")
+            return None
+        if response.status_code != 200:
+            try:
+                message = response.json().get('message', '')
+            except ValueError:
+                message = response.text
+            print(f"Delay test failed for {name} to {url}: {response.status_code} {message}")
+            return None
+        return response.json().get('delay')
+
+    def probe(self, node, url, timeout):
+        """LatencyTester probe"""
+        return self.delay(node, url, timeout)
+
+    def close(self):
+        self.session.close()
+
+
+class ClashCore(CoreController):
+    """A mihomo/clash core subprocess started for the duration of a `with` block"""
+
+    def __init__(self, config_data, binary=None, startup_timeout=15):
+        super().__init__(f'127.0.0.1:{free_port()}', secrets.token_hex(16))
+        self.binary = binary or os.environ.get('CLASH_CORE_BIN', 'mihomo')
+        self.config = probe_config(config_data, self.controller, self.secret)
+        self.startup_timeout = startup_timeout
+        self.workdir = None
+        self.process = None
+
+    @staticmethod
+    def available(binary=None):
+        return shutil.which(binary or os.environ.get('CLASH_CORE_BIN', 'mihomo')) is not None
+
+    def start(self):
+        self.workdir = tempfile.mkdtemp(prefix='clash-core-')
+        config_path = os.path.join(self.workdir, 'config.yaml')
+        with open(config_path, 'w', encoding='utf-8') as f:
+            yaml.safe_dump(self.config, f, allow_unicode=True, sort_keys=False)
+
+        print(f"Starting {self.binary} with controller {self.controller}...")
+        self.process = subprocess.Popen(
+            [self.binary, '-d', self.workdir, '-f', config_path],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if not self.wait_ready(self.startup_timeout):
+            error = ''
+            if self.process.poll() is not None:
+                error = self.process.stderr.read().decode('utf-8', 'replace')
+            self.stop()
+            raise RuntimeError(f"Clash core did not start: {error.strip()}")
+        return self
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process.stderr.close()
+            self.process = None
+        if self.workdir is not None:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+            self.workdir = None
+        self.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _StubServer(ThreadingHTTPServer):
+    # Accept a full round of concurrent probes without SYN retries
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class StubCore(CoreController):
+    """In-process stand-in for the core's controller API.
+
+    `delays` maps proxy name to a delay in ms, or None for a proxy that times
+    out. Names not in `delays` get 404, like an unknown proxy on a real core.
+    With `sleep=True` each request also sleeps for its delay.
+    """
+
+    def __init__(self, delays, secret='', sleep=False):
+        self.delays = dict(delays)
+        self.sleep = sleep
+        self.requests = []
+        self._server = _StubServer(('127.0.0.1', 0), self._handler())
+        self._thread = None
+        host, port = self._server.server_address
+        super().__init__(f'{host}:{port}', secret)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body):
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                if stub.secret and self.headers.get('Authorization') != f'Bearer {stub.secret}':
+                    return self._reply(401, {'message': 'Unauthorized'})
+                parts = urlsplit(self.path)
+                if parts.path == '/version':
+                    return self._reply(200, {'version': 'stub', 'meta': True})
+
+                segments = parts.path.strip('/').split('/')
+                if len(segments) != 3 or segments[0] != 'proxies' or segments[2] != 'delay':
+                    return self._reply(404, {'message': 'Resource not found'})
+                name = unquote(segments[1])
+                query = parse_qs(parts.query)
+                stub.requests.append((name, query.get('url', [''])[0]))
+                if name not in stub.delays:
+                    return self._reply(404, {'message': 'Resource not found'})
+                delay = stub.delays[name]
+                if delay is None:
+                    return self._reply(504, {'message': 'Timeout'})
+                if stub.sleep:
+                    time.sleep(delay / 1000)
+                return self._reply(200, {'delay': delay})
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='stub-core', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""Concurrent proxy latency tester used by update_clash_config.py.
+
+Every (node, test URL) pair is probed in parallel on a thread pool. Each pair
+is sampled up to `samples` times. Nodes are ranked by a median/p90 score, with
+failed probes counted as packet loss. Sampling runs in rounds. After each
+round, dead nodes and nodes that clearly cannot win are dropped. Testing stops
+when one candidate is left, or when the leader's slowest sample beats every
+other candidate's fastest sample.
+
+A probe is any callable `probe(node, url, timeout)` that returns the latency
+in ms, or None when the request failed.
+"""
+
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def http_probe(node, url, timeout):
+    """Times a direct GET from this machine.
+
+    This does not route through `node`. It only measures the runner's own
+    path to the test URL, which is what the workflow always did.
+    """
+    start_time = time.time()
+    try:
+        response = requests.get(url, timeout=timeout)
+    except requests.exceptions.RequestException as e:
+        print(f"Error testing {node} to {url}: {e}")
+        return None
+    if 200 <= response.status_code < 300:
+        return (time.time() - start_time) * 1000
+    print(f"Unexpected status code {response.status_code} for {node} to {url}")
+    return None
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of a non-empty list."""
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * pct / 100
+    low = math.floor(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class NodeStats:
+    """Latency samples collected for one node."""
+
+    __slots__ = ('node', 'latencies', 'failures')
+
+    def __init__(self, node):
+        self.node = node
+        self.latencies = []
+        self.failures = 0
+
+    def add(self, latency):
+        if latency is None:
+            self.failures += 1
+        else:
+            self.latencies.append(latency)
+
+    @property
+    def attempts(self):
+        return len(self.latencies) + self.failures
+
+    @property
+    def alive(self):
+        return bool(self.latencies)
+
+    @property
+    def loss(self):
+        return self.failures / self.attempts if self.attempts else 1.0
+
+    @property
+    def median(self):
+        return percentile(self.latencies, 50) if self.latencies else float('inf')
+
+    @property
+    def p90(self):
+        return percentile(self.latencies, 90) if self.latencies else float('inf')
+
+    @property
+    def score(self):
+        """Mean of median and p90, scaled up by the loss ratio (lower is better)."""
+        if not self.latencies:
+            return float('inf')
+        return (self.median + self.p90) / 2 * (1 + self.loss)
+
+    def __repr__(self):
+        return (f"NodeStats({self.node!r}, median={self.median:.1f}, "
+                f"p90={self.p90:.1f}, loss={self.loss:.0%})")
+
+
+class LatencyTester:
+    """Probe node x URL pairs concurrently and rank the nodes.
+
+    `samples`: maximum rounds per (node, URL) pair.
+    `margin`: after a round, a node is dropped once its best sample is slower
+    than the leader's score times (1 + margin).
+    `min_rounds`: rounds to run before a clear winner can end the test.
+    """
+
+    def __init__(self, probe=http_probe, timeout=5, samples=3, max_workers=32,
+                 margin=0.25, min_rounds=2):
+        self.probe = probe
+        self.timeout = timeout
+        self.samples = samples
+        self.max_workers = max_workers
+        self.margin = margin
+        self.min_rounds = min_rounds
+
+    def _prune(self, stats, candidates):
+        """Keep live nodes that can still beat the current leader."""
+        alive = [node for node in candidates if stats[node].alive]
+        if not alive:
+            return []
+        leader = min(alive, key=lambda node: stats[node].score)
+        cutoff = stats[leader].score * (1 + self.margin)
+        return [node for node in alive
+                if node == leader or min(stats[node].latencies) <= cutoff]
+
+    @staticmethod
+    def _clear_winner(stats, candidates):
+        """True when the leader's slowest sample beats everyone else's fastest."""
+        ordered = sorted(candidates, key=lambda node: stats[node].score)
+        leader, others = ordered[0], ordered[1:]
+        worst = max(stats[leader].latencies)
+        return all(worst < min(stats[node].latencies) for node in others)
+
+    def run(self, node_urls):
+        """Test {node: [url, ...]}, returning NodeStats sorted best first."""
+        stats = {node: NodeStats(node) for node in node_urls}
+        candidates = list(node_urls)
+        workers = max(1, min(self.max_workers,
+                             sum(len(urls) for urls in node_urls.values())))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for round_no in range(1, self.samples + 1):
+                jobs = [(node, url) for node in candidates for url in node_urls[node]]
+                results = executor.map(
+                    lambda job: self.probe(job[0], job[1], self.timeout), jobs)
+                for (node, url), latency in zip(jobs, results):
+                    stats[node].add(latency)
+
+                candidates = self._prune(stats, candidates)
+                print(f"Round {round_no}: {len(jobs)} probes, "
+                      f"{len(candidates)} candidate(s) left")
+                if len(candidates) <= 1:
+                    break
+                if round_no >= self.min_rounds and self._clear_winner(stats, candidates):
+                    print("Clear winner found, stopping early")
+                    break
+
+        return sorted(stats.values(),
+                      key=lambda s: (s.score, s.median, s.node))
+
+    def fastest(self, node_urls):
+        """Return (node, NodeStats) for the best node, or (None, None) if all failed."""
+        ranking = self.run(node_urls)
+        if not ranking or not ranking[0].alive:
+            return None, None
+        return ranking[0].node, ranking[0]
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""Classify proxy and group names by region with a single compiled regex.
+
+Each region has a list of keywords:
+- Flags, and names in English or Chinese, match anywhere in the name and
+  ignore case.
+- Short codes such as SG or US match in any case, but only as a word of
+  their own: no letter may come right before or after them. "akile-us4837"
+  and "SG-L" match, while "RUSSIA", "AUS", "plus", "NETWORK" and "TWITTER"
+  do not.
+- PREFIXES lists upper-case prefixes that node names run into other letters,
+  such as "SGG193", "SSGLXCC" or "USS-2ISP". They match at the start of a
+  word, whatever follows. They are the current node names of the cll2.yml
+  provider: if it renames its nodes, those nodes stop being classified.
+  tests/test_clash_regions.py fails when a prefix no longer matches any node
+  of the checked-in cll2.yml, and update_clash_config.py takes replacements
+  from REGION_PREFIXES (see parse_prefixes()).
+
+All keywords are compiled into one alternation with a named group per
+region. classify() is therefore a single regex search, and classify_all()
+a single pass over the names.
+
+    python clash_regions.py cll2.yml
+"""
+
+import re
+import sys
+
+REGIONS = {
+    'SG': ['sg', 'singapore', '新加坡', '狮城', '🇸🇬'],
+    'HK': ['hk', 'hong kong', 'hongkong', '香港', '🇭🇰'],
+    'TW': ['tw', 'taiwan', '台湾', '臺灣', '台北', '🇹🇼'],
+    'JP': ['jp', 'japan', 'tokyo', 'osaka', '日本', '东京', '大阪', '🇯🇵'],
+    'US': ['us', 'usa', 'united states', 'america', 'los angeles', 'san jose',
+           '美国', '洛杉矶', '硅谷', '🇺🇸'],
+    'KR': ['kr', 'korea', 'seoul', '韩国', '首尔', '🇰🇷'],
+}
+
+# Case-sensitive, matched at the start of a word even when letters follow
+PREFIXES = {
+    'SG': ['SG', 'SSG'],
+    'HK': ['HKK', 'HKHEN'],
+    'US': ['USS'],
+}
+
+
+def parse_prefixes(text, prefixes=PREFIXES):
+    """PREFIXES with regions replaced by "REGION=PREFIX,PREFIX" items, one per
+    line or separated by ';', e.g. "HK=HKK,HKHEN; US=USS". "REGION=" clears one."""
+    prefixes = {code: list(values) for code, values in prefixes.items()}
+    for item in text.replace(';', '\n').splitlines():
+        code, sep, values = item.partition('=')
+        if sep and code.strip():
+            prefixes[code.strip().upper()] = [v.strip() for v in values.split(',') if v.strip()]
+    return prefixes
+
+
+def _keyword_pattern(keyword):
+    if len(keyword) <= 3 and keyword.isascii() and keyword.isalpha():
+        return f'(?<![A-Za-z])(?i:{re.escape(keyword)})(?![A-Za-z])'
+    return f'(?i:{re.escape(keyword)})'
+
+
+def _prefix_pattern(prefix):
+    return f'(?<![A-Za-z]){re.escape(prefix)}'
+
+
+class RegionClassifier:
+    """Maps names to region codes"""
+
+    def __init__(self, regions=REGIONS, prefixes=PREFIXES):
+        self.regions = list(regions)
+        # Longer keywords first so "usa" is tried before "us"
+        self.pattern = re.compile('|'.join(
+            f'(?P<{code}>' + '|'.join(
+                [_keyword_pattern(k) for k in sorted(keywords, key=len, reverse=True)] +
+                [_prefix_pattern(p) for p in prefixes.get(code, ())]) + ')'
+            for code, keywords in regions.items()))
+
+    def classify(self, name):
+        """Region code of the leftmost keyword in `name`, or None"""
+        m = self.pattern.search(name)
+        return m.lastgroup if m else None
+
+    def classify_all(self, names, regions=None):
+        """{region: [name, ...]} for the given regions (default: all), in order"""
+        wanted = self.regions if regions is None else list(regions)
+        result = {code: [] for code in wanted}
+        for name in names:
+            code = self.classify(name)
+            if code in result:
+                result[code].append(name)
+        return result
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print(f'Usage: {sys.argv[0]} CONFIG')
+        sys.exit(1)
+    from clash_yaml import load_sections
+
+    with open(sys.argv[1], 'rb') as f:
+        sections = load_sections(f.read(), ('proxies', 'proxy-groups'))
+    names = [p['name'] for p in sections.get('proxies') or []]
+    names += [g['name'] for g in sections.get('proxy-groups') or []]
+    for code, members in RegionClassifier().classify_all(names).items():
+        print(f"{code}: {len(members)} {', '.join(members)}")
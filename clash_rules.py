@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""Parse, merge and match Clash rule lists.
+
+Clash evaluates rules top to bottom and stops at the first match. So when
+clashrules.txt is put in front of a config's own rules, any later rule that
+an earlier one already covers can never fire. A RuleSet is built in priority
+order and drops such rules as they are added:
+
+- duplicates: same type, payload and options, whatever the target (for
+  IP rules only no-resolve counts, as below);
+- DOMAIN x, when an earlier DOMAIN x, DOMAIN-SUFFIX of x or DOMAIN-KEYWORD
+  contained in x exists;
+- DOMAIN-SUFFIX s, when an earlier DOMAIN-SUFFIX of s or DOMAIN-KEYWORD
+  contained in s exists;
+- DOMAIN-KEYWORD k, when an earlier keyword contained in k exists;
+- IP-CIDR / IP-CIDR6 inside an earlier network, unless only the earlier
+  rule has no-resolve;
+- anything after MATCH.
+
+Other rule types (GEOIP, GEOSITE, PROCESS-NAME, ...) are only checked for
+exact duplicates. Logical rules (AND, OR, NOT, SUB-RULE) are kept as opaque
+text and never dropped: their payload holds commas and nested rules. Dropped
+rules are kept in `shadowed` with the rule that
+covers them, so conflicting targets can be reported.
+
+The checks and `match()` use three indexes:
+
+- a dict for DOMAIN;
+- a trie of reversed labels for DOMAIN-SUFFIX;
+- an Aho-Corasick automaton for DOMAIN-KEYWORD.
+
+So a lookup costs one walk over the domain, not a scan of every rule.
+
+    python clash_rules.py --bench cll2.yml
+"""
+
+import ipaddress
+import random
+import re
+import sys
+import time
+
+DOMAIN_TYPES = ('DOMAIN', 'DOMAIN-SUFFIX', 'DOMAIN-KEYWORD')
+IP_TYPES = ('IP-CIDR', 'IP-CIDR6')
+LOGICAL_TYPES = ('AND', 'OR', 'NOT', 'SUB-RULE')
+_END = None                # trie key holding the rule index; labels are str
+_TOP_LEVEL_RE = re.compile(r'^[^\s#-][^:]*:')
+
+
+class Rule:
+    """One rule line; `type` is None for comments and blank lines"""
+
+    __slots__ = ('type', 'payload', 'target', 'options', 'text')
+
+    def __init__(self, type, payload='', target='', options=(), text=None):
+        self.type = type
+        self.payload = payload
+        self.target = target
+        self.options = tuple(options)
+        self.text = text if text is not None else ','.join(
+            part for part in (type, payload, target, *options) if part)
+
+    @property
+    def key(self):
+        payload = self.payload.lower() if self.type in DOMAIN_TYPES else self.payload
+        if self.type in IP_TYPES:
+            # Only no-resolve changes what an IP rule matches
+            return (self.type, payload, ('no-resolve',) if 'no-resolve' in self.options else ())
+        return (self.type, payload, self.options)
+
+    def line(self, indent='  '):
+        if self.type is None:
+            return f'{indent}{self.text}' if self.text else ''
+        return f'{indent}- {self.text}'
+
+    def __repr__(self):
+        return f'Rule({self.text!r})'
+
+
+def _split_logical(text):
+    """[type, payload, target, options...] where the payload is a parenthesised group"""
+    rule_type, _, rest = text.partition(',')
+    depth = 0
+    for i, ch in enumerate(rest):
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            return [rule_type.strip(), rest[:i].strip()] + [p.strip() for p in rest[i + 1:].split(',')]
+    return [rule_type.strip(), rest.strip()]
+
+
+def parse_rule(line):
+    """Rule for a rules-list line ("- TYPE,payload,target" or a bare rule)"""
+    text = line.strip()
+    if not text or text.startswith('#'):
+        return Rule(None, text=text)
+    if text.startswith('- '):
+        text = text[2:].strip()
+    if len(text) > 1 and text[0] == text[-1] and text[0] in '\'"':
+        text = text[1:-1]
+    if text.split(',', 1)[0].strip() in LOGICAL_TYPES:
+        parts = _split_logical(text)
+    else:
+        parts = [part.strip() for part in text.split(',')]
+    if parts[0] in ('DOMAIN', 'DOMAIN-SUFFIX') and len(parts) > 1:
+        parts[1] = parts[1].strip('.')
+    if parts[0] in ('MATCH', 'FINAL'):
+        return Rule(parts[0], '', parts[1] if len(parts) > 1 else '', parts[2:], text)
+    if len(parts) < 3:
+        raise ValueError(f'Malformed rule: {line.strip()!r}')
+    return Rule(parts[0], parts[1], parts[2], [p for p in parts[3:] if p], text)
+
+
+def parse_rules(lines):
+    return [parse_rule(line) for line in lines]
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton giving the lowest value of any keyword in a text"""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [None]
+        self.built = True
+
+    def add(self, keyword, value):
+        state = 0
+        for ch in keyword:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(None)
+            state = nxt
+        if self.out[state] is None or value < self.out[state]:
+            self.out[state] = value
+        self.built = False
+
+    def build(self):
+        queue = list(self.goto[0].values())
+        for state in queue:
+            self.fail[state] = 0
+        for state in queue:
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                inherited = self.out[self.fail[nxt]]
+                if inherited is not None and (self.out[nxt] is None or inherited < self.out[nxt]):
+                    self.out[nxt] = inherited
+        self.built = True
+
+    def search(self, text):
+        if not self.built:
+            self.build()
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        best = None
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            value = out[state]
+            if value is not None and (best is None or value < best):
+                best = value
+        return best
+
+
+def _min(*values):
+    present = [v for v in values if v is not None]
+    return min(present) if present else None
+
+
+def _no_resolve(rule):
+    return 'no-resolve' in rule.options
+
+
+class RuleSet:
+    """Rules in priority order with covered rules dropped"""
+
+    def __init__(self, rules=()):
+        self.rules = []             # kept rules and comments, in order
+        self.shadowed = []          # (dropped rule, earlier rule covering it)
+        self._exact = {}            # DOMAIN payload -> index
+        self._suffixes = {}         # reversed-label trie of DOMAIN-SUFFIX
+        self._keywords = KeywordAutomaton()
+        self._networks = []         # (network, rule index)
+        self._keys = {}             # rule key -> index, for every type
+        self._final = None          # index of MATCH
+        self.extend(rules)
+
+    def _suffix_lookup(self, domain):
+        node = self._suffixes
+        best = None
+        for label in reversed(domain.split('.')):
+            node = node.get(label)
+            if node is None:
+                break
+            index = node.get(_END)
+            if index is not None and (best is None or index < best):
+                best = index
+        return best
+
+    def _covering(self, rule):
+        """Index of an earlier rule that matches everything `rule` matches"""
+        if rule.type in LOGICAL_TYPES:
+            return None
+        if self._final is not None:
+            return self._final
+        index = self._keys.get(rule.key)
+        if index is not None:
+            return index
+        payload = rule.payload.lower()
+        if rule.type == 'DOMAIN':
+            return _min(self._exact.get(payload), self._suffix_lookup(payload),
+                        self._keywords.search(payload))
+        if rule.type == 'DOMAIN-SUFFIX':
+            return _min(self._suffix_lookup(payload), self._keywords.search(payload))
+        if rule.type == 'DOMAIN-KEYWORD':
+            return self._keywords.search(payload)
+        if rule.type in IP_TYPES:
+            try:
+                network = ipaddress.ip_network(rule.payload, strict=False)
+            except ValueError:
+                return None
+            for earlier, index in self._networks:
+                if (earlier.version == network.version and network.subnet_of(earlier)
+                        and (_no_resolve(rule) or not _no_resolve(self.rules[index]))):
+                    return index
+        return None
+
+    def add(self, rule):
+        """Append a rule; returns False if an earlier rule already covers it"""
+        if rule.type is None:
+            self.rules.append(rule)
+            return True
+        covering = self._covering(rule)
+        if covering is not None:
+            self.shadowed.append((rule, self.rules[covering]))
+            return False
+        index = len(self.rules)
+        self.rules.append(rule)
+        self._keys[rule.key] = index
+        payload = rule.payload.lower()
+        if rule.type == 'DOMAIN':
+            self._exact[payload] = index
+        elif rule.type == 'DOMAIN-SUFFIX':
+            node = self._suffixes
+            for label in reversed(payload.split('.')):
+                node = node.setdefault(label, {})
+            node.setdefault(_END, index)
+        elif rule.type == 'DOMAIN-KEYWORD':
+            self._keywords.add(payload, index)
+        elif rule.type in IP_TYPES:
+            try:
+                self._networks.append((ipaddress.ip_network(rule.payload, strict=False), index))
+            except ValueError:
+                pass
+        elif rule.type in ('MATCH', 'FINAL'):
+            self._final = index
+        return True
+
+    def extend(self, rules):
+        for rule in rules:
+            self.add(rule)
+        return self
+
+    def match(self, domain):
+        """First DOMAIN* rule (or MATCH) that applies to a domain, or None.
+
+        Rules of other types are not evaluated, since they need an IP, a
+        process or a geo database.
+        """
+        domain = domain.lower().rstrip('.')
+        index = _min(self._exact.get(domain), self._suffix_lookup(domain),
+                     self._keywords.search(domain), self._final)
+        return None if index is None else self.rules[index]
+
+    def conflicts(self):
+        """Dropped rules whose target differs from the rule covering them"""
+        return [(rule, by) for rule, by in self.shadowed if rule.target != by.target]
+
+    def render(self, indent='  ', comments=True):
+        """The rules as YAML list lines, built with a single join"""
+        return '\n'.join(rule.line(indent) for rule in self.rules
+                         if comments or rule.type is not None) + '\n'
+
+    def __len__(self):
+        return sum(1 for rule in self.rules if rule.type is not None)
+
+
+def split_section(text, key):
+    """(text up to and including the 'key:' line, its body lines, text after).
+
+    The body runs to the next top-level key. Returns None if the config
+    has no such top-level key.
+    """
+    lines = text.splitlines(True)
+    header = f'{key}:'
+    for start, line in enumerate(lines):
+        if line.rstrip() == header:
+            break
+    else:
+        return None
+    end = start + 1
+    while end < len(lines) and not _TOP_LEVEL_RE.match(lines[end]):
+        end += 1
+    return ''.join(lines[:start + 1]), lines[start + 1:end], ''.join(lines[end:])
+
+
+def split_rules_section(text):
+    """(text before the rules list, rule lines, text after) of a Clash config.
+
+    If there is no 'rules:' key the rules are empty and the section is
+    appended.
+    """
+    parts = split_section(text, 'rules')
+    if parts is None:
+        head = text if text.endswith('\n') or not text else text + '\n'
+        return head + '\nrules:\n', [], ''
+    return parts
+
+
+def linear_match(rules, domain):
+    """Reference matcher: scan the rules in order"""
+    domain = domain.lower().rstrip('.')
+    for rule in rules:
+        if rule.type == 'DOMAIN' and domain == rule.payload.lower():
+            return rule
+        if rule.type == 'DOMAIN-SUFFIX':
+            suffix = rule.payload.lower()
+            if domain == suffix or domain.endswith('.' + suffix):
+                return rule
+        if rule.type == 'DOMAIN-KEYWORD' and rule.payload.lower() in domain:
+            return rule
+        if rule.type in ('MATCH', 'FINAL'):
+            return rule
+    return None
+
+
+def sample_domains(rules, count=20000, seed=1):
+    """Domains that hit, nearly hit and miss the rules, for benchmarking"""
+    rng = random.Random(seed)
+    payloads = [rule.payload.lower() for rule in rules
+                if rule.type in ('DOMAIN', 'DOMAIN-SUFFIX')]
+    words = ['www', 'api', 'cdn', 'static', 'img', 'login', 'm', 'edge', 'v2', 'assets']
+    tlds = ['com', 'net', 'org', 'cn', 'io', 'co.uk']
+    domains = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0 and payloads:
+            domains.append(rng.choice(payloads))
+        elif kind == 1 and payloads:
+            domains.append(f'{rng.choice(words)}.{rng.choice(payloads)}')
+        elif kind == 2 and payloads:
+            # Near miss: same registrable-looking tail with an extra prefix
+            domains.append('x' + rng.choice(payloads))
+        else:
+            label = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 12)))
+            domains.append(f'{rng.choice(words)}.{label}.{rng.choice(tlds)}')
+    return domains
+
+
+def benchmark(path, count=20000):
+    with open(path, encoding='utf-8') as f:
+        _, lines, _ = split_rules_section(f.read())
+    rules = parse_rules(lines)
+    started = time.perf_counter()
+    ruleset = RuleSet(rules)
+    built = time.perf_counter() - started
+    kept = [rule for rule in ruleset.rules if rule.type is not None]
+    print(f'{path}: {sum(1 for r in rules if r.type)} rules, {len(ruleset)} kept, '
+          f'{len(ruleset.shadowed)} shadowed ({len(ruleset.conflicts())} with another target), '
+          f'built in {built * 1000:.1f} ms')
+
+    domains = sample_domains(kept, count)
+    started = time.perf_counter()
+    fast = [ruleset.match(domain) for domain in domains]
+    indexed = time.perf_counter() - started
+    started = time.perf_counter()
+    slow = [linear_match(kept, domain) for domain in domains]
+    linear = time.perf_counter() - started
+    mismatches = sum(1 for a, b in zip(fast, slow) if a is not b)
+    print(f'  indexed: {len(domains) / indexed:10.0f} domains/s')
+    print(f'  linear:  {len(domains) / linear:10.0f} domains/s  '
+          f'(x{linear / indexed:.0f}, {mismatches} mismatches)')
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--bench'] and len(sys.argv) >= 3:
+        for config in sys.argv[2:]:
+            benchmark(config)
+    elif len(sys.argv) == 2:
+        with open(sys.argv[1], encoding='utf-8') as f:
+            _, lines, _ = split_rules_section(f.read())
+        ruleset = RuleSet(parse_rules(lines))
+        for rule, by in ruleset.shadowed:
+            print(f'{rule.text}  <- {by.text}')
+        print(f'{len(ruleset)} rules kept, {len(ruleset.shadowed)} shadowed')
+    else:
+        print(f'Usage: {sys.argv[0]} CONFIG | --bench CONFIG [CONFIG ...]')
+        sys.exit(1)
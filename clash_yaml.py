@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""Read selected top-level sections of a Clash config without loading all of it.
+
+A Clash config is mostly its `rules:` list, which can be thousands of lines
+long. Converters only need `proxies:`, and sometimes `proxy-groups:`. So
+instead of yaml.safe_load on the whole document:
+
+- the document is walked as a YAML event stream, with libyaml's CSafeLoader
+  when PyYAML was built with it and the pure-Python SafeLoader otherwise;
+- values of other top-level keys are skipped event by event, and nothing
+  is built for them;
+- only the wanted sections are turned into Python objects;
+- parsing stops as soon as every wanted section has been read. Clash
+  configs list proxies before rules, so the rules are usually never
+  parsed at all.
+
+    proxies = load_proxies(response.content)
+"""
+
+import yaml
+from yaml.events import (AliasEvent, MappingEndEvent, MappingStartEvent, ScalarEvent,
+                         SequenceEndEvent, SequenceStartEvent, StreamEndEvent,
+                         DocumentEndEvent)
+from yaml.nodes import MappingNode, ScalarNode, SequenceNode
+
+Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def _compose(loader, anchors):
+    """Build a node from the next events, the way yaml's Composer would"""
+    event = loader.get_event()
+    if isinstance(event, AliasEvent):
+        if event.anchor not in anchors:
+            raise yaml.composer.ComposerError(
+                None, None, f'found undefined alias {event.anchor!r}', event.start_mark)
+        return anchors[event.anchor]
+
+    if isinstance(event, ScalarEvent):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(ScalarNode, event.value, event.implicit)
+        node = ScalarNode(tag, event.value, event.start_mark, event.end_mark,
+                          style=event.style)
+    elif isinstance(event, SequenceStartEvent):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(SequenceNode, None, event.implicit)
+        node = SequenceNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+        if event.anchor is not None:
+            anchors[event.anchor] = node
+        while not loader.check_event(SequenceEndEvent):
+            node.value.append(_compose(loader, anchors))
+        node.end_mark = loader.get_event().end_mark
+    elif isinstance(event, MappingStartEvent):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(MappingNode, None, event.implicit)
+        node = MappingNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+        if event.anchor is not None:
+            anchors[event.anchor] = node
+        while not loader.check_event(MappingEndEvent):
+            key = _compose(loader, anchors)
+            node.value.append((key, _compose(loader, anchors)))
+        node.end_mark = loader.get_event().end_mark
+    else:
+        raise yaml.composer.ComposerError(
+            None, None, f'unexpected {type(event).__name__}', event.start_mark)
+
+    if isinstance(node, ScalarNode) and event.anchor is not None:
+        anchors[event.anchor] = node
+    return node
+
+
+def _skip(loader, anchors):
+    """Consume the events of one value without building it.
+
+    Anchored values are composed anyway, since a wanted section may alias them.
+    """
+    event = loader.peek_event()
+    if getattr(event, 'anchor', None) is not None and not isinstance(event, AliasEvent):
+        _compose(loader, anchors)
+        return
+    event = loader.get_event()
+    if isinstance(event, (SequenceStartEvent, MappingStartEvent)):
+        depth = 1
+        while depth:
+            event = loader.peek_event()
+            if getattr(event, 'anchor', None) is not None and not isinstance(event, AliasEvent):
+                _compose(loader, anchors)
+                continue
+            event = loader.get_event()
+            if isinstance(event, (SequenceStartEvent, MappingStartEvent)):
+                depth += 1
+            elif isinstance(event, (SequenceEndEvent, MappingEndEvent)):
+                depth -= 1
+
+
+def load_sections(stream, keys):
+    """{key: value} for the wanted top-level keys of a YAML mapping document.
+
+    `stream` may be str, bytes or a file object. Keys that are missing are
+    left out of the result.
+    """
+    wanted = set(keys)
+    result = {}
+    loader = Loader(stream)
+    try:
+        loader.get_event()                      # StreamStart
+        if loader.check_event(StreamEndEvent):
+            return result
+        loader.get_event()                      # DocumentStart
+        if not loader.check_event(MappingStartEvent):
+            raise ValueError('top level of the config is not a mapping')
+        loader.get_event()
+        anchors = {}
+        while wanted and not loader.check_event(MappingEndEvent, DocumentEndEvent):
+            key_event = loader.peek_event()
+            if isinstance(key_event, ScalarEvent) and key_event.value in wanted:
+                loader.get_event()
+                node = _compose(loader, anchors)
+                result[key_event.value] = loader.construct_document(node)
+                wanted.discard(key_event.value)
+            else:
+                _skip(loader, anchors)          # key
+                _skip(loader, anchors)          # value
+        return result
+    finally:
+        loader.dispose()
+
+
+def load_proxies(stream):
+    """The `proxies` list of a Clash config, or None if it has none"""
+    return load_sections(stream, ('proxies',)).get('proxies')
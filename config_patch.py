@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""Patch a Clash config in one streaming pass over its YAML events.
+
+ConfigPatch collects edits first and then rewrites the document once:
+
+    patch = ConfigPatch()
+    patch.insert_rules(open('clashrules.txt').readlines(), 'top')
+    patch.substitute('🇨🇳 台湾节点', 'SGG193')
+    patch.edit_group('Proxy', add=['SGG193'])
+    text = patch.apply(original_bytes)
+
+The document is parsed with clash_yaml's Loader, and the event marks give
+the source span of every top-level section:
+
+- Sections nobody edits are copied from the source text, so they stay
+  byte-identical, comments included.
+- Sections with edits (rules, proxy-groups, proxies or any key given to
+  edit_section) are the only ones built into Python objects. They are
+  edited and written back in place in block style; comment lines that
+  follow them are kept.
+- Placeholder substitution applies to the inserted rule lines only, before
+  they are merged, like the old text-based injection did.
+
+Inserted rules are merged with the existing ones through clash_rules.RuleSet,
+so duplicates and shadowed rules are dropped; `ruleset` holds the result.
+"""
+
+import yaml
+from yaml.events import (AliasEvent, DocumentEndEvent, DocumentStartEvent, MappingEndEvent,
+                         MappingStartEvent, ScalarEvent, SequenceEndEvent, SequenceStartEvent,
+                         StreamEndEvent, StreamStartEvent)
+from yaml.nodes import MappingNode, ScalarNode, SequenceNode
+
+from clash_rules import RuleSet, parse_rules
+from clash_yaml import Loader, _compose
+from proxy_dedupe import dedupe
+
+_resolver = yaml.resolver.Resolver()
+
+
+class _SectionDumper(yaml.SafeDumper):
+    """Indents block sequences under their key ("rules:\n  - ..."), as Clash
+    configs are usually written"""
+
+    def increase_indent(self, flow=False, indentless=False):
+        return super().increase_indent(flow, False)
+
+
+def _node_events(node, names, emitted):
+    """Events for a composed node, re-using anchors for shared nodes"""
+    anchor = names.get(id(node))
+    if anchor is not None:
+        if id(node) in emitted:
+            yield AliasEvent(anchor)
+            return
+        emitted.add(id(node))
+    if isinstance(node, ScalarNode):
+        implicit = (node.tag == _resolver.resolve(ScalarNode, node.value, (True, False)),
+                    node.tag == _resolver.resolve(ScalarNode, node.value, (False, True)))
+        yield ScalarEvent(anchor, node.tag, implicit, node.value, style=node.style)
+    elif isinstance(node, SequenceNode):
+        implicit = node.tag == _resolver.resolve(SequenceNode, node.value, True)
+        yield SequenceStartEvent(anchor, node.tag, implicit, flow_style=node.flow_style)
+        for item in node.value:
+            yield from _node_events(item, names, emitted)
+        yield SequenceEndEvent()
+    else:
+        implicit = node.tag == _resolver.resolve(MappingNode, node.value, True)
+        yield MappingStartEvent(anchor, node.tag, implicit, flow_style=node.flow_style)
+        for key, value in node.value:
+            yield from _node_events(key, names, emitted)
+            yield from _node_events(value, names, emitted)
+        yield MappingEndEvent()
+
+
+def _value_events(value):
+    """Events for a plain Python value, in block style with keys unsorted"""
+    representer = yaml.representer.SafeRepresenter(default_flow_style=False, sort_keys=False)
+    return _node_events(representer.represent_data(value), {}, set())
+
+
+def _section_text(events):
+    """YAML text of one top-level `key: value` given its events"""
+    return yaml.emit([StreamStartEvent(), DocumentStartEvent(explicit=False),
+                      MappingStartEvent(None, None, True, flow_style=False),
+                      *events, MappingEndEvent(), DocumentEndEvent(explicit=False),
+                      StreamEndEvent()],
+                     Dumper=_SectionDumper, allow_unicode=True, width=4096)
+
+
+def _trailing_comments(text):
+    """Comment and blank lines at the end of a section's source text"""
+    lines = text.splitlines(True)
+    end = len(lines)
+    while end and (not lines[end - 1].strip() or lines[end - 1].lstrip().startswith('#')):
+        end -= 1
+    return ''.join(lines[end:])
+
+
+def _read_text(stream):
+    if hasattr(stream, 'read'):
+        stream = stream.read()
+    if isinstance(stream, bytes):
+        stream = stream.decode('utf-8-sig')
+    return stream
+
+
+def _rule_position(rules, position):
+    """Index in a list of rule strings for an insert position"""
+    if isinstance(position, int):
+        return position
+    types = [rule.split(',', 1)[0].strip() for rule in rules]
+    final = next((i for i, t in enumerate(types) if t in ('MATCH', 'FINAL')), len(rules))
+    if position == 'top':
+        return 0
+    if position == 'bottom':
+        return final
+    kind, _, rule_type = position.partition(':')
+    if kind == 'before':
+        return next((i for i, t in enumerate(types) if t == rule_type), final)
+    if kind == 'after':
+        last = [i for i, t in enumerate(types) if t == rule_type]
+        return last[-1] + 1 if last else final
+    raise ValueError(f'Unknown rule position {position!r}')
+
+
+class ConfigPatch:
+    """A set of edits applied to a Clash config in a single pass"""
+
+    def __init__(self, dedupe_rules=True):
+        self.substitutions = {}
+        self.rule_inserts = []      # (position, [rule strings])
+        self.edits = {}             # top-level key -> [function(value) -> value]
+        self.create_before = {}     # key to add if missing -> key to put it before
+        self.dedupe_rules = dedupe_rules
+        self.ruleset = None
+        self.aliases = {}           # proxy names replaced by drop_duplicate_proxies
+        self._seen = set()
+
+    # --- edits ---
+
+    def substitute(self, old, new):
+        """Replace `old` with `new` in the inserted rule lines"""
+        self.substitutions[old] = new
+        return self
+
+    def insert_rules(self, rules, position='top'):
+        """Insert rule lines at 'top', 'bottom' (before MATCH), 'before:TYPE',
+        'after:TYPE' or an index. Comment and blank lines are ignored."""
+        lines = [rule.strip() for rule in rules]
+        lines = [line[2:].strip() if line.startswith('- ') else line
+                 for line in lines if line and not line.startswith('#')]
+        self.rule_inserts.append((position, lines))
+        return self
+
+    def edit_section(self, key, func, create_before=None):
+        """Replace top-level `key` with func(value). With create_before, a
+        missing key is added as func(None) before that key (or at the end)."""
+        self.edits.setdefault(key, []).append(func)
+        if create_before is not None:
+            self.create_before[key] = create_before
+        return self
+
+    def set_section(self, key, value, before='rules'):
+        return self.edit_section(key, lambda _: value, create_before=before)
+
+    def edit_group(self, name, add=(), remove=(), rename=None, **options):
+        """Edit one proxy group: add/remove members, rename it, set options"""
+        def edit(groups):
+            dropped = set(remove)
+            for group in groups or []:
+                if group.get('name') != name:
+                    continue
+                members = [m for m in group.get('proxies', []) if m not in dropped]
+                members.extend(m for m in add if m not in members)
+                group['proxies'] = members
+                group.update(options)
+                if rename:
+                    group['name'] = rename
+            return groups
+        return self.edit_section('proxy-groups', edit)
+
+    def rename_members(self, aliases):
+        """Point proxy-group members at new names"""
+        def edit(groups):
+            for group in groups or []:
+                if 'proxies' in group:
+                    group['proxies'] = list(dict.fromkeys(
+                        aliases.get(m, m) for m in group['proxies']))
+            return groups
+        return self.edit_section('proxy-groups', edit)
+
+    def drop_duplicate_proxies(self):
+        """Remove proxies with the same endpoint fingerprint and repoint groups.
+
+        Relies on `proxies` coming before `proxy-groups`, as in every Clash
+        config; if the groups come first the proxies are left alone.
+        """
+        def edit_proxies(proxies):
+            if 'proxy-groups' in self._seen:
+                return proxies
+            unique, aliases = dedupe(proxies or [])
+            self.aliases.update(aliases)
+            return unique
+        self.edit_section('proxies', edit_proxies)
+        return self.rename_members(self.aliases)
+
+    # --- applying ---
+
+    def _sub(self, text):
+        for old, new in self.substitutions.items():
+            if old in text:
+                text = text.replace(old, new)
+        return text
+
+    def _rules(self, rules):
+        rules = [str(rule) for rule in rules or []]
+        for position, lines in self.rule_inserts:
+            index = _rule_position(rules, position)
+            rules[index:index] = [self._sub(line) for line in lines]
+        if not self.dedupe_rules:
+            return rules
+        self.ruleset = RuleSet(parse_rules(rules))
+        return [rule.text for rule in self.ruleset.rules if rule.type is not None]
+
+    def _edited(self, key, value):
+        if key == 'rules' and self.rule_inserts:
+            value = self._rules(value)
+        for func in self.edits.get(key, ()):
+            value = func(value)
+        return value
+
+    def _edited_text(self, key, value):
+        return _section_text([ScalarEvent(None, None, (True, False), key),
+                              *_value_events(self._edited(key, value))])
+
+    def _passthrough(self, loader, anchors, names, edited):
+        """(events, expanded) for the next key or value.
+
+        Anchored values are composed so later edited sections can resolve
+        aliases to them. Aliases to anchors inside an edited section, which is
+        written without anchors, are expanded and `expanded` is True; the
+        section then has to be written from these events instead of copied.
+        """
+        events = []
+        expanded = False
+        emitted = set()
+        depth = 0
+        while True:
+            event = loader.peek_event()
+            if getattr(event, 'anchor', None) is not None and not isinstance(event, AliasEvent):
+                node = _compose(loader, anchors)
+                names.update((id(n), a) for a, n in anchors.items())
+                events.extend(_node_events(node, names, emitted))
+            else:
+                event = loader.get_event()
+                target = anchors.get(event.anchor) if isinstance(event, AliasEvent) else None
+                if target is not None and id(target) in edited:
+                    events.extend(_node_events(target, {}, set()))
+                    expanded = True
+                else:
+                    events.append(event)
+                if isinstance(event, (SequenceStartEvent, MappingStartEvent)):
+                    depth += 1
+                elif isinstance(event, (SequenceEndEvent, MappingEndEvent)):
+                    depth -= 1
+            if depth == 0:
+                return events, expanded
+
+    def _sections(self, loader):
+        """([(start index, text or None to copy the source)], end index of the mapping)
+
+        A text with the start index of the next section is a new section
+        inserted there.
+        """
+        wanted = set(self.edits) | ({'rules'} if self.rule_inserts else set())
+        pending = {key: before for key, before in self.create_before.items()}
+        if self.rule_inserts:
+            pending.setdefault('rules', None)
+        anchors, names, edited = {}, {}, set()
+        sections = []
+
+        loader.get_event()                      # StreamStart
+        if loader.check_event(StreamEndEvent):
+            raise ValueError('empty config')
+        loader.get_event()                      # DocumentStart
+        if not loader.check_event(MappingStartEvent):
+            raise ValueError('top level of the config is not a mapping')
+        if loader.get_event().flow_style:
+            raise ValueError('top level of the config is a flow mapping')
+
+        while not loader.check_event(MappingEndEvent, DocumentEndEvent):
+            key_event = loader.peek_event()
+            start = key_event.start_mark.index
+            key = key_event.value if isinstance(key_event, ScalarEvent) else None
+            # New sections that belong before this key
+            for new_key in [k for k, before in pending.items() if before == key and k not in self._seen]:
+                del pending[new_key]
+                self._seen.add(new_key)
+                sections.append((start, self._edited_text(new_key, None)))
+            if key in wanted:
+                loader.get_event()
+                known = dict(anchors)
+                node = _compose(loader, anchors)
+                edited.update(id(n) for a, n in anchors.items() if known.get(a) is not n)
+                value = loader.construct_document(node)
+                self._seen.add(key)
+                pending.pop(key, None)
+                sections.append((start, self._edited_text(key, value)))
+            else:
+                if key is not None:
+                    self._seen.add(key)
+                    pending.pop(key, None)
+                key_events, key_expanded = self._passthrough(loader, anchors, names, edited)
+                value_events, value_expanded = self._passthrough(loader, anchors, names, edited)
+                text = None
+                if key_expanded or value_expanded:
+                    text = _section_text(key_events + value_events)
+                sections.append((start, text))
+
+        end = loader.peek_event().start_mark.index
+        for new_key in pending:
+            self._seen.add(new_key)
+            sections.append((end, self._edited_text(new_key, None)))
+        return sections, end
+
+    def apply(self, stream):
+        """The patched config as text; `stream` may be str, bytes or a file"""
+        self._seen = set()
+        text = _read_text(stream)
+        loader = Loader(text)
+        try:
+            sections, end = self._sections(loader)
+            loader.get_event()                  # MappingEnd
+            document_end = loader.get_event().end_mark.index
+            while not loader.check_event(StreamEndEvent):
+                loader.get_event()              # further documents are dropped
+        finally:
+            loader.dispose()
+
+        out = [text[:sections[0][0]] if sections else text[:end]]
+        bounds = [start for start, _ in sections[1:]] + [end]
+        for (start, section), stop in zip(sections, bounds):
+            source = text[start:stop]
+            if section is None:
+                out.append(source)
+                continue
+            if out[-1] and not out[-1].endswith('\n'):
+                out.append('\n')
+            # An inserted section has no source; a rewritten one keeps the
+            # comment lines that follow it
+            out.append(section + _trailing_comments(source))
+        out.append(text[end:document_end])
+        return ''.join(out)
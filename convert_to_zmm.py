@@ -1,8 +1,10 @@
-import yaml
 import base64
-import json
 import requests
 
+from clash_yaml import load_proxies
+from proxy_convert import convert
+from proxy_dedupe import dedupe
+
 # 下载 Clash 配置文件
 url = "http://zmm.300000.best"
 output_file = "zmm_sub.txt"
@@ -13,58 +15,20 @@ def encode_base64(data: str) -> str:
 
 def convert_to_passwall(proxies):
     """转换 Clash 代理为 Passwall 订阅格式"""
-    passwall_nodes = []
-    
-    for node in proxies:
-        name = node.get("name", "Unnamed")
-        server = node.get("server", "")
-        port = node.get("port", "")
-        
-        if node["type"] == "vmess":
-            vmess_data = {
-                "v": "2",
-                "ps": name,
-                "add": server,
-                "port": str(port),
-                "id": node["uuid"],
-                "aid": str(node.get("alterId", 0)),
-                "net": node.get("network", "tcp"),
-                "type": "none",
-                "host": node.get("servername", ""),
-                "path": node.get("path", ""),
-                "tls": "tls" if node.get("tls", False) else "",
-            }
-            vmess_link = "vmess://" + encode_base64(json.dumps(vmess_data, separators=(",", ":")))
-            passwall_nodes.append(vmess_link)
-        
-        elif node["type"] == "vless":
-            params = f"?encryption=none&security=tls#{name}" if node.get("tls") else f"?encryption=none#{name}"
-            vless_link = f"vless://{node['uuid']}@{server}:{port}{params}"
-            passwall_nodes.append(vless_link)
-        
-        elif node["type"] == "ss":
-            ss_data = f"{node['cipher']}:{node['password']}@{server}:{port}"
-            ss_link = "ss://" + encode_base64(ss_data) + f"#{name}"
-            passwall_nodes.append(ss_link)
-        
-        elif node["type"] == "trojan":
-            trojan_link = f"trojan://{node['password']}@{server}:{port}#{name}"
-            passwall_nodes.append(trojan_link)
-        
-        elif node["type"] == "ssr":
-            ssr_data = f"{server}:{port}:{node.get('protocol', 'origin')}:{node['cipher']}:{node.get('obfs', 'plain')}:{encode_base64(node['password'])}"
-            ssr_link = "ssr://" + encode_base64(ssr_data)
-            passwall_nodes.append(ssr_link)
-    
-    return passwall_nodes
+    links, skipped = convert(proxies, "passwall")
+    if skipped:
+        print(f"跳过不支持的节点: {dict(skipped)}")
+    return links
 
 # 下载 Clash 配置文件
 response = requests.get(url)
 if response.status_code == 200:
-    config = yaml.safe_load(response.text)
+    # 只解析 proxies 段，跳过后面成千上万行的 rules
+    proxies = load_proxies(response.content)
 
-    if "proxies" in config:
-        passwall_links = convert_to_passwall(config["proxies"])
+    if proxies is not None:
+        proxies, _ = dedupe(proxies)
+        passwall_links = convert_to_passwall(proxies)
         base64_sub = encode_base64("\n".join(passwall_links))
         
         with open(output_file, "w", encoding="utf-8") as f:
@@ -1,5 +1,11 @@
 import requests
 import json
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+TIMEOUT = (5, 15)  # (连接, 读取) 超时秒数
+MAX_WORKERS = 6
 
 CHANNEL_LIST = {
     'J': {
@@ -76,7 +82,17 @@ CHANNEL_LIST = {
     }
 }
 
-def get_mytvsuper(channel):
+def create_session():
+    """所有频道共用一个连接池，TLS 连接只建立一次；连接错误/429/5xx 自动退避重试"""
+    retry = Retry(total=3, backoff_factor=0.5,
+                  status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset(['GET']))
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    return session
+
+def get_mytvsuper(channel, session=None):
     if channel not in CHANNEL_LIST:
         return '频道代号错误'
 
@@ -98,7 +114,11 @@ def get_mytvsuper(channel):
     }
 
     url = 'https://user-api.mytvsuper.com/v1/channel/checkout'
-    response = requests.get(url, headers=headers, params=params)
+    try:
+        response = (session or requests).get(url, headers=headers, params=params, timeout=TIMEOUT)
+    except requests.RequestException as e:
+        print(f"{channel} 请求出错: {e}")
+        return '请求失败'
 
     if response.status_code != 200:
         return '请求失败'
@@ -128,14 +148,27 @@ def get_mytvsuper(channel):
 
     return m3u_content
 
-# 创建或打开文件用于写入
-with open('mytvfree.m3u', 'w', encoding='utf-8') as m3u_file:
-    # 写入 M3U 文件的头部
-    m3u_file.write("#EXTM3U url-tvg=\"https://xmltv.bph.workers.dev\"\n")
+def fetch_all_channels():
+    """并发获取所有频道，结果按 CHANNEL_LIST 原有顺序返回"""
+    channel_codes = list(CHANNEL_LIST.keys())
+    with create_session() as session, \
+            ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        return list(zip(channel_codes,
+                        executor.map(lambda code: get_mytvsuper(code, session), channel_codes)))
+
+if __name__ == '__main__':
+    results = fetch_all_channels()
+
+    # 创建或打开文件用于写入
+    with open('mytvfree.m3u', 'w', encoding='utf-8') as m3u_file:
+        # 写入 M3U 文件的头部
+        m3u_file.write("#EXTM3U url-tvg=\"https://xmltv.bph.workers.dev\"\n")
 
-    # 遍历所有频道并写入每个频道的 M3U 内容
-    for channel_code in CHANNEL_LIST.keys():
-        m3u_content = get_mytvsuper(channel_code)
-        m3u_file.write(m3u_content)
+        # 按原有频道顺序写入每个频道的 M3U 内容，失败的频道跳过
+        for channel_code, m3u_content in results:
+            if not m3u_content.startswith('#EXTINF'):
+                print(f"{channel_code} 跳过: {m3u_content}")
+                continue
+            m3u_file.write(m3u_content)
 
-print("所有频道的 M3U 播放列表已生成并保存为 'mytvfree.m3u'。")
+    print("所有频道的 M3U 播放列表已生成并保存为 'mytvfree.m3u'。")
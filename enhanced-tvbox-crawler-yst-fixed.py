@@ -3,22 +3,38 @@
 # Enhanced Btime TVBox Crawler - Auto-fetching version
 
 import json
+import os
 import sys
 import re
 import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin, quote, urlparse
-import requests
 from bs4 import BeautifulSoup
 from datetime import datetime, timezone, timedelta
 
 sys.path.append('..')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from base.spider import Spider
+from tvbox_http import HttpClient
+from btime_cache import MonthCache
+from search_index import SearchIndex
+from btime_item import fetch_video_item
 
 
 class Spider(Spider):
     def init(self, extend=""):
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        self.session = HttpClient(headers=self.headers)
+        # Global rate limiter shared by all month-fetching threads
+        self._rate_lock = threading.Lock()
+        self._next_request_at = 0.0
+        # Per-month catalogue persisted on disk across restarts
+        self.month_cache = MonthCache('btime-auto', ttl=self.cache_expiry)
+        # vod_id -> video, filled as months are fetched, for detail lookups
+        self.video_index = {}
+        # Title/description n-gram index for searchContent
+        self.search_index = SearchIndex()
         print("Btime initialized - Auto-fetch mode")
         return
 
@@ -32,13 +48,14 @@ class Spider(Spider):
         pass
 
     def destroy(self):
-        pass
+        self.session.close()
 
     # Base Configuration
     host = 'https://www.btime.com'
     base_url = 'https://www.btime.com/btv/btvws_yst'
     
     # API URL template - cursor-based pagination
+    list_id = 'btv_08da67cea600bf3c78973427bfaba12d_s0'
     api_url_template = "https://pc.api.btime.com/btimeweb/infoFlow?list_id=btv_08da67cea600bf3c78973427bfaba12d_s0_{year}_{month:02d}&refresh=1&count=50&cursor={cursor}"
     
     # Headers for requests
@@ -55,10 +72,15 @@ class Spider(Spider):
     all_videos_cache = None
     cache_timestamp = None
     cache_expiry = 1800  # 30 minutes
+    full_refresh_timestamp = None
+    full_refresh_interval = 86400  # Rebuild the whole list once a day
+    cache_month = None
     
     # Fetch configuration
     max_videos_per_request = 50
     max_total_videos = 500  # Limit total videos to avoid excessive loading
+    max_month_workers = 4  # Months fetched in parallel
+    min_request_interval = 0.1  # Minimum spacing between any two API requests
 
     def homeContent(self, filter):
         """Generate content for home page with time-based categories"""
@@ -125,14 +147,10 @@ class Spider(Spider):
         
         vid = ids[0]
         
-        # Find video in cached data
-        all_videos = self.getCachedAllVideos()
-        video_info = None
-        
-        for item in all_videos:
-            if item.get('vod_id') == vid:
-                video_info = item
-                break
+        # Find video in the index, falling back to its own item page
+        video_info = self.video_index.get(vid)
+        if not video_info:
+            video_info = self.fetchVideoItem(vid)
         
         if not video_info:
             return {'list': [{'vod_name': '未找到视频', 'vod_play_from': 'Btime', 'vod_play_url': '未找到$' + vid}]}
@@ -158,22 +176,20 @@ class Spider(Spider):
     
     def searchContent(self, key, quick, pg="1"):
         """Search for videos by keyword"""
-        results = []
+        page = int(pg) if pg else 1
+        page_size = 50
         
-        # Search in all cached videos
-        all_videos = self.getCachedAllVideos()
+        # Make sure the catalogue is loaded (this also fills the search index)
+        self.getCachedAllVideos()
         
-        for item in all_videos:
-            title = item.get('vod_name', '')
-            if key.lower() in title.lower():
-                results.append(item)
+        results, total = self.search_index.search(key, page, page_size)
         
         return {
-            'list': results[:50],  # Limit to 50 results
-            'page': pg,
-            'pagecount': 1,
-            'limit': 50,
-            'total': len(results)
+            'list': results,
+            'page': page,
+            'pagecount': max(1, (total + page_size - 1) // page_size),
+            'limit': page_size,
+            'total': total
         }
     
     def playerContent(self, flag, id, vipFlags):
@@ -205,13 +221,86 @@ class Spider(Spider):
             (now - self.cache_timestamp) < self.cache_expiry):
             return self.all_videos_cache
         
+        # Cheap refresh: only look for new episodes at the head of this month
+        if (self.all_videos_cache is not None and
+            self.full_refresh_timestamp is not None and
+            (now - self.full_refresh_timestamp) < self.full_refresh_interval and
+            self.cache_month == self.currentMonth()):
+            new_videos = self.fetchNewVideos(self.all_videos_cache)
+            if new_videos is not None:
+                print(f"Incremental refresh: {len(new_videos)} new videos")
+                self.indexVideos(new_videos)
+                self.all_videos_cache = (new_videos + self.all_videos_cache)[:self.max_total_videos]
+                self.updateCurrentMonth(new_videos)
+                self.cache_timestamp = now
+                return self.all_videos_cache
+        
         # Refresh cache
         print("Refreshing video cache...")
         self.all_videos_cache = self.fetchAllAvailableVideos()
         self.cache_timestamp = now
+        self.full_refresh_timestamp = now
+        self.cache_month = self.currentMonth()
         
         return self.all_videos_cache
     
+    def currentMonth(self):
+        """(year, month) of the current month"""
+        now = datetime.now()
+        return now.year, now.month
+    
+    def fetchNewVideos(self, known_videos):
+        """Poll the head of the current month's cursor chain for new videos.
+        
+        The feed is newest-first, so paging stops at the first gid that is
+        already known; usually this costs a single request. Returns the new
+        videos (newest first), or None if the poll failed.
+        """
+        known_ids = set(video['vod_id'] for video in known_videos)
+        year, month = self.currentMonth()
+        
+        new_videos = []
+        cursor = '0'
+        request_count = 0
+        max_requests = 5  # Same per-month cap as a full fetch
+        
+        while request_count < max_requests:
+            try:
+                items, next_cursor = self.requestMonthPage(year, month, cursor)
+            except Exception as e:
+                print(f"Error polling {year}-{month:02d} cursor {cursor}: {str(e)}")
+                return None
+            
+            for item in items:
+                gid = item.get("gid", "")
+                if gid in known_ids:
+                    return new_videos
+                known_ids.add(gid)
+                new_videos.append(self.buildVideo(item, year))
+            
+            if not items or next_cursor is None or next_cursor == cursor or next_cursor == '0':
+                break
+            
+            cursor = next_cursor
+            request_count += 1
+        
+        return new_videos
+    
+    def updateCurrentMonth(self, new_videos):
+        """Prepend polled videos to the current month's disk cache entry.
+        
+        The entry is usually past its TTL by now, so it is read regardless of
+        age; writing it back also marks it fresh again. Without an existing
+        entry nothing is written, as the new videos alone are not the month.
+        """
+        year, month = self.currentMonth()
+        month_videos = self.month_cache.get(self.list_id, year, month, stale_ok=True)
+        if month_videos is None:
+            return
+        new_ids = set(video['vod_id'] for video in new_videos)
+        month_videos = new_videos + [video for video in month_videos if video['vod_id'] not in new_ids]
+        self.month_cache.put(self.list_id, year, month, month_videos)
+    
     def fetchLatestVideos(self, limit=50):
         """Fetch the most recent videos"""
         now = datetime.now()
@@ -242,25 +331,12 @@ class Spider(Spider):
     
     def fetchVideosForPeriod(self, months=3):
         """Fetch videos for a specific period (in months)"""
-        now = datetime.now()
-        current_year = now.year
-        current_month = now.month
-        
         videos = []
         seen_ids = set()
         
-        year = current_year
-        month = current_month
-        
-        for _ in range(months):
-            fetched = self.fetchVideosForMonth(year, month, seen_ids)
-            videos.extend(fetched)
-            
-            # Move to previous month
-            month -= 1
-            if month < 1:
-                month = 12
-                year -= 1
+        month_list = list(self.iterMonths())[:months]
+        for year, month, fetched in self.fetchMonthsConcurrently(month_list):
+            videos.extend(self.mergeUnseen(fetched, seen_ids))
         
         return videos
     
@@ -269,160 +345,259 @@ class Spider(Spider):
         videos = []
         seen_ids = set()
         
-        # Start from current date
+        # Go back month by month (newest first) until we hit the limit,
+        # 3 consecutive empty months, or the start of 2018
+        empty_months = 0
+        months = self.fetchMonthsConcurrently(self.iterMonths())
+        
+        try:
+            for year, month, fetched in months:
+                print(f"Fetched videos for {year}-{month:02d}: {len(fetched)}")
+                fetched = self.mergeUnseen(fetched, seen_ids)
+                
+                if not fetched:
+                    # If no videos found, we might have gone back too far
+                    empty_months += 1
+                    if empty_months >= 3:  # If 3 consecutive months have no data, stop
+                        break
+                else:
+                    empty_months = 0  # Reset counter when we find videos
+                    videos.extend(fetched)
+                
+                if len(videos) >= self.max_total_videos:
+                    break
+        finally:
+            months.close()
+        
+        print(f"Total videos fetched: {len(videos)}")
+        return videos
+    
+    def iterMonths(self, earliest_year=2018):
+        """Yield (year, month) pairs from the current month backwards"""
         now = datetime.now()
         year = now.year
         month = now.month
         
-        # Go back up to 24 months or until we hit the limit
-        months_checked = 0
-        max_months = 24
-        
-        while len(videos) < self.max_total_videos and months_checked < max_months:
-            print(f"Fetching videos for {year}-{month:02d}...")
-            fetched = self.fetchVideosForMonth(year, month, seen_ids)
-            
-            if not fetched:
-                # If no videos found, we might have gone back too far
-                months_checked += 1
-                if months_checked >= 3:  # If 3 consecutive months have no data, stop
-                    break
-            else:
-                months_checked = 0  # Reset counter when we find videos
-                videos.extend(fetched)
+        while year >= earliest_year:
+            yield year, month
             
             # Move to previous month
             month -= 1
             if month < 1:
                 month = 12
                 year -= 1
-                
-                # Don't go before 2018
-                if year < 2018:
-                    break
-        
-        print(f"Total videos fetched: {len(videos)}")
-        return videos
     
-    def fetchVideosForMonth(self, year, month, seen_ids=None, limit=None):
-        """Fetch videos for a specific month"""
+    def fetchMonthsConcurrently(self, months):
+        """Fetch months in parallel, yielding (year, month, videos) in input order.
+        
+        At most max_month_workers months are in flight at once; further months
+        are only submitted as earlier ones are consumed, so a caller that stops
+        iterating early does not trigger fetches far beyond what it needed.
+        Months are indexed here, in input order, rather than in the workers,
+        so equal-score search hits keep newest-month-first order.
+        """
+        months = iter(months)
+        pending = deque()
+        pool = ThreadPoolExecutor(max_workers=self.max_month_workers)
+        
+        def submit_next():
+            for year, month in months:
+                pending.append((year, month, pool.submit(self.fetchVideosForMonth, year, month,
+                                                         index=False)))
+                return
+        
+        try:
+            for _ in range(self.max_month_workers):
+                submit_next()
+            
+            while pending:
+                year, month, future = pending.popleft()
+                fetched = future.result()
+                submit_next()
+                self.indexVideos(fetched)
+                yield year, month, fetched
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+            pool.shutdown(wait=False)
+    
+    def mergeUnseen(self, fetched, seen_ids):
+        """Drop videos already seen in newer months and record the rest"""
+        unseen = []
+        for video in fetched:
+            if video['vod_id'] in seen_ids:
+                continue
+            seen_ids.add(video['vod_id'])
+            unseen.append(video)
+        return unseen
+    
+    def throttle(self):
+        """Global rate limiter: space out API requests across all threads"""
+        with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_request_at - now
+            self._next_request_at = max(now, self._next_request_at) + self.min_request_interval
+        
+        if wait > 0:
+            time.sleep(wait)
+    
+    def fetchVideosForMonth(self, year, month, seen_ids=None, limit=None, index=True):
+        """Fetch videos for a specific month (served from the disk cache when fresh)
+        
+        With index=False the caller indexes the month itself; concurrent
+        fetches do, so months enter the search index in order.
+        """
         if seen_ids is None:
             seen_ids = set()
         
+        month_videos = self.month_cache.get(self.list_id, year, month)
+        if month_videos is None:
+            month_videos, complete = self.requestVideosForMonth(year, month)
+            # Never persist a month cut short by a network/parse error
+            if complete:
+                self.month_cache.put(self.list_id, year, month, month_videos)
+        if index:
+            self.indexVideos(month_videos)
+        
+        videos = []
+        for video in month_videos:
+            if limit and len(videos) >= limit:
+                break
+            if video['vod_id'] in seen_ids:
+                continue
+            seen_ids.add(video['vod_id'])
+            videos.append(video)
+        
+        return videos
+    
+    def requestVideosForMonth(self, year, month):
+        """Walk a month's infoFlow cursor chain.
+        
+        Returns (videos, complete); complete is False when the chain was
+        interrupted by an error rather than reaching its end.
+        """
+        seen_ids = set()
         videos = []
         cursor = '0'
         request_count = 0
         max_requests = 5  # Limit requests per month
+        complete = True
         
         while request_count < max_requests:
-            if limit and len(videos) >= limit:
+            try:
+                items, next_cursor = self.requestMonthPage(year, month, cursor)
+            except Exception as e:
+                print(f"Error fetching {year}-{month:02d} cursor {cursor}: {str(e)}")
+                complete = False
                 break
             
-            api_url = self.api_url_template.format(year=year, month=month, cursor=cursor)
+            # If no items returned, we've reached the end
+            if not items:
+                break
             
-            try:
-                response = self.session.get(api_url, headers=self.headers, timeout=10)
+            new_items_count = 0
+            for item in items:
+                gid = item.get("gid", "")
                 
-                # Check if request was successful
-                if response.status_code != 200:
-                    print(f"Error: Status code {response.status_code} for {year}-{month:02d}")
-                    break
-                
-                raw_text = response.text
-                
-                # Handle empty response
-                if not raw_text or raw_text.strip() == '':
-                    break
+                # Skip if already seen
+                if gid in seen_ids:
+                    continue
                 
-                # Remove callback wrapper if present
-                if "(" in raw_text and ")" in raw_text:
-                    raw_text = raw_text[raw_text.find("(") + 1 : raw_text.rfind(")")]
-                
-                # Parse JSON
-                try:
-                    json_data = json.loads(raw_text)
-                except json.JSONDecodeError:
-                    print(f"JSON decode error for {year}-{month:02d}")
-                    break
-                
-                # Check if data exists
-                if "data" not in json_data or "list" not in json_data.get("data", {}):
-                    break
-                
-                items = json_data["data"]["list"]
-                
-                # If no items returned, we've reached the end
-                if not items:
-                    break
-                
-                new_items_count = 0
-                for item in items:
-                    if limit and len(videos) >= limit:
-                        break
-                    
-                    gid = item.get("gid", "")
-                    
-                    # Skip if already seen
-                    if gid in seen_ids:
-                        continue
-                    
-                    seen_ids.add(gid)
-                    new_items_count += 1
-                    
-                    # Extract video information
-                    data_section = item.get("data", {})
-                    url = f"https://item.btime.com/{gid}" if gid else ""
-                    title = data_section.get("title", "无标题")
-                    timestamp = int(data_section.get("pdate", "0"))
-                    
-                    # Format date
-                    if timestamp > 0:
-                        beijing = timezone(timedelta(hours=8))
-                        dt = datetime.fromtimestamp(timestamp, beijing)
-                        date_str = dt.strftime("%Y年%m月%d日")
-                    else:
-                        date_str = "未知时间"
-                    
-                    # Get cover image
-                    covers = data_section.get("covers", [])
-                    cover = covers[0] if covers else ""
-                    
-                    # Extract description
-                    desc = data_section.get("detail", "")
-                    if not desc:
-                        desc = data_section.get("summary", "")
-                    
-                    # Create video object
-                    video = {
-                        'vod_id': gid,
-                        'vod_name': title,
-                        'vod_pic': cover,
-                        'vod_url': url,
-                        'vod_content': desc,
-                        'vod_remarks': date_str,
-                        'vod_year': str(year)
-                    }
-                    
-                    videos.append(video)
-                
-                # Check if we should continue
-                if new_items_count == 0:
-                    break
-                
-                # Get next cursor
-                next_cursor = json_data.get("data", {}).get("cursor", None)
-                if next_cursor is None or next_cursor == cursor or next_cursor == '0':
-                    break
-                
-                cursor = next_cursor
-                
-            except Exception as e:
-                print(f"Error fetching {year}-{month:02d} cursor {cursor}: {str(e)}")
+                seen_ids.add(gid)
+                new_items_count += 1
+                videos.append(self.buildVideo(item, year))
+            
+            # Check if we should continue
+            if new_items_count == 0:
                 break
             
-            request_count += 1
+            if next_cursor is None or next_cursor == cursor or next_cursor == '0':
+                break
             
-            # Small delay to avoid overwhelming the server
-            time.sleep(0.3)
+            cursor = next_cursor
+            request_count += 1
         
-        return videos
+        return videos, complete
+    
+    def requestMonthPage(self, year, month, cursor):
+        """Fetch one infoFlow page, returning (items, next_cursor).
+        
+        An empty response or missing data yields an empty item list; HTTP and
+        JSON errors are raised to the caller.
+        """
+        api_url = self.api_url_template.format(year=year, month=month, cursor=cursor)
+        
+        self.throttle()
+        response = self.session.get(api_url, headers=self.headers, timeout=10)
+        
+        # Check if request was successful
+        if response.status_code != 200:
+            raise ValueError(f"Status code {response.status_code}")
+        
+        raw_text = response.text
+        
+        # Handle empty response
+        if not raw_text or raw_text.strip() == '':
+            return [], None
+        
+        # Remove callback wrapper if present
+        if "(" in raw_text and ")" in raw_text:
+            raw_text = raw_text[raw_text.find("(") + 1 : raw_text.rfind(")")]
+        
+        json_data = json.loads(raw_text)
+        
+        # Check if data exists
+        if "data" not in json_data or "list" not in json_data.get("data", {}):
+            return [], None
+        
+        return json_data["data"]["list"], json_data["data"].get("cursor", None)
+    
+    def buildVideo(self, item, year):
+        """Convert an infoFlow item into a TVBox video object"""
+        gid = item.get("gid", "")
+        
+        # Extract video information
+        data_section = item.get("data", {})
+        url = f"https://item.btime.com/{gid}" if gid else ""
+        title = data_section.get("title", "无标题")
+        timestamp = int(data_section.get("pdate", "0"))
+        
+        # Format date
+        if timestamp > 0:
+            beijing = timezone(timedelta(hours=8))
+            dt = datetime.fromtimestamp(timestamp, beijing)
+            date_str = dt.strftime("%Y年%m月%d日")
+        else:
+            date_str = "未知时间"
+        
+        # Get cover image
+        covers = data_section.get("covers", [])
+        cover = covers[0] if covers else ""
+        
+        # Extract description
+        desc = data_section.get("detail", "")
+        if not desc:
+            desc = data_section.get("summary", "")
+        
+        return {
+            'vod_id': gid,
+            'vod_name': title,
+            'vod_pic': cover,
+            'vod_url': url,
+            'vod_content': desc,
+            'vod_remarks': date_str,
+            'vod_year': str(year)
+        }
+    
+    def indexVideos(self, videos):
+        """Record videos in the vod_id and search indexes"""
+        for video in videos:
+            self.video_index[video['vod_id']] = video
+        self.search_index.add_all(videos)
+    
+    def fetchVideoItem(self, gid):
+        """Fetch a single video from its item page (index miss fallback)"""
+        video = fetch_video_item(self.session, gid, self.headers)
+        if video:
+            self.video_index[gid] = video
+        return video
@@ -3,22 +3,28 @@
 # by boleechat - modified and combined version
 
 import json
+import os
 import sys
 import re
 import time
 from urllib.parse import urljoin, quote, urlparse
-import requests
 from bs4 import BeautifulSoup
 from datetime import datetime, timezone, timedelta
 
 sys.path.append('..')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from base.spider import Spider
+from tvbox_http import HttpClient
+from btime_cache import MonthCache
+from search_index import SearchIndex
+from btime_item import fetch_video_item
 
 
 class Spider(Spider):
     def init(self, extend=""):
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        self.session = HttpClient(headers=self.headers)
+        # Per-month catalogue persisted on disk across restarts
+        self.month_cache = MonthCache('btime-year')
         print("Btime initialized")
         return
 
@@ -32,7 +38,7 @@ class Spider(Spider):
         pass
 
     def destroy(self):
-        pass
+        self.session.close()
 
     # Base Configuration
     host = 'https://www.btime.com'
@@ -50,6 +56,7 @@ class Spider(Spider):
     available_years = [str(y) for y in range(_now.year, 2017, -1)]
     
     # API URL templates - Using cursor-based pagination
+    list_id = 'btv_08da67cea600bf3c78973427bfaba12d_s0'
     api_url_template = "https://pc.api.btime.com/btimeweb/infoFlow?list_id=btv_08da67cea600bf3c78973427bfaba12d_s0_{year}_{month:02d}&refresh=1&count=50&cursor={cursor}"
     
     # Headers for requests
@@ -65,6 +72,12 @@ class Spider(Spider):
     # Cache for fetched data to reduce API calls
     data_cache = {}
     
+    # original_id (gid) -> video, filled alongside data_cache for detail lookups
+    video_index = {}
+    
+    # Title/description n-gram index over every year loaded so far
+    search_index = SearchIndex()
+    
     # Maximum number of requests per month
     max_requests_per_month = 10
 
@@ -134,14 +147,10 @@ class Spider(Spider):
             year = self.current_year
             original_id = vid
             
-        # Find the specific video info in the year's data
-        year_data = self.fetchDataForYear(year)
-        
-        video_info = None
-        for item in year_data:
-            if item.get('vod_id') == vid or (original_id and item.get('original_id') == original_id):
-                video_info = item
-                break
+        # Find the specific video info in the index, falling back to its own item page
+        video_info = self.video_index.get(original_id)
+        if not video_info:
+            video_info = self.fetchVideoItem(original_id, year)
         
         if not video_info:
             return {'list': [{'vod_name': '未找到视频', 'vod_play_from': 'Btime', 'vod_play_url': '未找到$' + vid}]}
@@ -174,21 +183,23 @@ class Spider(Spider):
     
     def searchContent(self, key, quick, pg="1"):
         """Search for videos by keyword across all years"""
-        results = []
+        page = int(pg) if pg else 1
+        page_size = 50
         
-        # Search in each year's data
-        for year in self.available_years:
-            year_data = self.fetchDataForYear(year)
-            
-            for item in year_data:
-                # Check if the keyword is in the title
-                title = item.get('vod_name', '')
-                if key.lower() in title.lower():
-                    # Avoid duplicates
-                    if not any(r['vod_id'] == item['vod_id'] for r in results):
-                        results.append(item)
-        
-        return {'list': results, 'page': pg, 'pagecount': 1, 'limit': 50, 'total': len(results)}
+        # Load years newest-first only until the requested page can be filled
+        pending_years = [year for year in self.available_years if year not in self.data_cache]
+        
+        results, total = self.search_index.search(key, page, page_size)
+        while total < page * page_size and pending_years:
+            self.fetchDataForYear(pending_years.pop(0))
+            results, total = self.search_index.search(key, page, page_size)
+        
+        # More pages may exist in years not loaded yet
+        pagecount = max(1, (total + page_size - 1) // page_size)
+        if pending_years:
+            pagecount += 1
+        
+        return {'list': results, 'page': page, 'pagecount': pagecount, 'limit': page_size, 'total': total}
     
     def playerContent(self, flag, id, vipFlags):
         """Get playback information"""
@@ -226,101 +237,131 @@ class Spider(Spider):
         months_to_fetch = current_month if int(year) == current_year else 12
         
         for month in range(months_to_fetch, 0, -1):
-            cursor = '0'  # Initial cursor
-            request_count = 0
+            month_data = self.month_cache.get(self.list_id, year, month)
+            if month_data is None:
+                month_data, complete = self.fetchDataForMonth(year, month)
+                # Never persist a month cut short by a network/parse error
+                if complete:
+                    self.month_cache.put(self.list_id, year, month, month_data)
+            
+            month_count = 0
+            for video in month_data:
+                # Skip if we've already seen this ID in a later month
+                if video['original_id'] in seen_ids:
+                    continue
+                seen_ids.add(video['original_id'])
+                self.video_index[video['original_id']] = video
+                self.search_index.add(video)
+                data.append(video)
+                month_count += 1
             
-            while cursor is not None and request_count < self.max_requests_per_month:
-                api_url = self.api_url_template.format(year=year, month=month, cursor=cursor)
+            print(f"Fetched {month_count} videos for {year}-{month:02d}")
+        
+        # Cache the results
+        self.data_cache[year] = data
+        print(f"Total: Fetched {len(data)} videos for year {year}")
+        return data
+    
+    def fetchDataForMonth(self, year, month):
+        """Walk one month's cursor chain.
+        
+        Returns (videos, complete); complete is False when the chain was
+        interrupted by an error rather than reaching its end.
+        """
+        data = []
+        seen_ids = set()
+        cursor = '0'  # Initial cursor
+        request_count = 0
+        complete = True
+        
+        while cursor is not None and request_count < self.max_requests_per_month:
+            api_url = self.api_url_template.format(year=year, month=month, cursor=cursor)
+            
+            try:
+                response = self.session.get(api_url, headers=self.headers, timeout=10)
+                response.raise_for_status()
+                raw_text = response.text
                 
-                try:
-                    response = self.session.get(api_url, headers=self.headers, timeout=10)
-                    response.raise_for_status()
-                    raw_text = response.text
-                    
-                    # Remove callback wrapper if present
-                    if "(" in raw_text and ")" in raw_text:
-                        raw_text = raw_text[raw_text.find("(") + 1 : raw_text.rfind(")")]
-                    
-                    json_data = json.loads(raw_text)
-                    
-                    # Get next cursor for pagination
-                    next_cursor = json_data.get("data", {}).get("cursor", None)
+                # Remove callback wrapper if present
+                if "(" in raw_text and ")" in raw_text:
+                    raw_text = raw_text[raw_text.find("(") + 1 : raw_text.rfind(")")]
+                
+                json_data = json.loads(raw_text)
+                
+                # Get next cursor for pagination
+                next_cursor = json_data.get("data", {}).get("cursor", None)
+                
+                if "data" in json_data and "list" in json_data["data"]:
+                    items = json_data["data"]["list"]
                     
-                    if "data" in json_data and "list" in json_data["data"]:
-                        items = json_data["data"]["list"]
+                    # If no items returned or we're getting duplicates, we've hit the end
+                    if not items:
+                        break
                         
-                        # If no items returned or we're getting duplicates, we've hit the end
-                        if not items:
-                            break
-                            
-                        new_items_count = 0
-                        for item in items:
-                            gid = item.get("gid", "")
-                            
-                            # Skip if we've already seen this ID
-                            if gid in seen_ids:
-                                continue
-                                
-                            seen_ids.add(gid)
-                            new_items_count += 1
-                            
-                            url = f"https://item.btime.com/{gid}" if gid else ""
-                            title = item.get("data", {}).get("title", "无标题")
-                            timestamp = int(item.get("data", {}).get("pdate", "0"))
-                            
-                            # Format date
-                            if timestamp > 0:
-                                beijing = timezone(timedelta(hours=8))
-                                date_str = datetime.fromtimestamp(timestamp, beijing).strftime("%Y年%m月%d日")
-                            else:
-                                date_str = "未知时间"
-                            
-                            # Get cover image
-                            cover = item.get("data", {}).get("covers", [""])[0]
-                            
-                            # Extract description if available
-                            desc = item.get("data", {}).get("detail", "")
-                            if not desc:
-                                desc = item.get("data", {}).get("summary", "")
-                            
-                            # Create video object
-                            video = {
-                                'vod_id': f"{year}_{gid}",
-                                'original_id': gid,
-                                'vod_name': title,
-                                'vod_pic': cover,
-                                'vod_url': url,
-                                'vod_content': desc,
-                                'vod_remarks': date_str,
-                                'vod_year': year
-                            }
-                            
-                            data.append(video)
+                    new_items_count = 0
+                    for item in items:
+                        gid = item.get("gid", "")
                         
-                        # If we didn't get any new items, or we don't have a next cursor, stop fetching
-                        if new_items_count == 0 or next_cursor is None or next_cursor == cursor:
-                            break
+                        # Skip if we've already seen this ID
+                        if gid in seen_ids:
+                            continue
                             
-                        cursor = next_cursor
-                    else:
-                        # No data available
+                        seen_ids.add(gid)
+                        new_items_count += 1
+                        
+                        url = f"https://item.btime.com/{gid}" if gid else ""
+                        title = item.get("data", {}).get("title", "无标题")
+                        timestamp = int(item.get("data", {}).get("pdate", "0"))
+                        
+                        # Format date
+                        if timestamp > 0:
+                            beijing = timezone(timedelta(hours=8))
+                            date_str = datetime.fromtimestamp(timestamp, beijing).strftime("%Y年%m月%d日")
+                        else:
+                            date_str = "未知时间"
+                        
+                        # Get cover image
+                        cover = item.get("data", {}).get("covers", [""])[0]
+                        
+                        # Extract description if available
+                        desc = item.get("data", {}).get("detail", "")
+                        if not desc:
+                            desc = item.get("data", {}).get("summary", "")
+                        
+                        # Create video object
+                        video = {
+                            'vod_id': f"{year}_{gid}",
+                            'original_id': gid,
+                            'vod_name': title,
+                            'vod_pic': cover,
+                            'vod_url': url,
+                            'vod_content': desc,
+                            'vod_remarks': date_str,
+                            'vod_year': year
+                        }
+                        
+                        data.append(video)
+                    
+                    # If we didn't get any new items, or we don't have a next cursor, stop fetching
+                    if new_items_count == 0 or next_cursor is None or next_cursor == cursor:
                         break
-                
-                except Exception as e:
-                    print(f"Error fetching data for {year}-{month} cursor {cursor}: {e}")
+                        
+                    cursor = next_cursor
+                else:
+                    # No data available
                     break
-                    
-                request_count += 1
+            
+            except Exception as e:
+                print(f"Error fetching data for {year}-{month} cursor {cursor}: {e}")
+                complete = False
+                break
                 
-                # Add a short delay to avoid overwhelming the API
-                time.sleep(0.5)
+            request_count += 1
             
-            print(f"Fetched {sum(1 for item in data if item['vod_year'] == year and f'月{month:02d}日' in item.get('vod_remarks', ''))} videos for {year}-{month:02d}")
+            # Add a short delay to avoid overwhelming the API
+            time.sleep(0.5)
         
-        # Cache the results
-        self.data_cache[year] = data
-        print(f"Total: Fetched {len(data)} videos for year {year}")
-        return data
+        return data, complete
     
     def fetchVideosForYear(self, year, limit=None):
         """Fetch videos for a specific year"""
@@ -338,3 +379,17 @@ class Spider(Spider):
             if parts[0] in self.available_years:
                 return parts[0], parts[1]
         return None, video_id
+    
+    def fetchVideoItem(self, gid, year):
+        """Fetch a single video from its item page (index miss fallback)"""
+        video = fetch_video_item(self.session, gid, self.headers)
+        if not video:
+            return None
+        video.update({
+            'vod_id': f"{year}_{gid}",
+            'original_id': gid,
+            'vod_remarks': f"{year}年视频",
+            'vod_year': year
+        })
+        self.video_index[gid] = video
+        return video
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""Latency history across update-clash-config runs, and stable node selection.
+
+Every run appends one row per tested node to a small CSV file that is
+committed next to cll2.yml:
+
+    time,node,score,median,p90,loss,selected
+
+`score` is NodeStats.score and is empty when every probe failed. A node's
+long-term score is computed over its last `window` runs:
+
+- an EWMA of its run scores, so recent runs weigh more;
+- the 75th percentile of its run scores, so one lucky run does not make a
+  node look fast;
+- these two averaged, then scaled up by the share of runs in which it was
+  dead.
+
+select() keeps the node chosen last time while it is alive and within
+`margin` of the best long-term score. Noise between runs therefore does not
+switch PLACEHOLDER_PROXY, or make clients reconnect, every day.
+
+Rows older than `max_age` days are dropped when the file is saved; otherwise
+new rows are only appended.
+
+    python latency_history.py latency_history.csv
+"""
+
+import csv
+import os
+import sys
+import time
+
+from clash_latency import percentile
+
+FIELDS = ('time', 'node', 'score', 'median', 'p90', 'loss', 'selected')
+
+
+def _number(value):
+    return float(value) if value not in ('', None) else None
+
+
+def _format(value):
+    if value is None or value == float('inf'):
+        return ''
+    return f'{value:.1f}'
+
+
+class LatencyHistory:
+    """Per-node run scores loaded from and appended to a CSV file"""
+
+    def __init__(self, path, window=14, alpha=0.3, margin=0.15, max_age=60):
+        self.path = path
+        self.window = window
+        self.alpha = alpha
+        self.margin = margin
+        self.max_age = max_age
+        self.rows = []
+        self.new_rows = []
+        if os.path.exists(path):
+            with open(path, newline='', encoding='utf-8') as f:
+                self.rows = [row for row in csv.DictReader(f)]
+        self.rows.sort(key=lambda row: int(row['time']))
+
+    def runs(self, node):
+        """Run scores of a node, oldest first; None for runs where it was dead"""
+        scores = [_number(row['score']) for row in self.rows + self.new_rows
+                  if row['node'] == node]
+        return scores[-self.window:]
+
+    def score(self, node):
+        """Long-term score (lower is better), or None without history"""
+        runs = self.runs(node)
+        finite = [s for s in runs if s is not None]
+        if not finite:
+            return None
+        ewma = finite[0]
+        for value in finite[1:]:
+            ewma = self.alpha * value + (1 - self.alpha) * ewma
+        dead = 1 - len(finite) / len(runs)
+        return (ewma + percentile(finite, 75)) / 2 * (1 + dead)
+
+    def current(self, pool=None):
+        """Node selected by the most recent run (among `pool`), or None"""
+        for row in reversed(self.rows + self.new_rows):
+            if row.get('selected') == '1' and (pool is None or row['node'] in pool):
+                return row['node']
+        return None
+
+    def record(self, ranking, now=None):
+        """Add one run of NodeStats results"""
+        now = int(now if now is not None else time.time())
+        for stats in ranking:
+            self.new_rows.append({
+                'time': str(now), 'node': stats.node,
+                'score': _format(stats.score) if stats.alive else '',
+                'median': _format(stats.median) if stats.alive else '',
+                'p90': _format(stats.p90) if stats.alive else '',
+                'loss': f'{stats.loss:.2f}', 'selected': '0',
+            })
+
+    def select(self, alive, pool=None):
+        """Pick a node among `alive` (this run's live nodes), marking it selected.
+
+        `pool` is every node competing for the same slot, e.g. all nodes of
+        one region, so each region keeps its own previous choice.
+        """
+        if not alive:
+            return None
+        scores = {node: self.score(node) for node in alive}
+        scores = {node: (score if score is not None else float('inf'))
+                  for node, score in scores.items()}
+        best = min(alive, key=lambda node: (scores[node], alive.index(node)))
+        current = self.current(pool if pool is not None else alive)
+        choice = best
+        if (current in scores and current != best
+                and scores[current] <= scores[best] * (1 + self.margin)):
+            print(f"Keeping {current} (long-term {scores[current]:.1f} ms); "
+                  f"{best} ({scores[best]:.1f} ms) is not better by {self.margin:.0%}")
+            choice = current
+        for row in self.new_rows:
+            if row['node'] == choice:
+                row['selected'] = '1'
+        return choice
+
+    def save(self):
+        cutoff = time.time() - self.max_age * 86400
+        kept = [row for row in self.rows if int(row['time']) >= cutoff]
+        if len(kept) == len(self.rows) and os.path.exists(self.path):
+            with open(self.path, 'a', newline='', encoding='utf-8') as f:
+                csv.DictWriter(f, FIELDS).writerows(self.new_rows)
+        else:
+            with open(self.path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, FIELDS)
+                writer.writeheader()
+                writer.writerows(kept + self.new_rows)
+        self.rows = kept + self.new_rows
+        self.new_rows = []
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print(f'Usage: {sys.argv[0]} HISTORY_FILE')
+        sys.exit(1)
+    history = LatencyHistory(sys.argv[1])
+    nodes = dict.fromkeys(row['node'] for row in history.rows)
+    ranked = sorted(nodes, key=lambda node: history.score(node) or float('inf'))
+    current = history.current()
+    for node in ranked:
+        runs = history.runs(node)
+        score = history.score(node)
+        score_text = f'{score:8.1f} ms' if score is not None else '    dead   '
+        mark = ' *' if node == current else ''
+        print(f'{node:30s} {score_text}  {sum(s is not None for s in runs)}/{len(runs)} runs alive{mark}')
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""Streaming M3U playlist parser and writer.
+
+Playlists are read line by line from any iterable of str/bytes lines, from a
+file path, or from an HTTP response stream. Entries are yielded one at a time,
+so a filter holds only the entry it is looking at. It can also stop reading
+(and drop the download) as soon as it has what it needs:
+
+    reader = M3UReader(iter_url_lines(url))
+    with open('out.m3u', 'w', encoding='utf-8') as f:
+        writer = M3UWriter(f, reader.header)
+        for entry in reader:
+            if entry.group_title == '卫视频道':
+                writer.write(entry)
+
+Each entry keeps:
+
+- the #EXTINF duration, attributes (tvg-id, tvg-name, tvg-logo,
+  group-title, ...) and display name;
+- #KODIPROP key/value pairs;
+- any other directive lines (#EXTVLCOPT, #EXTGRP, ...) verbatim;
+- the stream URL.
+
+Writing an entry back reproduces its lines.
+"""
+
+import codecs
+import re
+
+import requests
+
+# key="value" pairs in an #EXTINF line, e.g. tvg-logo="http://..."
+_ATTR_RE = re.compile(r'([\w-]+)="([^"]*)"')
+_LEADING_ATTR_RE = re.compile(r'\s*([\w-]+)="([^"]*)"')
+_DURATION_RE = re.compile(r'\s*(-?\d+(?:\.\d+)?)')
+
+
+def parse_extinf(line):
+    """'#EXTINF:-1 tvg-id="J" group-title="x",翡翠台' -> ('-1', {...}, '翡翠台')"""
+    body = line[len('#EXTINF:'):]
+    m = _DURATION_RE.match(body)
+    duration = m.group(1) if m else '-1'
+    pos = m.end() if m else 0
+
+    # The display name follows the first comma outside a quoted attribute value
+    attrs = {}
+    while True:
+        m = _LEADING_ATTR_RE.match(body, pos)
+        if not m:
+            break
+        attrs[m.group(1)] = m.group(2)
+        pos = m.end()
+    comma = body.find(',', pos)
+    name = body[comma + 1:].strip() if comma >= 0 else ''
+    return duration, attrs, name
+
+
+class Entry:
+    """One playlist entry: #EXTINF metadata, #KODIPROP pairs, extra lines, URL"""
+
+    __slots__ = ('duration', 'attrs', 'name', 'props', 'extras', 'url')
+
+    def __init__(self, name, url, attrs=None, duration='-1', props=None, extras=None):
+        self.duration = duration
+        self.attrs = attrs or {}
+        self.name = name
+        self.props = props          # [(key, value), ...] from #KODIPROP, or None
+        self.extras = extras        # other directive lines, verbatim, or None
+        self.url = url
+
+    @property
+    def tvg_id(self):
+        return self.attrs.get('tvg-id', '')
+
+    @property
+    def tvg_name(self):
+        return self.attrs.get('tvg-name', '')
+
+    @property
+    def tvg_logo(self):
+        return self.attrs.get('tvg-logo', '')
+
+    @property
+    def group_title(self):
+        return self.attrs.get('group-title', '')
+
+    def prop(self, key, default=None):
+        for k, v in self.props or ():
+            if k == key:
+                return v
+        return default
+
+    def extinf(self):
+        attrs = ''.join(f' {k}="{v}"' for k, v in self.attrs.items())
+        return f'#EXTINF:{self.duration}{attrs},{self.name}'
+
+    def lines(self):
+        yield self.extinf()
+        for key, value in self.props or ():
+            yield f'#KODIPROP:{key}={value}'
+        yield from self.extras or ()
+        yield self.url
+
+    def __str__(self):
+        return '\n'.join(self.lines()) + '\n'
+
+    def __repr__(self):
+        return f'Entry({self.name!r}, {self.url!r})'
+
+
+def read_lines(source):
+    """Lines of a path, file object or iterable, decoded and without line endings"""
+    if isinstance(source, str):
+        with open(source, encoding='utf-8', errors='replace') as f:
+            yield from read_lines(f)
+        return
+    for line in source:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', 'replace')
+        yield line.rstrip('\r\n')
+
+
+def iter_url_lines(url, session=None, timeout=15, chunk_size=65536, **kwargs):
+    """Stream the lines of a remote playlist; closing the generator drops the download"""
+    response = (session or requests).get(url, stream=True, timeout=timeout, **kwargs)
+    with response:
+        response.raise_for_status()
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        pending = ''
+        for chunk in response.iter_content(chunk_size):
+            pending += decoder.decode(chunk)
+            lines = pending.splitlines()
+            # The last piece may be an incomplete line, unless the chunk ended with a newline
+            pending = lines.pop() if lines and not pending.endswith(('\n', '\r')) else ''
+            yield from lines
+        pending += decoder.decode(b'', final=True)
+        if pending:
+            yield pending
+
+
+class M3UReader:
+    """Iterate the entries of a playlist; the #EXTM3U line is kept in `header`"""
+
+    def __init__(self, source):
+        self._source = source
+        self._lines = read_lines(source)
+        self.header = None
+        self._first = None
+        for line in self._lines:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('#EXTM3U'):
+                self.header = line
+            else:
+                self._first = line
+            break
+
+    @property
+    def header_attrs(self):
+        return dict(_ATTR_RE.findall(self.header or ''))
+
+    def _iter_lines(self):
+        if self._first is not None:
+            yield self._first
+            self._first = None
+        for line in self._lines:
+            line = line.strip()
+            if line:
+                yield line
+
+    def __iter__(self):
+        duration, attrs, name = '-1', {}, ''
+        props = extras = None
+        for line in self._iter_lines():
+            if line.startswith('#EXTINF:'):
+                duration, attrs, name = parse_extinf(line)
+            elif line.startswith('#KODIPROP:'):
+                key, _, value = line[len('#KODIPROP:'):].partition('=')
+                if props is None:
+                    props = []
+                props.append((key, value))
+            elif line.startswith('#'):
+                if extras is None:
+                    extras = []
+                extras.append(line)
+            else:
+                yield Entry(name, line, attrs, duration, props, extras)
+                duration, attrs, name = '-1', {}, ''
+                props = extras = None
+
+    def close(self):
+        """Stop reading the underlying source (e.g. drop an HTTP stream)"""
+        self._lines.close()
+        close = getattr(self._source, 'close', None)
+        if close:
+            close()
+
+
+def parse(source):
+    """Shortcut for iterating the entries of a playlist"""
+    return iter(M3UReader(source))
+
+
+class M3UWriter:
+    """Write entries to a text file object, header first"""
+
+    def __init__(self, f, header='#EXTM3U'):
+        self.f = f
+        self.count = 0
+        f.write((header or '#EXTM3U') + '\n')
+
+    def write(self, entry):
+        self.f.write(str(entry))
+        self.count += 1
+
+    def write_all(self, entries):
+        for entry in entries:
+            self.write(entry)
+        return self.count
+
+
+def write_playlist(path, entries, header='#EXTM3U'):
+    """Write entries to `path`, returning how many were written"""
+    with open(path, 'w', encoding='utf-8') as f:
+        return M3UWriter(f, header).write_all(entries)
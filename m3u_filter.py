@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""Declarative channel filters for M3U playlists.
+
+A filter spec lists `include` and `exclude` rules. Each rule is a dict of
+conditions that must all hold:
+
+    name:    regex searched in the display name (or tvg-name)
+    group:   regex searched in group-title
+    tvg_id:  exact tvg-id, or a list of them
+    host:    URL host; 'example.com' also matches its subdomains
+
+Any condition may be given as a list, meaning "any of these". An entry is kept
+if it matches any include rule (or there are no include rules) and matches no
+exclude rule:
+
+    {"include": [{"group": "公告"}, {"name": ["凤凰", "翡翠"]}],
+     "exclude": [{"host": "example.com"}]}
+
+compile_filter() compiles a spec once. Rules with a single condition are
+merged per field into one alternation regex (name/group) or one hash set
+(tvg_id/host). Multi-condition rules are checked in order after that. The
+result is a plain predicate, applied in a single streaming pass:
+
+    python m3u_filter.py spec.json http://host/live.m3u out.m3u
+"""
+
+import json
+import re
+import sys
+from urllib.parse import urlsplit
+
+from m3u import M3UReader, M3UWriter, iter_url_lines
+
+FIELDS = ('name', 'group', 'tvg_id', 'host')
+
+
+def _as_list(value):
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+def _regex(patterns):
+    return re.compile('|'.join(f'(?:{p})' for p in patterns))
+
+
+def _host(entry):
+    try:
+        return (urlsplit(entry.url).hostname or '').lower()
+    except ValueError:
+        return ''
+
+
+def _host_matches(host, hosts):
+    """Exact host or any parent domain in `hosts`"""
+    if host in hosts:
+        return True
+    dot = host.find('.')
+    while dot >= 0:
+        if host[dot + 1:] in hosts:
+            return True
+        dot = host.find('.', dot + 1)
+    return False
+
+
+class _Matcher:
+    """A compiled set of rules; `match(entry)` is True if any rule holds"""
+
+    def __init__(self, rules):
+        names, groups, tvg_ids, hosts = [], [], set(), set()
+        self.compound = []
+        for rule in rules:
+            unknown = set(rule) - set(FIELDS)
+            if unknown:
+                raise ValueError(f'Unknown filter field(s): {", ".join(sorted(unknown))}')
+            if not rule:
+                raise ValueError('Empty filter rule')
+            if len(rule) > 1:
+                self.compound.append(self._compile_rule(rule))
+                continue
+            (field, value), = rule.items()
+            values = _as_list(value)
+            if field == 'name':
+                names.extend(values)
+            elif field == 'group':
+                groups.extend(values)
+            elif field == 'tvg_id':
+                tvg_ids.update(values)
+            else:
+                hosts.update(v.lower() for v in values)
+        self.name_re = _regex(names) if names else None
+        self.group_re = _regex(groups) if groups else None
+        self.tvg_ids = tvg_ids
+        self.hosts = hosts
+        self.empty = not (names or groups or tvg_ids or hosts or self.compound)
+
+    @staticmethod
+    def _compile_rule(rule):
+        checks = []
+        if 'name' in rule:
+            name_re = _regex(_as_list(rule['name']))
+            checks.append(lambda e: name_re.search(e.name) or name_re.search(e.tvg_name))
+        if 'group' in rule:
+            group_re = _regex(_as_list(rule['group']))
+            checks.append(lambda e: group_re.search(e.group_title))
+        if 'tvg_id' in rule:
+            tvg_ids = set(_as_list(rule['tvg_id']))
+            checks.append(lambda e: e.tvg_id in tvg_ids)
+        if 'host' in rule:
+            hosts = {h.lower() for h in _as_list(rule['host'])}
+            checks.append(lambda e: _host_matches(_host(e), hosts))
+        return lambda e: all(check(e) for check in checks)
+
+    def match(self, entry):
+        if self.name_re and (self.name_re.search(entry.name)
+                             or self.name_re.search(entry.tvg_name)):
+            return True
+        if self.group_re and self.group_re.search(entry.group_title):
+            return True
+        if self.tvg_ids and entry.tvg_id in self.tvg_ids:
+            return True
+        if self.hosts and _host_matches(_host(entry), self.hosts):
+            return True
+        return any(rule(entry) for rule in self.compound)
+
+
+class ChannelFilter:
+    """Predicate compiled from a filter spec"""
+
+    def __init__(self, spec):
+        unknown = set(spec) - {'include', 'exclude'}
+        if unknown:
+            raise ValueError(f'Unknown filter spec key(s): {", ".join(sorted(unknown))}')
+        self.include = _Matcher(spec.get('include') or [])
+        self.exclude = _Matcher(spec.get('exclude') or [])
+
+    def __call__(self, entry):
+        if not self.include.empty and not self.include.match(entry):
+            return False
+        return self.exclude.empty or not self.exclude.match(entry)
+
+    def filter(self, entries):
+        return (entry for entry in entries if self(entry))
+
+
+def compile_filter(spec):
+    return spec if isinstance(spec, ChannelFilter) else ChannelFilter(spec)
+
+
+def load_spec(path):
+    """Read a spec from a .json or .yml/.yaml file"""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yml', '.yaml')):
+            import yaml
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def open_source(source):
+    """M3UReader for a local path or an http(s) URL"""
+    if source.startswith(('http://', 'https://')):
+        return M3UReader(iter_url_lines(source))
+    return M3UReader(source)
+
+
+def extract(source, output, spec):
+    """Write the entries of `source` matching `spec` to `output`; returns the count"""
+    keep = compile_filter(spec)
+    reader = open_source(source)
+    try:
+        with open(output, 'w', encoding='utf-8') as f:
+            return M3UWriter(f, reader.header).write_all(keep.filter(reader))
+    finally:
+        reader.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4:
+        print(f'Usage: {sys.argv[0]} SPEC SOURCE OUTPUT')
+        sys.exit(1)
+    count = extract(sys.argv[2], sys.argv[3], load_spec(sys.argv[1]))
+    print(f'Wrote {count} entries to {sys.argv[3]}')
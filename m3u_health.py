@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""Concurrent liveness check for large M3U playlists such as zubo.m3u.
+
+Each entry is probed with a plain asyncio HTTP/1.1 GET. Thousands of probes
+can be in flight at once, with a separate cap per host so a single relay is
+not flooded. A probe reads only the first `read_bytes` of the body. The
+stream counts as alive when that data holds MPEG-TS packets (0x47 sync byte
+every 188 bytes) or an HLS playlist. Each probe records:
+
+- latency: time to the first body byte, in ms;
+- bitrate: body bytes received per second after the first chunk, in kbit/s.
+
+Dead entries are dropped from the output. The remaining entries are sorted
+by latency, unless --keep-order is given. The probe results can be saved as
+JSON (url -> result) for later stages such as merging duplicate sources:
+
+    python m3u_health.py zubo.m3u zubo.m3u --results zubo_health.json
+"""
+
+import argparse
+import asyncio
+import json
+import ssl
+import time
+from urllib.parse import urljoin, urlsplit
+
+from m3u import M3UReader, M3UWriter
+
+TS_PACKET = 188
+TS_SYNC = 0x47
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+
+def looks_like_ts(data, packets=3):
+    """True if `packets` consecutive 188-byte TS packets start within the data"""
+    need = TS_PACKET * (packets - 1)
+    for offset in range(min(TS_PACKET, len(data) - need)):
+        if all(data[offset + i * TS_PACKET] == TS_SYNC for i in range(packets)):
+            return True
+    return False
+
+
+def classify(data):
+    """'ts', 'hls' or None for the first bytes of a response body"""
+    if looks_like_ts(data):
+        return 'ts'
+    if data.lstrip()[:7] == b'#EXTM3U':
+        return 'hls'
+    return None
+
+
+class ProbeResult:
+    __slots__ = ('url', 'ok', 'kind', 'latency', 'bitrate', 'error')
+
+    def __init__(self, url, ok=False, kind=None, latency=None, bitrate=None, error=None):
+        self.url = url
+        self.ok = ok
+        self.kind = kind
+        self.latency = latency      # ms to first body byte
+        self.bitrate = bitrate      # kbit/s over the bytes read, None if unknown
+        self.error = error
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__ if key != 'url'}
+
+    @classmethod
+    def from_dict(cls, url, data):
+        return cls(url, **{key: data.get(key) for key in cls.__slots__ if key != 'url'})
+
+    def __repr__(self):
+        if self.ok:
+            rate = f'{self.bitrate:.0f} kbit/s' if self.bitrate is not None else 'rate unknown'
+            return f'ProbeResult({self.url!r}, {self.kind}, {self.latency:.0f} ms, {rate})'
+        return f'ProbeResult({self.url!r}, dead: {self.error})'
+
+
+class ProbeError(Exception):
+    pass
+
+
+async def _read_headers(reader):
+    status_line = await reader.readline()
+    parts = status_line.decode('latin-1').split(None, 2)
+    if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+        raise ProbeError(f'bad status line {status_line[:40]!r}')
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+    return int(parts[1]), headers
+
+
+async def _read_body(reader, headers, limit):
+    """Up to `limit` body bytes; returns (data, time of first byte, size of first chunk)"""
+    chunked = 'chunked' in headers.get('transfer-encoding', '').lower()
+    data = bytearray()
+    first_byte_at = None
+    first_len = 0
+    while len(data) < limit:
+        if chunked:
+            size_line = await reader.readline()
+            size = int(size_line.split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                break
+            chunk = await reader.readexactly(size)
+            await reader.readline()
+        else:
+            chunk = await reader.read(limit - len(data))
+            if not chunk:
+                break
+        if first_byte_at is None:
+            first_byte_at = time.perf_counter()
+            first_len = min(len(chunk), limit)
+        data += chunk
+    return bytes(data[:limit]), first_byte_at, first_len
+
+
+class HealthChecker:
+    """Probe many stream URLs concurrently"""
+
+    def __init__(self, timeout=5, read_bytes=16384, concurrency=1000, per_host=8,
+                 max_redirects=3):
+        self.timeout = timeout
+        self.read_bytes = read_bytes
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.max_redirects = max_redirects
+        self._ssl = ssl.create_default_context()
+
+    async def _get(self, url):
+        """(data, seconds to first byte, bitrate in kbit/s) for one GET, following redirects"""
+        started = time.perf_counter()
+        for _ in range(self.max_redirects + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ('http', 'https') or not parts.hostname:
+                raise ProbeError(f'unsupported URL {url}')
+            https = parts.scheme == 'https'
+            port = parts.port or (443 if https else 80)
+            path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+
+            reader, writer = await asyncio.open_connection(
+                parts.hostname, port, ssl=self._ssl if https else None)
+            try:
+                writer.write((f'GET {path} HTTP/1.1\r\n'
+                              f'Host: {parts.netloc}\r\n'
+                              f'User-Agent: {USER_AGENT}\r\n'
+                              'Accept: */*\r\n'
+                              'Connection: close\r\n\r\n').encode('latin-1'))
+                await writer.drain()
+                status, headers = await _read_headers(reader)
+                if status in (301, 302, 303, 307, 308) and 'location' in headers:
+                    url = urljoin(url, headers['location'])
+                    continue
+                if status != 200:
+                    raise ProbeError(f'HTTP {status}')
+                data, first_byte_at, first_len = await _read_body(reader, headers, self.read_bytes)
+                if first_byte_at is None:
+                    raise ProbeError('empty body')
+                # Rate of the bytes that arrived after the first chunk; None if
+                # everything came in at once
+                reading = time.perf_counter() - first_byte_at
+                rest = len(data) - first_len
+                bitrate = rest * 8 / 1000 / reading if rest and reading > 0 else None
+                return data, first_byte_at - started, bitrate
+            finally:
+                writer.close()
+        raise ProbeError('too many redirects')
+
+    async def probe(self, url, limit, host_limits):
+        host = urlsplit(url).netloc
+        sem = host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+        # Wait for the host slot first so queued probes of one busy host do not
+        # hold global slots
+        async with sem, limit:
+            try:
+                data, ttfb, bitrate = await asyncio.wait_for(self._get(url), self.timeout)
+            except asyncio.TimeoutError:
+                return ProbeResult(url, error='timeout')
+            except (OSError, ProbeError, ValueError, asyncio.IncompleteReadError) as e:
+                return ProbeResult(url, error=str(e) or type(e).__name__)
+        kind = classify(data)
+        if kind is None:
+            return ProbeResult(url, error='not a TS/HLS stream')
+        return ProbeResult(url, True, kind, ttfb * 1000, bitrate)
+
+    async def check_async(self, urls):
+        limit = asyncio.Semaphore(self.concurrency)
+        host_limits = {}
+        unique = list(dict.fromkeys(urls))
+        results = await asyncio.gather(*(self.probe(url, limit, host_limits) for url in unique))
+        return {result.url: result for result in results}
+
+    def check(self, urls):
+        """{url: ProbeResult} for every distinct URL"""
+        return asyncio.run(self.check_async(urls))
+
+
+def prune(entries, results, keep_order=False):
+    """Live entries only, fastest first unless keep_order"""
+    alive = [entry for entry in entries
+             if entry.url in results and results[entry.url].ok]
+    if not keep_order:
+        # sort() is stable, so equal latencies keep the playlist order
+        alive.sort(key=lambda entry: results[entry.url].latency)
+    return alive
+
+
+def save_results(path, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({url: result.to_dict() for url, result in results.items()},
+                  f, ensure_ascii=False, indent=0)
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return {url: ProbeResult.from_dict(url, data) for url, data in json.load(f).items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check stream liveness and prune an M3U playlist')
+    parser.add_argument('source')
+    parser.add_argument('output')
+    parser.add_argument('--results', help='save probe results as JSON')
+    parser.add_argument('--timeout', type=float, default=5)
+    parser.add_argument('--read-bytes', type=int, default=16384)
+    parser.add_argument('--concurrency', type=int, default=1000)
+    parser.add_argument('--per-host', type=int, default=8)
+    parser.add_argument('--keep-order', action='store_true',
+                        help='keep playlist order instead of sorting by latency')
+    args = parser.parse_args(argv)
+
+    reader = M3UReader(args.source)
+    header = reader.header
+    entries = list(reader)
+    checker = HealthChecker(args.timeout, args.read_bytes, args.concurrency, args.per_host)
+
+    started = time.time()
+    results = checker.check(entry.url for entry in entries)
+    alive = prune(entries, results, args.keep_order)
+    print(f'{len(alive)}/{len(entries)} entries alive '
+          f'({len(results)} distinct URLs checked in {time.time() - started:.1f}s)')
+
+    if args.results:
+        save_results(args.results, results)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        M3UWriter(f, header).write_all(alive)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""Merge duplicate channels in large M3U playlists.
+
+Entries are grouped in a dict keyed by a normalized channel name, or by
+tvg-id with --by-tvg-id. The name is normalized as follows:
+
+- NFKC, upper case;
+- spaces, dashes and quality tags such as HD/高清 removed;
+- CCTV names reduced to their number, so "CCTV1综合", "CCTV-1" and "CCTV1"
+  are one channel. The UHD channels CCTV4K and CCTV8K stay apart from
+  CCTV4 and CCTV8.
+
+Each channel keeps at most N sources. With m3u_health results, dead URLs
+are dropped and the rest are ordered by measured latency, with unchecked URLs
+last. Without results, the playlist order is kept. Identical URLs are kept once.
+
+The output is either
+  - a compact M3U with each channel's sources listed together, or
+  - with --multi, one entry per channel whose URL is TVBox's multi-source
+    form "url#url#url" (M3U, or TVBox txt with --format txt).
+
+    python m3u_merge.py zubo.m3u zubo.m3u --results zubo_health.json -n 3
+"""
+
+import argparse
+import re
+import unicodedata
+
+from m3u import Entry, M3UReader, M3UWriter
+from m3u_health import load_results
+
+# Quality / definition tags that do not make a different channel
+_QUALITY_RE = re.compile(r'(?:超高清|高清|超清|标清|蓝光|FHD|UHD|HD|频道)$')
+# 4K/8K first: otherwise \d{1,2} takes the 4 of CCTV4K and it becomes CCTV4
+_CCTV_RE = re.compile(r'^CCTV(?:(4K|8K)|(\d{1,2}\+?)(欧洲|美洲|4K|8K)?)')
+_SEPARATORS_RE = re.compile(r'[\s\-_·•]+')
+
+
+def normalize_name(name):
+    key = _SEPARATORS_RE.sub('', unicodedata.normalize('NFKC', name).upper())
+    m = _CCTV_RE.match(key)
+    if m:
+        return 'CCTV' + ''.join(group for group in m.groups() if group)
+    while True:
+        stripped = _QUALITY_RE.sub('', key)
+        if stripped == key or not stripped:
+            return key
+        key = stripped
+
+
+def channel_key(entry, by_tvg_id=False):
+    if by_tvg_id and entry.tvg_id:
+        return 'id:' + entry.tvg_id
+    return normalize_name(entry.tvg_name or entry.name)
+
+
+class Channel:
+    """The first entry seen for a channel plus all of its source URLs"""
+
+    __slots__ = ('entry', 'urls')
+
+    def __init__(self, entry):
+        self.entry = entry
+        self.urls = {}      # url -> playlist position, insertion-ordered
+
+    def add(self, url, position):
+        self.urls.setdefault(url, position)
+
+    def sources(self, results=None, limit=None):
+        """URLs best first: live by latency, then unchecked, in playlist order"""
+        if results is None:
+            urls = list(self.urls)
+        else:
+            def rank(url):
+                result = results.get(url)
+                if result is None:
+                    return (1, 0, self.urls[url])
+                return (0, result.latency, self.urls[url])
+            urls = sorted((url for url in self.urls
+                           if url not in results or results[url].ok), key=rank)
+        return urls[:limit] if limit else urls
+
+
+def group_channels(entries, by_tvg_id=False):
+    """{key: Channel} in order of first appearance"""
+    channels = {}
+    for position, entry in enumerate(entries):
+        key = channel_key(entry, by_tvg_id)
+        channel = channels.get(key)
+        if channel is None:
+            channel = channels[key] = Channel(entry)
+        channel.add(entry.url, position)
+    return channels
+
+
+def _with_url(entry, url):
+    return Entry(entry.name, url, entry.attrs, entry.duration, entry.props, entry.extras)
+
+
+def merged_entries(channels, results=None, max_sources=None, multi=False):
+    """Output entries, one per source or (multi) one per channel"""
+    for channel in channels.values():
+        urls = channel.sources(results, max_sources)
+        if not urls:
+            continue
+        if multi:
+            yield _with_url(channel.entry, '#'.join(urls))
+        else:
+            for url in urls:
+                yield _with_url(channel.entry, url)
+
+
+def write_txt(f, entries):
+    """TVBox txt playlist: '分组,#genre#' headers and 'name,url' lines"""
+    group = None
+    count = 0
+    for entry in entries:
+        if entry.group_title != group:
+            group = entry.group_title
+            if group:
+                f.write(f'{group},#genre#\n')
+        f.write(f'{entry.name},{entry.url}\n')
+        count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Merge duplicate channels in an M3U playlist')
+    parser.add_argument('source')
+    parser.add_argument('output')
+    parser.add_argument('--results', help='m3u_health JSON results to rank and prune sources')
+    parser.add_argument('-n', '--max-sources', type=int, default=None,
+                        help='keep at most N sources per channel')
+    parser.add_argument('--multi', action='store_true',
+                        help='one entry per channel with url#url#url sources')
+    parser.add_argument('--format', choices=('m3u', 'txt'), default='m3u')
+    parser.add_argument('--by-tvg-id', action='store_true',
+                        help='group by tvg-id where present instead of by name')
+    args = parser.parse_args(argv)
+
+    results = load_results(args.results) if args.results else None
+
+    reader = M3UReader(args.source)
+    header = reader.header
+    channels = group_channels(reader, args.by_tvg_id)
+    entries = merged_entries(channels, results, args.max_sources, args.multi)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        if args.format == 'txt':
+            count = write_txt(f, entries)
+        else:
+            count = M3UWriter(f, header).write_all(entries)
+    print(f'{len(channels)} channels, {count} entries written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
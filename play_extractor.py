@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# 超级装详情页的播放地址提取器
+#
+# 原来 playerContent 依次对整页 HTML 跑 6 次 re.findall/re.search。这里把 6 种规则
+# 合并成一个预编译的交替正则，只扫描一遍，记录每种规则的第一个命中，最后按原来的
+# 优先级返回结果。支持边下载边 feed()：看到 .tc.qq.com 的 mp4 直链（最高优先级）
+# 就返回 True，调用方可以立即中止下载。extract_url() 直接从 HttpClient 流式读取，
+# 两个超级装爬虫共用。
+# 需要与爬虫文件放在同一目录。
+
+import codecs
+import re
+import time
+from contextlib import closing
+
+_URL_CHARS = r'[^\'"\s]'
+
+# 规则按优先级排列；tc 与 media 开头相同，tc 必须排在前面
+PATTERN = re.compile('|'.join([
+    rf'(?P<tc>https?://{_URL_CHARS}*?\.tc\.qq\.com{_URL_CHARS}*?\.mp4{_URL_CHARS}*)',
+    rf'(?P<media>https?://{_URL_CHARS}*?(?:\.mp4|\.m3u8){_URL_CHARS}*)',
+    r'vid\s*[=:]\s*[\'"](?P<vid>[^\'"]+)[\'"]',
+    r'templatePath\s*[=:]\s*[\'"](?P<template>[^\'"]+)[\'"]',
+    r'<video[^>]*src=[\'"](?P<video>[^\'"]+)[\'"]',
+    r'new\s+Player\s*\(\s*\{\s*url\s*:\s*[\'"](?P<player>[^\'"]+)[\'"]',
+    r'<iframe[^>]*src=[\'"](?P<iframe>[^\'"]+)[\'"]',
+]))
+
+TC_RE = re.compile(rf'https?://{_URL_CHARS}*?\.tc\.qq\.com{_URL_CHARS}*?\.mp4{_URL_CHARS}*')
+MEDIA_RE = re.compile(rf'https?://{_URL_CHARS}*?(?:\.mp4|\.m3u8){_URL_CHARS}*')
+
+
+def _unescape(url):
+    return url.replace('\\/', '/').replace('\\u002F', '/')
+
+
+def _absolute(url):
+    return 'https:' + url if url.startswith('//') else url
+
+
+class PlayExtractor:
+    """单次扫描、可增量喂入的播放地址提取器"""
+
+    # 增量扫描时回看的字符数，保证跨块的标签/URL 不会漏掉
+    OVERLAP = 1024
+
+    def __init__(self):
+        self.found = {}
+        self._buf = ''
+
+    def _record(self, kind, value):
+        # <video>/<iframe>/Player 里嵌着的直链同样计入 tc / media；
+        # 合并正则已经吃掉了这段文本，所以必须在 iframe 过滤之前检查
+        if kind in ('video', 'player', 'iframe'):
+            m = TC_RE.search(value)
+            if m:
+                self.found.setdefault('tc', m.group())
+            m = MEDIA_RE.search(value)
+            if m:
+                self.found.setdefault('media', m.group())
+        if kind == 'iframe' and 'v.qq.com' not in value:
+            return
+        self.found.setdefault(kind, value)
+
+    def feed(self, text, final=False):
+        """追加一段页面文本；已找到 tc 直链时返回 True，可以停止下载"""
+        buf = self._buf + text
+        end = len(buf)
+        consumed = 0
+        deferred = end
+        for m in PATTERN.finditer(buf):
+            if not final and m.end() >= end:
+                # 命中到了当前末尾，可能被截断，等下一块再扫
+                deferred = m.start()
+                break
+            self._record(m.lastgroup, m.group(m.lastgroup))
+            if 'tc' in self.found:
+                return True
+            consumed = m.end()
+        # 末尾 OVERLAP 个字符里可能有还没写完的标签/URL，留到下一块一起扫
+        keep = min(deferred, max(consumed, end - self.OVERLAP))
+        self._buf = buf[keep:]
+        return 'tc' in self.found
+
+    def result(self):
+        """按原有优先级返回 (parse, url, 方法名)，没有命中返回 None"""
+        found = self.found
+        if 'tc' in found:
+            return 0, _unescape(found['tc']), '方法1'
+        if 'vid' in found and 'template' in found:
+            # 返回腾讯视频页面，让TVBox的解析器处理
+            return 1, f"https://v.qq.com/x/page/{found['vid']}.html", '方法2'
+        if 'video' in found:
+            return 0, _absolute(found['video']), '方法3'
+        if 'player' in found:
+            return 0, _absolute(found['player']), '方法4'
+        if 'iframe' in found:
+            return 1, _absolute(found['iframe']), '方法5'
+        if 'media' in found:
+            return 0, _unescape(found['media']), '方法6'
+        return None
+
+
+def extract(html):
+    """对完整页面做一次提取"""
+    extractor = PlayExtractor()
+    extractor.feed(html, final=True)
+    return extractor.result()
+
+
+def extract_stream(chunks):
+    """从字节块迭代器边读边提取，命中 tc 直链即停止读取"""
+    extractor = PlayExtractor()
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    for chunk in chunks:
+        if extractor.feed(decoder.decode(chunk)):
+            return extractor.result()
+    extractor.feed(decoder.decode(b'', final=True), final=True)
+    return extractor.result()
+
+
+def extract_url(session, page_url, headers=None, timeout=10, cache=None, ttl=3600):
+    """下载并提取详情页的播放地址，命中 tc.qq.com 直链即断开
+
+    session 为 tvbox_http.HttpClient；传入 cache（dict）时结果按页面缓存 ttl 秒，
+    mp4 的 vkey 会过期，所以不永久缓存。
+    """
+    if cache is not None:
+        cached = cache.get(page_url)
+        if cached and cached[1] > time.time():
+            return cached[0]
+
+    with closing(session.iter_bytes(page_url, headers=headers, timeout=timeout)) as chunks:
+        found = extract_stream(chunks)
+
+    if found and cache is not None:
+        cache[page_url] = (found, time.time() + ttl)
+    return found
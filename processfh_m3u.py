@@ -1,26 +1,26 @@
-import requests
+from m3u_filter import extract
 
-def process_m3u():
-    url = "https://raw.githubusercontent.com/xiongjian83/TvBox/main/live.m3u"
-    response = requests.get(url)
-    content = response.text.splitlines()
-
-    header = content[:3]
-    phoenix_content = []
-    capture = False
+# 与原先按位置截取（从第一个凤凰到翡翠台）发布的内容相同：
+# 公告（更新日期）、卫视和各省频道分组，以及香港频道里的翡翠台。
+# 按分组选取，不依赖上游的频道顺序
+FH_GROUPS = [
+    "卫视频道", "江西频道", "北京频道", "上海频道", "浙江频道", "江苏频道",
+    "广东频道", "湖南频道", "福建频道", "湖北频道", "天津频道", "安徽频道",
+    "河南频道", "河北频道", "重庆频道", "四川频道", "陕西频道", "广西频道",
+]
 
-    for line in content:
-        if "凤凰" in line:
-            capture = True
-        if capture:
-            phoenix_content.append(line)
-        if "翡翠" in line:
-            phoenix_content.append(line)
-            break
+FH_FILTER = {
+    "include": [
+        {"group": "公告"},
+        {"group": FH_GROUPS},
+        {"group": "香港频道", "name": "翡翠"},
+    ],
+}
 
-    with open("fh.m3u", "w", encoding="utf-8") as f:
-        f.write("\n".join(header) + "\n")
-        f.write("\n".join(phoenix_content))
+def process_m3u():
+    url = "https://raw.githubusercontent.com/xiongjian83/TvBox/main/live.m3u"
+    count = extract(url, "fh.m3u", FH_FILTER)
+    print(f"fh.m3u: {count} 个频道")
 
 if __name__ == "__main__":
     process_m3u()
@@ -0,0 +1,519 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""Convert Clash proxies to other subscription formats.
+
+Converters are registered per (backend, proxy type) with @converter. Each
+one maps a Clash proxy dict to one output item. Transport and TLS options are
+read once into plain dicts by `transport()` / `tls()`, so every backend maps
+the same fields:
+
+- ws / grpc / h2 / http / httpupgrade, with path, host and service name;
+- sni, alpn, skip-cert-verify and the uTLS fingerprint;
+- reality public key and short id, and the vless flow.
+
+Backends:
+    passwall        share links (vmess://, vless://, ss://, ...), base64 subscription
+    singbox         sing-box outbound objects, JSON document
+    clash-provider  cleaned-up Clash proxy dicts, proxy-provider YAML
+
+Proxies of types a backend does not support are skipped and counted.
+
+    python proxy_convert.py singbox cll2.yml out.json
+    python proxy_convert.py --bench cll2.yml collectproxy.yml
+"""
+
+import base64
+import json
+import sys
+import time
+from collections import Counter
+from urllib.parse import quote, urlencode
+
+import yaml
+
+from clash_yaml import load_proxies
+
+CONVERTERS = {}     # backend -> {proxy type: function}
+
+
+class _Dumper(getattr(yaml, 'CSafeDumper', yaml.SafeDumper)):
+    # Proxies may share nested option dicts; write them out instead of &id001 anchors
+    def ignore_aliases(self, data):
+        return True
+
+
+def converter(backend, *types):
+    def register(func):
+        for proxy_type in types:
+            CONVERTERS.setdefault(backend, {})[proxy_type] = func
+        return func
+    return register
+
+
+# --- shared field mapping ---
+
+def b64(text, urlsafe=False, pad=True):
+    raw = text.encode('utf-8')
+    encoded = (base64.urlsafe_b64encode(raw) if urlsafe else base64.b64encode(raw)).decode()
+    return encoded if pad else encoded.rstrip('=')
+
+
+def _first(value):
+    if isinstance(value, (list, tuple)):
+        return value[0] if value else ''
+    return value or ''
+
+
+def _header(headers, name):
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return _first(value)
+    return ''
+
+
+def transport(node):
+    """{'type', 'path', 'host', 'service_name', 'headers'} for the node's network"""
+    network = node.get('network') or 'tcp'
+    if network == 'ws':
+        opts = node.get('ws-opts') or {}
+        # Old-style keys some subscriptions still use
+        path = opts.get('path', node.get('ws-path', '/'))
+        headers = opts.get('headers') or node.get('ws-headers') or {}
+        kind = 'httpupgrade' if opts.get('v2ray-http-upgrade') else 'ws'
+        return {'type': kind, 'path': path or '/', 'host': _header(headers, 'host'),
+                'headers': headers, 'max_early_data': opts.get('max-early-data'),
+                'early_data_header': opts.get('early-data-header-name')}
+    if network == 'grpc':
+        opts = node.get('grpc-opts') or {}
+        return {'type': 'grpc', 'service_name': opts.get('grpc-service-name', '')}
+    if network == 'h2':
+        opts = node.get('h2-opts') or {}
+        return {'type': 'h2', 'path': opts.get('path', '/'), 'host': _first(opts.get('host'))}
+    if network == 'http':
+        opts = node.get('http-opts') or {}
+        return {'type': 'http', 'path': _first(opts.get('path')) or '/',
+                'host': _header(opts.get('headers'), 'host'), 'method': opts.get('method')}
+    return {'type': 'tcp'}
+
+
+def tls(node):
+    """TLS settings, or None when the node does not use TLS"""
+    reality = node.get('reality-opts')
+    enabled = node.get('tls') or reality or node['type'] in ('trojan', 'hysteria2', 'tuic')
+    if not enabled:
+        return None
+    return {
+        'sni': node.get('servername') or node.get('sni') or '',
+        'alpn': node.get('alpn') or [],
+        'insecure': bool(node.get('skip-cert-verify')),
+        'fingerprint': node.get('client-fingerprint') or '',
+        'reality': ({'public_key': reality.get('public-key', ''),
+                     'short_id': reality.get('short-id', '')} if reality else None),
+    }
+
+
+def _name(node):
+    return node.get('name', 'Unnamed')
+
+
+# --- passwall share links ---
+
+def _link_params(node, security=True):
+    """Query parameters shared by vless:// and trojan:// links"""
+    params = {}
+    net = transport(node)
+    params['type'] = {'h2': 'http', 'http': 'tcp'}.get(net['type'], net['type'])
+    if net['type'] == 'http':
+        params['headerType'] = 'http'
+    if net.get('path'):
+        params['path'] = net['path']
+    if net.get('host'):
+        params['host'] = net['host']
+    if net.get('service_name'):
+        params['serviceName'] = net['service_name']
+    t = tls(node)
+    if security:
+        params['security'] = 'reality' if t and t['reality'] else 'tls' if t else 'none'
+    if t:
+        if t['sni']:
+            params['sni'] = t['sni']
+        if t['alpn']:
+            params['alpn'] = ','.join(t['alpn'])
+        if t['fingerprint']:
+            params['fp'] = t['fingerprint']
+        if t['insecure']:
+            params['allowInsecure'] = '1'
+        if t['reality']:
+            params['pbk'] = t['reality']['public_key']
+            if t['reality']['short_id']:
+                params['sid'] = t['reality']['short_id']
+    return params
+
+
+def _host_port(node):
+    server = str(node['server'])
+    if ':' in server:
+        server = f'[{server}]'
+    return f"{server}:{node['port']}"
+
+
+@converter('passwall', 'vmess')
+def passwall_vmess(node):
+    net = transport(node)
+    t = tls(node)
+    data = {
+        'v': '2',
+        'ps': _name(node),
+        'add': node['server'],
+        'port': str(node['port']),
+        'id': node['uuid'],
+        'aid': str(node.get('alterId', 0)),
+        'scy': node.get('cipher', 'auto'),
+        'net': {'httpupgrade': 'httpupgrade', 'http': 'tcp'}.get(net['type'], net['type']),
+        'type': 'http' if net['type'] == 'http' else 'none',
+        'host': net.get('host', ''),
+        'path': net.get('path') or net.get('service_name', ''),
+        'tls': 'tls' if t else '',
+        'sni': t['sni'] if t else '',
+        'alpn': ','.join(t['alpn']) if t else '',
+        'fp': t['fingerprint'] if t else '',
+    }
+    return 'vmess://' + b64(json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+
+
+@converter('passwall', 'vless')
+def passwall_vless(node):
+    params = {'encryption': 'none'}
+    if node.get('flow'):
+        params['flow'] = node['flow']
+    params.update(_link_params(node))
+    return (f"vless://{node['uuid']}@{_host_port(node)}?{urlencode(params)}"
+            f"#{quote(_name(node))}")
+
+
+@converter('passwall', 'trojan')
+def passwall_trojan(node):
+    params = _link_params(node)
+    return (f"trojan://{quote(str(node['password']), safe='')}@{_host_port(node)}"
+            f"?{urlencode(params)}#{quote(_name(node))}")
+
+
+@converter('passwall', 'ss')
+def passwall_ss(node):
+    # SIP002
+    userinfo = b64(f"{node['cipher']}:{node['password']}", urlsafe=True, pad=False)
+    query = ''
+    plugin = node.get('plugin')
+    if plugin:
+        opts = node.get('plugin-opts') or {}
+        if plugin == 'obfs':
+            parts = ['obfs-local', f"obfs={opts.get('mode', 'http')}"]
+            if opts.get('host'):
+                parts.append(f"obfs-host={opts['host']}")
+        else:
+            parts = [plugin] + [f'{k}={v}' for k, v in opts.items()
+                                if not isinstance(v, (dict, list))]
+        query = '/?' + urlencode({'plugin': ';'.join(parts)})
+    return f"ss://{userinfo}@{_host_port(node)}{query}#{quote(_name(node))}"
+
+
+@converter('passwall', 'ssr')
+def passwall_ssr(node):
+    main = ':'.join([str(node['server']), str(node['port']), node.get('protocol', 'origin'),
+                     node['cipher'], node.get('obfs', 'plain'),
+                     b64(str(node['password']), urlsafe=True, pad=False)])
+    params = {
+        'obfsparam': b64(str(node.get('obfs-param') or ''), urlsafe=True, pad=False),
+        'protoparam': b64(str(node.get('protocol-param') or ''), urlsafe=True, pad=False),
+        'remarks': b64(_name(node), urlsafe=True, pad=False),
+    }
+    return 'ssr://' + b64(f"{main}/?{urlencode(params)}", urlsafe=True, pad=False)
+
+
+@converter('passwall', 'socks5')
+def passwall_socks(node):
+    auth = ''
+    if node.get('username'):
+        auth = b64(f"{node['username']}:{node.get('password', '')}", urlsafe=True, pad=False) + '@'
+    return f"socks://{auth}{_host_port(node)}#{quote(_name(node))}"
+
+
+@converter('passwall', 'hysteria2')
+def passwall_hysteria2(node):
+    t = tls(node)
+    params = {}
+    if t['sni']:
+        params['sni'] = t['sni']
+    if t['insecure']:
+        params['insecure'] = '1'
+    if node.get('obfs'):
+        params['obfs'] = node['obfs']
+        params['obfs-password'] = node.get('obfs-password', '')
+    auth = quote(str(node.get('password', '')), safe='')
+    return f"hysteria2://{auth}@{_host_port(node)}?{urlencode(params)}#{quote(_name(node))}"
+
+
+@converter('passwall', 'wireguard')
+def passwall_wireguard(node):
+    addresses = [a for a in (node.get('ip'), node.get('ipv6')) if a]
+    params = {'publickey': node['public-key'],
+              'address': ','.join(addresses)}
+    if node.get('pre-shared-key'):
+        params['presharedkey'] = node['pre-shared-key']
+    if node.get('reserved'):
+        params['reserved'] = ','.join(map(str, node['reserved']))
+    if node.get('mtu'):
+        params['mtu'] = node['mtu']
+    return (f"wireguard://{quote(node['private-key'], safe='')}@{_host_port(node)}"
+            f"?{urlencode(params)}#{quote(_name(node))}")
+
+
+# --- sing-box outbounds ---
+
+def _singbox_tls(node):
+    t = tls(node)
+    if not t:
+        return None
+    out = {'enabled': True}
+    if t['sni']:
+        out['server_name'] = t['sni']
+    if t['insecure']:
+        out['insecure'] = True
+    if t['alpn']:
+        out['alpn'] = list(t['alpn'])
+    if t['fingerprint'] or t['reality']:
+        # Reality needs uTLS in sing-box
+        out['utls'] = {'enabled': True, 'fingerprint': t['fingerprint'] or 'chrome'}
+    if t['reality']:
+        out['reality'] = {'enabled': True, 'public_key': t['reality']['public_key'],
+                          'short_id': t['reality']['short_id']}
+    return out
+
+
+def _singbox_transport(node):
+    net = transport(node)
+    if net['type'] == 'ws':
+        out = {'type': 'ws', 'path': net['path']}
+        if net['headers']:
+            out['headers'] = {k: _first(v) for k, v in net['headers'].items()}
+        if net.get('max_early_data'):
+            out['max_early_data'] = net['max_early_data']
+            out['early_data_header_name'] = net.get('early_data_header') or 'Sec-WebSocket-Protocol'
+        return out
+    if net['type'] == 'httpupgrade':
+        out = {'type': 'httpupgrade', 'path': net['path']}
+        if net['host']:
+            out['host'] = net['host']
+        return out
+    if net['type'] == 'grpc':
+        return {'type': 'grpc', 'service_name': net['service_name']}
+    if net['type'] in ('h2', 'http'):
+        out = {'type': 'http', 'path': net['path']}
+        if net['host']:
+            out['host'] = [net['host']]
+        if net.get('method'):
+            out['method'] = net['method']
+        return out
+    return None
+
+
+def _singbox_base(node, kind):
+    out = {'type': kind, 'tag': _name(node), 'server': node['server'],
+           'server_port': int(node['port'])}
+    return out
+
+
+def _singbox_finish(node, out, with_transport=True):
+    t = _singbox_tls(node)
+    if t:
+        out['tls'] = t
+    if with_transport:
+        tr = _singbox_transport(node)
+        if tr:
+            out['transport'] = tr
+    if node.get('udp') is False:
+        out['network'] = 'tcp'
+    return out
+
+
+@converter('singbox', 'vmess')
+def singbox_vmess(node):
+    out = _singbox_base(node, 'vmess')
+    out.update({'uuid': node['uuid'], 'security': node.get('cipher', 'auto'),
+                'alter_id': int(node.get('alterId', 0))})
+    return _singbox_finish(node, out)
+
+
+@converter('singbox', 'vless')
+def singbox_vless(node):
+    out = _singbox_base(node, 'vless')
+    out['uuid'] = node['uuid']
+    if node.get('flow'):
+        out['flow'] = node['flow']
+    return _singbox_finish(node, out)
+
+
+@converter('singbox', 'trojan')
+def singbox_trojan(node):
+    out = _singbox_base(node, 'trojan')
+    out['password'] = str(node['password'])
+    return _singbox_finish(node, out)
+
+
+@converter('singbox', 'ss')
+def singbox_ss(node):
+    out = _singbox_base(node, 'shadowsocks')
+    out.update({'method': node['cipher'], 'password': str(node['password'])})
+    plugin = node.get('plugin')
+    if plugin:
+        opts = node.get('plugin-opts') or {}
+        if plugin == 'obfs':
+            out['plugin'] = 'obfs-local'
+            out['plugin_opts'] = f"obfs={opts.get('mode', 'http')}" + (
+                f";obfs-host={opts['host']}" if opts.get('host') else '')
+        else:
+            out['plugin'] = plugin
+            out['plugin_opts'] = ';'.join(f'{k}={v}' for k, v in opts.items()
+                                          if not isinstance(v, (dict, list)))
+    return _singbox_finish(node, out, with_transport=False)
+
+
+@converter('singbox', 'socks5')
+def singbox_socks(node):
+    out = _singbox_base(node, 'socks')
+    out['version'] = '5'
+    if node.get('username'):
+        out['username'] = node['username']
+        out['password'] = str(node.get('password', ''))
+    return _singbox_finish(node, out, with_transport=False)
+
+
+@converter('singbox', 'http')
+def singbox_http(node):
+    out = _singbox_base(node, 'http')
+    if node.get('username'):
+        out['username'] = node['username']
+        out['password'] = str(node.get('password', ''))
+    return _singbox_finish(node, out, with_transport=False)
+
+
+@converter('singbox', 'hysteria2')
+def singbox_hysteria2(node):
+    out = _singbox_base(node, 'hysteria2')
+    out['password'] = str(node.get('password', ''))
+    if node.get('obfs'):
+        out['obfs'] = {'type': node['obfs'], 'password': node.get('obfs-password', '')}
+    return _singbox_finish(node, out, with_transport=False)
+
+
+@converter('singbox', 'tuic')
+def singbox_tuic(node):
+    out = _singbox_base(node, 'tuic')
+    out.update({'uuid': node['uuid'], 'password': str(node.get('password', ''))})
+    if node.get('congestion-controller'):
+        out['congestion_control'] = node['congestion-controller']
+    if node.get('udp-relay-mode'):
+        out['udp_relay_mode'] = node['udp-relay-mode']
+    return _singbox_finish(node, out, with_transport=False)
+
+
+@converter('singbox', 'wireguard')
+def singbox_wireguard(node):
+    out = _singbox_base(node, 'wireguard')
+    addresses = []
+    if node.get('ip'):
+        addresses.append(node['ip'] if '/' in node['ip'] else node['ip'] + '/32')
+    if node.get('ipv6'):
+        addresses.append(node['ipv6'] if '/' in node['ipv6'] else node['ipv6'] + '/128')
+    out.update({'local_address': addresses, 'private_key': node['private-key'],
+                'peer_public_key': node['public-key']})
+    if node.get('pre-shared-key'):
+        out['pre_shared_key'] = node['pre-shared-key']
+    if node.get('reserved'):
+        out['reserved'] = node['reserved']
+    if node.get('mtu'):
+        out['mtu'] = int(node['mtu'])
+    return out
+
+
+# --- clash proxy-provider ---
+
+_CLASH_TYPES = ('ss', 'ssr', 'vmess', 'vless', 'trojan', 'socks5', 'http',
+                'hysteria', 'hysteria2', 'tuic', 'wireguard', 'snell')
+
+
+@converter('clash-provider', *_CLASH_TYPES)
+def clash_provider(node):
+    # Drop empty values; keep key order as in the source
+    return {key: value for key, value in node.items() if value not in (None, '', {}, [])}
+
+
+# --- bulk conversion ---
+
+def convert(proxies, backend):
+    """([converted item, ...], Counter of skipped proxy types)"""
+    table = CONVERTERS[backend]
+    items = []
+    skipped = Counter()
+    for node in proxies:
+        func = table.get(node.get('type'))
+        if func is None:
+            skipped[node.get('type')] += 1
+            continue
+        try:
+            items.append(func(node))
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"跳过 {node.get('name')}: 缺少或无效字段 {e}")
+            skipped[node.get('type')] += 1
+    return items, skipped
+
+
+def render(items, backend):
+    """Serialize converted items as the backend's subscription document"""
+    if backend == 'passwall':
+        return b64('\n'.join(items))
+    if backend == 'singbox':
+        return json.dumps({'outbounds': items}, ensure_ascii=False, indent=2)
+    return yaml.dump({'proxies': items}, Dumper=_Dumper, allow_unicode=True, sort_keys=False)
+
+
+def benchmark(paths, repeat=5, scale=20):
+    """Time every backend on the given configs, replicated to thousands of nodes"""
+    for path in paths:
+        with open(path, 'rb') as f:
+            proxies = load_proxies(f.read()) or []
+        bulk = proxies * scale
+        print(f'{path}: {len(proxies)} proxies x {scale} = {len(bulk)}')
+        for backend in CONVERTERS:
+            best = float('inf')
+            for _ in range(repeat):
+                started = time.perf_counter()
+                items, skipped = convert(bulk, backend)
+                render(items, backend)
+                best = min(best, time.perf_counter() - started)
+            skipped_note = f", skipped {dict(skipped)}" if skipped else ''
+            print(f'  {backend:15s} {best * 1000:8.1f} ms  '
+                  f'{len(bulk) / best:10.0f} nodes/s  {len(items)} items{skipped_note}')
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['--bench']:
+        benchmark(argv[1:] or ['cll2.yml', 'collectproxy.yml'])
+        return
+    if len(argv) != 3 or argv[0] not in CONVERTERS:
+        print(f'Usage: proxy_convert.py {{{",".join(CONVERTERS)}}} CONFIG OUTPUT')
+        print('       proxy_convert.py --bench [CONFIG ...]')
+        sys.exit(1)
+    backend, source, output = argv
+    with open(source, 'rb') as f:
+        proxies = load_proxies(f.read()) or []
+    items, skipped = convert(proxies, backend)
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write(render(items, backend))
+    print(f'{len(items)} proxies written to {output}'
+          + (f', skipped {dict(skipped)}' if skipped else ''))
+
+
+if __name__ == '__main__':
+    main()
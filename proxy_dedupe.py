@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""Drop duplicate proxies within and across Clash subscriptions.
+
+Aggregated subscriptions such as collectproxy.yml often list the same
+endpoint several times under different names. Each proxy is reduced to a
+fingerprint, a blake2b hash of:
+
+    type | server | port | credential
+
+- The server is lower-cased, with IPv6 brackets and any trailing dot removed.
+- The credential is the set of secret fields for that type (uuid, password
+  plus cipher, wireguard keys, ...).
+
+Names are ignored. ProxyIndex keeps the first proxy seen for each
+fingerprint and remembers which name it replaced each duplicate with. That
+lets dedupe_config() rewrite proxy-group member lists as well.
+Proxies from different sources with the same name but different
+fingerprints are renamed "name (2)", so merged lists stay valid for Clash.
+
+    python proxy_dedupe.py merged.yml cll2.yml collectproxy.yml
+"""
+
+import hashlib
+import sys
+
+from clash_yaml import load_proxies
+
+# Fields that identify the account on the server, per proxy type
+CREDENTIAL_FIELDS = {
+    'ss': ('cipher', 'password'),
+    'ssr': ('cipher', 'password', 'protocol', 'obfs'),
+    'vmess': ('uuid',),
+    'vless': ('uuid',),
+    'trojan': ('password',),
+    'socks5': ('username', 'password'),
+    'http': ('username', 'password'),
+    'snell': ('psk',),
+    'hysteria': ('auth-str', 'auth'),
+    'hysteria2': ('password',),
+    'tuic': ('uuid', 'password', 'token'),
+    'wireguard': ('private-key', 'public-key'),
+}
+
+
+def _server(node):
+    return str(node.get('server', '')).strip().strip('[]').rstrip('.').lower()
+
+
+def fingerprint(node):
+    """Hex digest identifying the endpoint and account of a Clash proxy"""
+    proxy_type = str(node.get('type', '')).lower()
+    fields = CREDENTIAL_FIELDS.get(proxy_type, ('uuid', 'password'))
+    parts = [proxy_type, _server(node), str(node.get('port', '')).strip()]
+    parts.extend(str(node.get(field) or '') for field in fields)
+    return hashlib.blake2b('\0'.join(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ProxyIndex:
+    """Unique proxies in insertion order, indexed by fingerprint"""
+
+    def __init__(self):
+        self.by_fingerprint = {}    # fingerprint -> kept proxy
+        self.names = set()          # names of kept proxies
+        self.aliases = {}           # dropped name -> kept name
+        self.duplicates = 0
+        self.renamed = 0
+
+    def add(self, node):
+        """Add a proxy; returns the kept proxy, which may be an earlier duplicate"""
+        key = fingerprint(node)
+        kept = self.by_fingerprint.get(key)
+        if kept is not None:
+            self.duplicates += 1
+            if node.get('name') != kept['name'] and node.get('name') not in self.names:
+                self.aliases.setdefault(node.get('name'), kept['name'])
+            return kept
+        name = node.get('name') or f"{node.get('type')}-{_server(node)}:{node.get('port')}"
+        unique = name
+        n = 2
+        while unique in self.names:
+            unique = f'{name} ({n})'
+            n += 1
+        if unique != node.get('name'):
+            # References to `name` still mean the earlier proxy, so no alias
+            node = dict(node, name=unique)
+            self.renamed += 1
+        self.names.add(unique)
+        self.by_fingerprint[key] = node
+        return node
+
+    def update(self, proxies):
+        for node in proxies:
+            self.add(node)
+        return self
+
+    def __len__(self):
+        return len(self.by_fingerprint)
+
+    def __iter__(self):
+        return iter(self.by_fingerprint.values())
+
+    def proxies(self):
+        return list(self.by_fingerprint.values())
+
+
+def dedupe(*sources):
+    """(unique proxies, {dropped name: kept name}) over one or more proxy lists"""
+    index = ProxyIndex()
+    for proxies in sources:
+        index.update(proxies or [])
+    return index.proxies(), index.aliases
+
+
+def dedupe_config(config):
+    """Copy of a Clash config dict with duplicate proxies removed.
+
+    proxy-group member lists are rewritten to the kept names, keeping the
+    first occurrence of each member. Groups may also reference other groups
+    and built-ins like DIRECT; those are left as they are.
+    """
+    proxies, aliases = dedupe(config.get('proxies') or [])
+    removed = len(config.get('proxies') or []) - len(proxies)
+    config = dict(config, proxies=proxies)
+    if 'proxy-groups' in config:
+        groups = []
+        for group in config['proxy-groups'] or []:
+            if 'proxies' in group:
+                members = dict.fromkeys(aliases.get(name, name) for name in group['proxies'])
+                group = dict(group, proxies=list(members))
+            groups.append(group)
+        config['proxy-groups'] = groups
+    if removed:
+        print(f"Removed {removed} duplicate proxies ({len(proxies)} left)")
+    return config
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2:
+        print('Usage: proxy_dedupe.py OUTPUT CONFIG [CONFIG ...]')
+        sys.exit(1)
+    from proxy_convert import render
+
+    output, sources = argv[0], argv[1:]
+    index = ProxyIndex()
+    total = 0
+    for path in sources:
+        with open(path, 'rb') as f:
+            proxies = load_proxies(f.read()) or []
+        before = len(index)
+        index.update(proxies)
+        total += len(proxies)
+        print(f'{path}: {len(proxies)} proxies, {len(index) - before} new')
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write(render(index.proxies(), 'clash-provider'))
+    print(f'{len(index)}/{total} unique proxies written to {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""Move large inline rule lists of a Clash config into rule-providers.
+
+Rules are first merged through clash_rules.RuleSet, so duplicates and
+shadowed rules are gone. The list is then cut into runs of consecutive rules
+with the same target. Reordering rules inside such a run cannot change the
+target a connection gets. So each run is split as follows:
+
+- DOMAIN and DOMAIN-SUFFIX rules become one `domain` provider, with
+  entries "example.com" and "+.example.com";
+- IP-CIDR and IP-CIDR6 rules become one `ipcidr` provider per no-resolve
+  setting;
+- everything else (keywords, GEOIP, MATCH, ...) stays inline.
+
+The providers are referenced by a RULE-SET rule in place of the run. Sets
+smaller than `min_size` stay inline.
+
+Provider files are named after a hash of their content, e.g.
+ruleset/cll2/domain-3f2a9c1b0d4e.yaml. An unchanged set keeps its URL, so
+clients only download sets that changed. When a mihomo binary is available
+(CLASH_CORE_BIN, as for clash_core), sets are also compiled to the binary
+`.mrs` format. Files of earlier runs that are no longer referenced are
+removed.
+
+    python rule_providers.py cll2.yml
+    python rule_providers.py collectproxy.yml --dir ruleset/collectproxy
+"""
+
+import argparse
+import hashlib
+import os
+import subprocess
+import tempfile
+
+import yaml
+
+from clash_core import ClashCore
+from clash_rules import Rule, RuleSet, parse_rules, split_rules_section, split_section
+from clash_yaml import load_sections
+
+BASE_URL = 'https://raw.githubusercontent.com/boleechat/collect/main'
+OUTPUT_DIR = 'ruleset'
+MIN_SIZE = 16
+INTERVAL = 86400
+
+
+def _payload(rule):
+    if rule.type == 'DOMAIN-SUFFIX':
+        return '+.' + rule.payload.lower()
+    if rule.type == 'DOMAIN':
+        return rule.payload.lower()
+    return rule.payload
+
+
+def _domain_rule(rule):
+    return rule.type in ('DOMAIN', 'DOMAIN-SUFFIX') and not rule.options
+
+
+def _ip_rule(rule):
+    return rule.type in ('IP-CIDR', 'IP-CIDR6') and set(rule.options) <= {'no-resolve'}
+
+
+class ProviderSet:
+    """One provider's entries and the file name derived from them"""
+
+    __slots__ = ('behavior', 'entries', 'digest')
+
+    def __init__(self, behavior, entries):
+        self.behavior = behavior
+        self.entries = entries
+        self.digest = hashlib.sha256(
+            (behavior + '\n' + '\n'.join(entries)).encode('utf-8')).hexdigest()[:12]
+
+    @property
+    def name(self):
+        return f'{self.behavior}-{self.digest}'
+
+    def text(self):
+        """Plain-text source: one entry per line"""
+        return '\n'.join(self.entries) + '\n'
+
+    def yaml(self):
+        return yaml.dump({'payload': self.entries}, allow_unicode=True, default_flow_style=False)
+
+
+def split_providers(rules, min_size=MIN_SIZE):
+    """([Rule, ...] with RULE-SET references, [ProviderSet, ...])"""
+    rules = [rule for rule in rules if rule.type is not None]
+    output = []
+    providers = {}
+    i = 0
+    while i < len(rules):
+        target = rules[i].target
+        j = i + 1
+        if rules[i].type not in ('MATCH', 'FINAL'):
+            while (j < len(rules) and rules[j].target == target
+                   and rules[j].type not in ('MATCH', 'FINAL')):
+                j += 1
+        run = rules[i:j]
+        i = j
+
+        domain = [rule for rule in run if _domain_rule(rule)]
+        ip = {flag: [rule for rule in run if _ip_rule(rule) and ('no-resolve' in rule.options) == flag]
+              for flag in (False, True)}
+        grouped = set()
+
+        def provide(behavior, members, options=()):
+            if len(members) < min_size:
+                return None
+            provider = ProviderSet(behavior, [_payload(rule) for rule in members])
+            providers.setdefault(provider.name, provider)
+            grouped.update(map(id, members))
+            return Rule('RULE-SET', provider.name, target, options)
+
+        # Domain sets first; IP rules (which may need DNS) last
+        head = [provide('domain', domain)]
+        tail = [provide('ipcidr', ip[False]), provide('ipcidr', ip[True], ('no-resolve',))]
+        output.extend(rule for rule in head if rule)
+        output.extend(rule for rule in run if id(rule) not in grouped)
+        output.extend(rule for rule in tail if rule)
+    return output, list(providers.values())
+
+
+def compile_mrs(provider, path, binary=None):
+    """Write `provider` as .mrs with mihomo convert-ruleset; False if that failed"""
+    binary = binary or os.environ.get('CLASH_CORE_BIN', 'mihomo')
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', encoding='utf-8', delete=False) as f:
+        f.write(provider.text())
+        source = f.name
+    try:
+        result = subprocess.run([binary, 'convert-ruleset', provider.behavior, 'text', source, path],
+                                capture_output=True, text=True, timeout=60)
+        if result.returncode != 0:
+            print(f"mrs conversion failed for {provider.name}: {result.stderr.strip()}")
+            return False
+        return True
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"mrs conversion failed for {provider.name}: {e}")
+        return False
+    finally:
+        os.unlink(source)
+
+
+def write_providers(providers, directory, mrs=None):
+    """Write provider files that do not exist yet; returns {name: (filename, format)}"""
+    os.makedirs(directory, exist_ok=True)
+    if mrs is None:
+        mrs = ClashCore.available()
+    written = {}
+    for provider in providers:
+        filename = f'{provider.name}.mrs'
+        path = os.path.join(directory, filename)
+        if mrs and (os.path.exists(path) or compile_mrs(provider, path)):
+            written[provider.name] = (filename, 'mrs')
+            continue
+        filename = f'{provider.name}.yaml'
+        path = os.path.join(directory, filename)
+        if not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(provider.yaml())
+        written[provider.name] = (filename, 'yaml')
+    return written
+
+
+def provider_entries(providers, written, directory, base_url=BASE_URL):
+    entries = {}
+    for provider in providers:
+        filename, fmt = written[provider.name]
+        entries[provider.name] = {
+            'type': 'http',
+            'behavior': provider.behavior,
+            'format': fmt,
+            'url': f'{base_url}/{directory}/{filename}',
+            'path': f'./ruleset/{filename}',
+            'interval': INTERVAL,
+        }
+    return entries
+
+
+def prune_directory(directory, keep):
+    """Remove provider files in `directory` that are not in `keep`"""
+    removed = 0
+    for filename in os.listdir(directory):
+        if filename.endswith(('.yaml', '.mrs')) and filename not in keep:
+            os.remove(os.path.join(directory, filename))
+            removed += 1
+    return removed
+
+
+def _drop_last_line(text):
+    return text[:len(text) - len(text.splitlines(True)[-1])]
+
+
+def convert_config(text, directory, base_url=BASE_URL, min_size=MIN_SIZE, prepend=(), mrs=None):
+    """Config text with large rule runs moved to providers written to `directory`"""
+    ruleset = RuleSet(parse_rules(prepend))
+    head, lines, tail = split_rules_section(text)
+    ruleset.extend(parse_rules(lines))
+    rules, providers = split_providers(ruleset.rules, min_size)
+    written = write_providers(providers, directory, mrs)
+    entries = provider_entries(providers, written, directory, base_url)
+
+    prefix = f'{base_url}/{directory}/'
+    existing = split_section(head, 'rule-providers')
+    if existing is not None:
+        # Keep providers the config already had, but drop ones an earlier run
+        # generated once no RULE-SET rule refers to them any more
+        before, body, after = existing
+        old = load_sections(''.join(['rule-providers:\n', *body]), ('rule-providers',))
+        referenced = {rule.payload for rule in rules if rule.type == 'RULE-SET'}
+        kept = {name: entry for name, entry in (old.get('rule-providers') or {}).items()
+                if name in referenced
+                or not str((entry or {}).get('url', '')).startswith(prefix)}
+        entries = {**kept, **entries}
+        head = _drop_last_line(before) + after
+    section = yaml.dump({'rule-providers': entries}, allow_unicode=True, sort_keys=False) if entries else ''
+    head = _drop_last_line(head) + section + 'rules:\n'
+    body = '\n'.join(rule.line() for rule in rules) + '\n'
+    print(f"{len(ruleset)} rules: {len(rules)} inline, {len(providers)} providers "
+          f"({sum(len(p.entries) for p in providers)} entries); "
+          f"{len(ruleset.shadowed)} duplicate or shadowed rules dropped")
+    keep = {entry['url'][len(prefix):] for entry in entries.values()
+            if str(entry.get('url', '')).startswith(prefix)}
+    return head + body + tail, keep
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Split inline Clash rules into rule-providers')
+    parser.add_argument('config', help='config file, rewritten in place')
+    parser.add_argument('-o', '--output', help='write the config here instead')
+    parser.add_argument('--dir', help='provider directory (default: ruleset/<config name>)')
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--min-size', type=int, default=MIN_SIZE)
+    parser.add_argument('--prepend', help='rules file to put in front of the config rules')
+    parser.add_argument('--no-mrs', action='store_true', help='always write YAML providers')
+    args = parser.parse_args(argv)
+
+    directory = args.dir or f'{OUTPUT_DIR}/{os.path.splitext(os.path.basename(args.config))[0]}'
+    with open(args.config, encoding='utf-8') as f:
+        text = f.read()
+    prepend = []
+    if args.prepend:
+        with open(args.prepend, encoding='utf-8') as f:
+            prepend = f.read().splitlines()
+
+    text, files = convert_config(text, directory, args.base_url, args.min_size, prepend,
+                                 False if args.no_mrs else None)
+    removed = prune_directory(directory, files)
+    with open(args.output or args.config, 'w', encoding='utf-8') as f:
+        f.write(text)
+    print(f"{len(files)} provider files in {directory}" + (f", {removed} stale removed" if removed else ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# TVBox 爬虫共用的标题/简介搜索索引
+#
+# 中文标题没有空格分词，这里用字符 n-gram（单字 + 双字）建倒排索引：
+#   - add() 增量加入视频，按 vod_id 去重
+#   - search() 先取包含全部查询 n-gram 的视频，没有时退回匹配过半的视频，
+#     按字段权重 + 标题整词命中加分排序，同分按加入顺序；爬虫要按列表顺序
+#     （月份从新到旧）加入，并发抓取时也要等抓完再按顺序加入，同分才是新的在前
+#   - 结果真正分页，不再硬截断前 50 条
+#   - 默认索引 vod 字典；传入 getter 也可以索引其他紧凑记录（如 __slots__ 对象）
+#   - add() / search() 加锁，多线程同时加入不会出错（但加入顺序就不确定了）
+# 需要与爬虫文件放在同一目录。
+
+import math
+import threading
+
+
+def dict_getter(doc, field):
+    return doc.get(field, '')
+
+
+def normalize(text):
+    """小写并去掉空白，让 “养生 堂” 和 “养生堂” 一样匹配"""
+    return ''.join((text or '').lower().split())
+
+
+def ngrams(text, n=2):
+    """单字 + n 字片段（去重）"""
+    grams = set(text)
+    if n > 1:
+        grams.update(text[i:i + n] for i in range(len(text) - n + 1))
+    return grams
+
+
+def query_grams(text, n=2):
+    """查询用的 n-gram：够长时只用 n 字片段，更有区分度"""
+    if len(text) < n:
+        return set(text)
+    return set(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+class SearchIndex:
+    """vod 记录的字符 n-gram 倒排索引"""
+
+    def __init__(self, fields=(('vod_name', 3), ('vod_content', 1)),
+                 key='vod_id', n=2, title_field='vod_name', title_bonus=10,
+                 getter=dict_getter):
+        self.getter = getter
+        self.fields = fields
+        self.key = key
+        self.n = n
+        self.title_field = title_field
+        self.title_bonus = title_bonus
+        self.docs = []          # 加入顺序 → vod
+        self.doc_ids = {}       # vod_id → 下标
+        self.postings = {}      # gram → {下标: 权重}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def __contains__(self, vod_id):
+        return vod_id in self.doc_ids
+
+    def add(self, doc):
+        """加入一个视频，已存在的 vod_id 直接跳过（线程安全）"""
+        vod_id = self.getter(doc, self.key)
+        if vod_id in self.doc_ids:
+            return
+
+        # 分词在锁外做，锁内只分配下标、写倒排表
+        weights = {}
+        for field, weight in self.fields:
+            for gram in ngrams(normalize(self.getter(doc, field)), self.n):
+                weights[gram] = weights.get(gram, 0) + weight
+
+        with self._lock:
+            if vod_id in self.doc_ids:
+                return
+            idx = len(self.docs)
+            self.docs.append(doc)
+            self.doc_ids[vod_id] = idx
+            for gram, weight in weights.items():
+                self.postings.setdefault(gram, {})[idx] = weight
+
+    def add_all(self, docs):
+        for doc in docs:
+            self.add(doc)
+
+    def search(self, query, page=1, page_size=20):
+        """返回 (本页结果, 总数)"""
+        query = normalize(query)
+        grams = query_grams(query, self.n)
+        if not grams:
+            return [], 0
+
+        scores = {}
+        hits = {}
+        with self._lock:
+            for gram in grams:
+                for idx, weight in self.postings.get(gram, {}).items():
+                    scores[idx] = scores.get(idx, 0) + weight
+                    hits[idx] = hits.get(idx, 0) + 1
+
+        required = len(grams)
+        matched = [idx for idx, count in hits.items() if count == required]
+        if not matched:
+            # 没有完整命中时，退回匹配过半 n-gram 的视频
+            required = math.ceil(len(grams) / 2)
+            matched = [idx for idx, count in hits.items() if count >= required]
+
+        for idx in matched:
+            if query in normalize(self.getter(self.docs[idx], self.title_field)):
+                scores[idx] += self.title_bonus
+
+        matched.sort(key=lambda idx: (-scores[idx], idx))
+        page = max(1, int(page))
+        start = (page - 1) * page_size
+        return [self.docs[idx] for idx in matched[start:start + page_size]], len(matched)
@@ -2,8 +2,8 @@
 # coding=utf-8
 # 超级装视频爬虫 - 修复版 by Claude
 
+import os
 import sys
-import requests
 import re
 import json
 import time
@@ -11,13 +11,15 @@ import base64
 from urllib.parse import quote, unquote
 
 sys.path.append('..')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from base.spider import Spider
+from tvbox_http import HttpClient
+from play_extractor import extract_url
 
 
 class Spider(Spider):
     def init(self, extend=""):
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        self.session = HttpClient(headers=self.headers)
         print("超级装 initialized")
         return
 
@@ -31,7 +33,7 @@ class Spider(Spider):
         pass
 
     def destroy(self):
-        pass
+        self.session.close()
 
     # 基础配置
     source_url = 'https://raw.githubusercontent.com/boleechat/collect/refs/heads/main/superzhuang.txt'
@@ -48,6 +50,10 @@ class Spider(Spider):
     # 缓存抓取的数据
     data_cache = None
 
+    # 详情页 → 提取到的播放地址（mp4 的 vkey 会过期）
+    play_cache = {}
+    play_cache_ttl = 3600
+
     def homeContent(self, filter):
         """生成首页内容"""
         result = {}
@@ -165,69 +171,13 @@ class Spider(Spider):
             print(f"正在解析URL: {id}")
             
             try:
-                # 1. 发送请求获取页面内容
-                response = self.session.get(id, headers=headers, timeout=10)
-                response.raise_for_status()
-                html_content = response.text
-                
-                # 2. 提取视频ID和模板信息
-                # 多种提取方法，应对可能的变化
-                
-                # 方法1: 直接寻找腾讯视频链接
-                tc_qq_matches = re.findall(r'(https?://[^\'"\s]*?\.tc\.qq\.com[^\'"\s]*?\.mp4[^\'"\s]*)', html_content)
-                if tc_qq_matches and len(tc_qq_matches) > 0:
-                    video_url = tc_qq_matches[0].replace('\\/', '/').replace('\\u002F', '/')
-                    print(f"方法1成功: {video_url[:100]}...")
-                    return {'parse': 0, 'url': video_url, 'header': headers}
-                
-                # 方法2: 查找vid和视频模板
-                vid_match = re.search(r'vid\s*[=:]\s*[\'"]([^\'"]+)[\'"]', html_content)
-                template_match = re.search(r'templatePath\s*[=:]\s*[\'"]([^\'"]+)[\'"]', html_content)
-                
-                if vid_match and template_match:
-                    vid = vid_match.group(1)
-                    template = template_match.group(1)
-                    video_url = f"https://v.qq.com/x/page/{vid}.html"
-                    print(f"方法2成功: VID={vid}, Template={template}")
-                    # 返回腾讯视频页面，让TVBox的解析器处理
-                    return {'parse': 1, 'url': video_url, 'header': headers}
-                
-                # 方法3: 寻找video标签
-                video_match = re.search(r'<video[^>]*src=[\'"]([^\'"]+)[\'"]', html_content)
-                if video_match:
-                    video_url = video_match.group(1)
-                    if video_url.startswith('//'):
-                        video_url = 'https:' + video_url
-                    print(f"方法3成功: {video_url[:100]}...")
-                    return {'parse': 0, 'url': video_url, 'header': headers}
-                
-                # 方法4: 查找播放器初始化代码
-                player_match = re.search(r'new\s+Player\s*\(\s*\{\s*url\s*:\s*[\'"]([^\'"]+)[\'"]', html_content)
-                if player_match:
-                    video_url = player_match.group(1)
-                    if video_url.startswith('//'):
-                        video_url = 'https:' + video_url
-                    print(f"方法4成功: {video_url[:100]}...")
-                    return {'parse': 0, 'url': video_url, 'header': headers}
-                
-                # 方法5: 查找iframe嵌入
-                iframe_match = re.search(r'<iframe[^>]*src=[\'"]([^\'"]+)[\'"]', html_content)
-                if iframe_match:
-                    iframe_url = iframe_match.group(1)
-                    if iframe_url.startswith('//'):
-                        iframe_url = 'https:' + iframe_url
-                    
-                    # 如果是腾讯视频的iframe
-                    if 'v.qq.com' in iframe_url:
-                        print(f"方法5成功: 找到腾讯视频iframe - {iframe_url}")
-                        return {'parse': 1, 'url': iframe_url, 'header': headers}
-                
-                # 方法6: 通用搜索所有可能的视频链接
-                video_urls = re.findall(r'(https?://[^\'"\s]*?(?:\.mp4|\.m3u8)[^\'"\s]*)', html_content)
-                if video_urls and len(video_urls) > 0:
-                    video_url = video_urls[0].replace('\\/', '/').replace('\\u002F', '/')
-                    print(f"方法6成功: {video_url[:100]}...")
-                    return {'parse': 0, 'url': video_url, 'header': headers}
+                # 单次扫描页面，按 方法1~6 的优先级取结果
+                found = extract_url(self.session, id, headers,
+                                    cache=self.play_cache, ttl=self.play_cache_ttl)
+                if found:
+                    parse, video_url, method = found
+                    print(f"{method}成功: {video_url[:100]}...")
+                    return {'parse': parse, 'url': video_url, 'header': headers}
                 
                 # 最终的后备方案：将原始URL传递给通用解析器
                 print("未发现直接可用的视频URL，使用通用解析")
@@ -239,7 +189,7 @@ class Spider(Spider):
                 return {'parse': 1, 'url': id, 'header': headers}
         
         return {'parse': 1, 'url': id, 'header': headers}
-    
+
     def localProxy(self, param):
         return param
     
@@ -6,18 +6,45 @@
 # 播放API: vv.video.qq.com/getinfo (无需cKey)
 
 import json
+import os
 import sys
 import re
-import requests
+import threading
+import time
 
 sys.path.append('..')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from base.spider import Spider
+from tvbox_http import HttpClient
+from search_index import SearchIndex
+
+VID_RE = re.compile(r'v\.qq\.com/txp/iframe/player\.html\?vid=([A-Za-z0-9]+)', re.IGNORECASE)
+
+
+class Episode:
+    """一集 / 一条往期节目的紧凑记录，vod_id 就是 contentId"""
+    __slots__ = ('content_id', 'title', 'cover', 'vid', 'remarks')
+
+    def __init__(self, content_id, title, cover, vid='', remarks=''):
+        self.content_id = content_id
+        self.title      = title
+        self.cover      = cover
+        self.vid        = vid
+        self.remarks    = remarks
+
+    def to_vod(self):
+        return {
+            'vod_id':      self.content_id,
+            'vod_name':    self.title,
+            'vod_pic':     self.cover,
+            'vod_content': '',
+            'vod_remarks': self.remarks,
+        }
 
 
 class Spider(Spider):
     def init(self, extend=""):
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        self.session = HttpClient(headers=self.headers)
         print("SuperZhuang spider initialized")
         return
 
@@ -56,6 +83,12 @@ class Spider(Spider):
     platform = '11001'
     page_size = 10
 
+    # mp4 解析：一次 getinfo 最多带几个 vid、预解析后面几集、vkey 默认有效期
+    max_batch_vids   = 5
+    prefetch_count   = 3
+    vkey_default_ttl = 7200
+    vkey_margin      = 300
+
     headers = {
         'User-Agent': (
             'Mozilla/5.0 (iPhone; CPU iPhone OS 18_5 like Mac OS X) '
@@ -71,28 +104,44 @@ class Spider(Spider):
         'Content-Type':                'text/plain',
     }
 
-    # 季集数据缓存
+    # 季集数据：锚点接口一次返回全部季的原始数据，按季懒解析
+    #   _season_raw   季号 → 尚未解析的原始集列表（解析后移除）
+    #   _season_cache 季号 → 已解析的 Episode 元组
+    #   _records      contentId → Episode，详情页直接查
+    #   _all_episodes 全部季展开后的元组，只在首次全量解析时生成
+    _season_raw = None
     _season_cache = {}
+    _records = {}
+    _all_episodes = None
+
+    # vid → (mp4, 过期时间)，vkey 过期前复用
+    _mp4_cache = {}
+    _mp4_lock = threading.Lock()
+    _mp4_pending = set()
+
+    # 往期节目 + 季集 的标题 n-gram 搜索索引
+    _search_index = SearchIndex(fields=(('title', 1),), key='content_id',
+                                title_field='title', getter=getattr)
 
     # ─── 首页 ────────────────────────────────────────────────────
     def homeContent(self, filter):
         return {'class': self.categories, 'filters': {}}
 
     def homeVideoContent(self):
-        return {'list': self._fetch_latest_list(1)}
+        return {'list': [ep.to_vod() for ep in self._fetch_latest_list(1)]}
 
     # ─── 分类 ─────────────────────────────────────────────────────
     def categoryContent(self, tid, pg, filter, extend):
         pg = int(pg) if pg else 1
 
         if tid == 'list':
-            videos = self._fetch_latest_list(pg)
+            videos = [ep.to_vod() for ep in self._fetch_latest_list(pg)]
             return {'list': videos, 'page': pg, 'pagecount': 99,
                     'limit': self.page_size, 'total': 999}
 
         if tid.startswith('season_'):
             season_num = int(tid.split('_')[1])
-            videos = self._fetch_season(season_num)
+            videos = [ep.to_vod() for ep in self._fetch_season(season_num)]
             return {'list': videos, 'page': 1, 'pagecount': 1,
                     'limit': len(videos), 'total': len(videos)}
 
@@ -103,21 +152,31 @@ class Spider(Spider):
         if not ids:
             return {'list': []}
 
-        # vod_id 格式: "contentId|title|cover|vid"
-        # vid 已在列表阶段从 contentText 提取，直接使用，无需再请求
+        # vod_id 为 contentId；旧版收藏里的 "contentId|title|cover|vid" 仍然兼容
+        # vid 已在季集解析时从 contentText 提取，直接使用，无需再请求
         parts      = ids[0].split('|', 3)
         content_id = parts[0]
-        title      = parts[1] if len(parts) > 1 else f'视频{content_id}'
-        cover      = parts[2] if len(parts) > 2 else ''
-        vid        = parts[3] if len(parts) > 3 else ''
+        record     = self._records.get(content_id)
+        if record is None and len(parts) > 1:
+            record = Episode(content_id, parts[1],
+                             parts[2] if len(parts) > 2 else '',
+                             parts[3] if len(parts) > 3 else '')
+        if record is None:
+            # 重启后 _records 为空：先解析季集（一次锚点请求），仍未命中再查该条详情
+            self._load_all_seasons()
+            record = self._records.get(content_id)
+        if record is None or not record.vid:
+            # 往期节目列表里的记录没有 vid，从详情API补全
+            record = self._fetch_detail_record(content_id, record) or record
+        if record is None:
+            record = Episode(content_id, f'视频{content_id}', '')
+        title, cover, vid = record.title, record.cover, record.vid
+
+        play_url = self._get_mp4_by_vid(vid) if vid else ''
 
-        # 如果 vid 已知，直接获取 mp4
+        # 后台预解析本季接下来几集，切集时直接命中缓存
         if vid:
-            play_url = self._get_mp4_by_vid(vid)
-        else:
-            # 兜底：从详情API重新提取
-            vid = self._get_vid_from_detail_api(content_id)
-            play_url = self._get_mp4_by_vid(vid) if vid else ''
+            self._prefetch_next_episodes(vid)
 
         if not play_url:
             print(f'[detailContent] 无法获取播放地址 contentId={content_id} vid={vid}')
@@ -128,7 +187,7 @@ class Spider(Spider):
             'vod_name':      title,
             'vod_pic':       cover,
             'vod_content':   '',
-            'vod_remarks':   '',
+            'vod_remarks':   record.remarks,
             'vod_play_from': 'SuperZhuang',
             'vod_play_url':  f'{title}${play_url}',
         }
@@ -136,23 +195,17 @@ class Spider(Spider):
 
     # ─── 搜索 ─────────────────────────────────────────────────────
     def searchContent(self, key, quick, pg="1"):
-        results = []
-        # 搜索往期节目
+        pg = int(pg) if pg else 1
+        page_size = 50
+        # 往期节目前几页 + 所有季集 都会在加载时进入搜索索引
         for page in range(1, 5):
-            videos = self._fetch_latest_list(page)
-            if not videos:
+            if not self._fetch_latest_list(page):
                 break
-            for v in videos:
-                if key.lower() in v.get('vod_name', '').lower():
-                    results.append(v)
-        # 搜索所有季集
-        all_seasons = self._load_all_seasons()
-        for ep in all_seasons:
-            if key.lower() in ep.get('vod_name', '').lower():
-                if not any(r['vod_id'] == ep['vod_id'] for r in results):
-                    results.append(ep)
-        return {'list': results, 'page': 1, 'pagecount': 1,
-                'limit': 50, 'total': len(results)}
+        self._load_all_seasons()
+        results, total = self._search_index.search(key, pg, page_size)
+        return {'list': [ep.to_vod() for ep in results], 'page': pg,
+                'pagecount': max(1, (total + page_size - 1) // page_size),
+                'limit': page_size, 'total': total}
 
     # ─── 播放 ─────────────────────────────────────────────────────
     def playerContent(self, flag, id, vipFlags):
@@ -196,133 +249,200 @@ class Spider(Spider):
             videos = []
             for item in result.get('data', {}).get('data', []):
                 cid   = str(item.get('id', ''))
-                title = item.get('contentTitle', '').strip()
-                cover = item.get('firstImg', '')
-                date  = item.get('createTime', '')[:10]
-                # vid 需要从详情API获取，先留空，detailContent 时再取
-                videos.append({
-                    'vod_id':      f'{cid}|{title}|{cover}|',
-                    'vod_name':    title,
-                    'vod_pic':     cover,
-                    'vod_content': '',
-                    'vod_remarks': date,
-                })
+                # 季集里已有同一条（含 vid）时直接复用
+                ep = self._records.get(cid)
+                if ep is None:
+                    # vid 需要从详情API获取，先留空，detailContent 时再取
+                    ep = Episode(cid,
+                                 item.get('contentTitle', '').strip(),
+                                 item.get('firstImg', ''),
+                                 remarks=item.get('createTime', '')[:10])
+                    self._records[cid] = ep
+                videos.append(ep)
+            self._search_index.add_all(videos)
             return videos
         except Exception as e:
             print(f"[_fetch_latest_list] Error: {e}")
             return []
 
-    def _load_all_seasons(self):
-        """加载全部季集数据（含vid），带缓存"""
-        if self._season_cache:
-            all_eps = []
-            for eps in self._season_cache.values():
-                all_eps.extend(eps)
-            return all_eps
-
+    def _load_season_raw(self):
+        """拉取锚点详情，只保留各季原始集列表，解析推迟到首次访问该季"""
+        if self._season_raw is not None:
+            return
         url = f'{self.detail_api}?contentId={self.ANCHOR_CONTENT_ID}'
         try:
             resp = self.session.get(url, headers=self.headers, timeout=15)
-            data = resp.json().get('data', {})
-            video_list = data.get('videoList', [])
-
-            for season_obj in video_list:
-                season_num = season_obj.get('videoSeasons', 0)
-                eps = []
-                for ep in season_obj.get('videoEpisodesList', []):
-                    cid      = str(ep.get('contentId', ''))
-                    title    = ep.get('contentTitle', '').strip()
-                    cover    = ep.get('firstImg', '')
-                    ep_num   = ep.get('videoEpisodes', 0)
-                    # 直接从 contentText 里提取 vid，无需额外请求
-                    vid = self._extract_vid_from_text(ep.get('contentText', ''))
-                    remarks  = f'第{season_num}季 第{ep_num}集'
-                    eps.append({
-                        'vod_id':      f'{cid}|{title}|{cover}|{vid}',
-                        'vod_name':    title,
-                        'vod_pic':     cover,
-                        'vod_content': '',
-                        'vod_remarks': remarks,
-                    })
-                if eps:
-                    self._season_cache[season_num] = eps
-
-            print(f"[_load_all_seasons] 共 {len(video_list)} 季，"
-                  f"{sum(len(v) for v in self._season_cache.values())} 集")
+            video_list = resp.json().get('data', {}).get('videoList', [])
+            type(self)._season_raw = {
+                season_obj.get('videoSeasons', 0): season_obj.get('videoEpisodesList', [])
+                for season_obj in video_list
+            }
+            print(f"[_load_season_raw] 共 {len(video_list)} 季")
         except Exception as e:
-            print(f"[_load_all_seasons] Error: {e}")
-
-        all_eps = []
-        for eps in self._season_cache.values():
-            all_eps.extend(eps)
-        return all_eps
+            print(f"[_load_season_raw] Error: {e}")
 
     def _fetch_season(self, season_num):
-        """获取指定季的全部集数"""
-        if not self._season_cache:
-            self._load_all_seasons()
-        return self._season_cache.get(season_num, [])
+        """获取指定季的全部集数（首次访问时解析）"""
+        eps = self._season_cache.get(season_num)
+        if eps is not None:
+            return eps
+        self._load_season_raw()
+        raw = (self._season_raw or {}).pop(season_num, None)
+        if raw is None:
+            return ()
+
+        eps = []
+        for ep in raw:
+            cid = str(ep.get('contentId', ''))
+            # 直接从 contentText 里提取 vid，无需额外请求
+            record = Episode(cid,
+                             ep.get('contentTitle', '').strip(),
+                             ep.get('firstImg', ''),
+                             self._extract_vid_from_text(ep.get('contentText', '')),
+                             f"第{season_num}季 第{ep.get('videoEpisodes', 0)}集")
+            self._records[cid] = record
+            eps.append(record)
+        eps = tuple(eps)
+        self._season_cache[season_num] = eps
+        self._search_index.add_all(eps)
+        return eps
+
+    def _load_all_seasons(self):
+        """解析全部季集，返回预先展开好的元组（只生成一次）"""
+        if self._all_episodes is not None:
+            return self._all_episodes
+        self._load_season_raw()
+        if self._season_raw is None:
+            return ()
+        all_eps = []
+        for season_num in sorted(set(self._season_raw) | set(self._season_cache)):
+            all_eps.extend(self._fetch_season(season_num))
+        type(self)._all_episodes = tuple(all_eps)
+        print(f"[_load_all_seasons] 共 {len(self._all_episodes)} 集")
+        return self._all_episodes
 
     def _extract_vid_from_text(self, content_text):
         """从 contentText 的 iframe src 中提取腾讯视频 vid"""
         if not content_text:
             return ''
-        m = re.search(
-            r'v\.qq\.com/txp/iframe/player\.html\?vid=([A-Za-z0-9]+)',
-            content_text, re.IGNORECASE)
+        m = VID_RE.search(content_text)
         return m.group(1) if m else ''
 
-    def _get_vid_from_detail_api(self, content_id):
-        """兜底：从详情API页面提取vid（当列表阶段未提取到时使用）"""
+    def _fetch_detail_record(self, content_id, record=None):
+        """兜底：从详情API重建 / 补全一条记录（列表阶段没有 vid、或重启后缓存为空时）
+
+        传入 record 时只补全其 vid；否则新建 Episode 并记入 _records。
+        请求失败返回 None。
+        """
         url = f'{self.detail_api}?contentId={content_id}'
         try:
             resp = self.session.get(url, headers=self.headers, timeout=15)
-            data = resp.json().get('data', {})
-            # 优先从 contentText 取
-            vid = self._extract_vid_from_text(data.get('contentText', ''))
-            if vid:
-                return vid
-            # 再从 videoList 里找 checked=true 的那集
-            for season_obj in data.get('videoList', []):
-                for ep in season_obj.get('videoEpisodesList', []):
-                    if ep.get('checked') and str(ep.get('contentId')) == content_id:
-                        return self._extract_vid_from_text(ep.get('contentText', ''))
+            data = resp.json().get('data') or {}
         except Exception as e:
-            print(f"[_get_vid_from_detail_api] Error: {e}")
-        return ''
+            print(f"[_fetch_detail_record] Error: {e}")
+            return None
+
+        # 优先从 contentText 取 vid，再从 videoList 里找 checked=true 的那集
+        vid = self._extract_vid_from_text(data.get('contentText', ''))
+        remarks = data.get('createTime', '')[:10]
+        for season_obj in data.get('videoList', []):
+            for ep in season_obj.get('videoEpisodesList', []):
+                if ep.get('checked') and str(ep.get('contentId')) == content_id:
+                    vid = vid or self._extract_vid_from_text(ep.get('contentText', ''))
+                    remarks = (f"第{season_obj.get('videoSeasons', 0)}季 "
+                               f"第{ep.get('videoEpisodes', 0)}集")
+
+        if record is not None:
+            record.vid = record.vid or vid
+            return record
+        title = data.get('contentTitle', '').strip()
+        if not (title or vid):
+            return None
+        record = Episode(content_id, title or f'视频{content_id}',
+                         data.get('firstImg', ''), vid, remarks)
+        self._records[content_id] = record
+        return record
 
     def _get_mp4_by_vid(self, vid):
-        """
-        vv.video.qq.com/getinfo 获取 mp4 直链（无需 cKey，实测可用）
-        结构: vl.vi[0] → ul.ui[0].url + fn + ?sdtfrom=v3010&guid=...&vkey=fvkey
-        """
+        """获取单个 vid 的 mp4 直链（优先使用未过期的缓存）"""
         if not vid:
             return ''
-        url = (f'{self.txvideo_api}?vids={vid}'
-               f'&platform={self.platform}&charge=0&otype=json&guid={self.guid}')
-        try:
-            resp = self.session.get(url, headers={
-                'User-Agent': self.headers['User-Agent'],
-                'Referer':    'https://v.qq.com/',
-            }, timeout=15)
-            txt = resp.text
-            m = re.search(r'\{.*\}', txt, re.DOTALL)
-            if not m:
-                return ''
-            data    = json.loads(m.group())
-            vi_list = data.get('vl', {}).get('vi', [])
-            if not vi_list:
-                return ''
-            vi    = vi_list[0]
-            fn    = vi.get('fn', '')
-            fvkey = vi.get('fvkey', '')
-            ui    = vi.get('ul', {}).get('ui', [])
-            base  = ui[0].get('url', '') if ui else ''
-            if not (fn and fvkey and base):
-                return ''
-            mp4 = f"{base}{fn}?sdtfrom=v3010&guid={self.guid}&vkey={fvkey}"
-            print(f"[_get_mp4] vid={vid} → OK")
-            return mp4
-        except Exception as e:
-            print(f"[_get_mp4] Error: {e}")
-            return ''
+        cached = self._cached_mp4(vid)
+        if cached:
+            print(f"[_get_mp4] vid={vid} → cache")
+            return cached
+        return self._resolve_vids([vid]).get(vid, '')
+
+    def _cached_mp4(self, vid):
+        with self._mp4_lock:
+            entry = self._mp4_cache.get(vid)
+        if entry and entry[1] > time.time():
+            return entry[0]
+        return ''
+
+    def _resolve_vids(self, vids):
+        """
+        vv.video.qq.com/getinfo 批量获取 mp4 直链（无需 cKey，实测可用）
+        vids 用 | 连接，一次请求解析多集
+        结构: vl.vi[i] → ul.ui[0].url + fn + ?sdtfrom=v3010&guid=...&vkey=fvkey
+        返回 {vid: mp4}，结果按 vkey 有效期（vi.ct 秒）写入缓存
+        """
+        result = {}
+        for i in range(0, len(vids), self.max_batch_vids):
+            batch = vids[i:i + self.max_batch_vids]
+            url = (f'{self.txvideo_api}?vids={"|".join(batch)}'
+                   f'&platform={self.platform}&charge=0&otype=json&guid={self.guid}')
+            try:
+                resp = self.session.get(url, headers={
+                    'User-Agent': self.headers['User-Agent'],
+                    'Referer':    'https://v.qq.com/',
+                }, timeout=15)
+                m = re.search(r'\{.*\}', resp.text, re.DOTALL)
+                if not m:
+                    continue
+                data = json.loads(m.group())
+                now = time.time()
+                for vi in data.get('vl', {}).get('vi', []):
+                    vid   = vi.get('vid', '') or (batch[0] if len(batch) == 1 else '')
+                    fn    = vi.get('fn', '')
+                    fvkey = vi.get('fvkey', '')
+                    ui    = vi.get('ul', {}).get('ui', [])
+                    base  = ui[0].get('url', '') if ui else ''
+                    if not (vid and fn and fvkey and base):
+                        continue
+                    mp4 = f"{base}{fn}?sdtfrom=v3010&guid={self.guid}&vkey={fvkey}"
+                    ttl = int(vi.get('ct') or self.vkey_default_ttl)
+                    with self._mp4_lock:
+                        self._mp4_cache[vid] = (mp4, now + max(0, ttl - self.vkey_margin))
+                    result[vid] = mp4
+                print(f"[_resolve_vids] {len(batch)} vids → {sum(v in result for v in batch)} OK")
+            except Exception as e:
+                print(f"[_resolve_vids] Error: {e}")
+        return result
+
+    def _prefetch_next_episodes(self, vid):
+        """后台解析同一季中 vid 之后的 prefetch_count 集"""
+        next_vids = []
+        for eps in list(self._season_cache.values()):
+            ep_vids = [ep.vid for ep in eps]
+            if vid in ep_vids:
+                start = ep_vids.index(vid) + 1
+                next_vids = ep_vids[start:start + self.prefetch_count]
+                break
+
+        with self._mp4_lock:
+            todo = [v for v in next_vids
+                    if v and v not in self._mp4_pending
+                    and not (v in self._mp4_cache and self._mp4_cache[v][1] > time.time())]
+            self._mp4_pending.update(todo)
+        if not todo:
+            return
+
+        def run():
+            try:
+                self._resolve_vids(todo)
+            finally:
+                with self._mp4_lock:
+                    self._mp4_pending.difference_update(todo)
+
+        threading.Thread(target=run, daemon=True).start()
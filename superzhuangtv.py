@@ -2,21 +2,143 @@
 # coding=utf-8
 # 超级装视频爬虫 - 集成Playwright自动嗅探 by Claude & GPT
 
+import asyncio
+import os
 import sys
-import requests
 import re
 import json
+import threading
 import time
 import base64
 from urllib.parse import quote, unquote
 
 sys.path.append('..')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from base.spider import Spider
+from tvbox_http import HttpClient
+from play_extractor import extract_url
+
+
+class BrowserPool:
+    """常驻的 Playwright 浏览器池，用于嗅探详情页里的真实 mp4 直链
+
+    - 浏览器和 context 只启动一次，后台事件循环线程里复用；
+      启动过程加 asyncio 锁，并发嗅探不会各自拉起一个 Chromium
+    - 同时打开的页面数不超过 max_pages
+    - 拦截请求：图片/字体/样式直接丢弃；看到第一个非广告 .mp4 请求就返回，
+      并中止该视频下载，不再固定等待
+    """
+
+    AD_HOSTS = ('ugchsy.gtimg.com',)
+    BLOCKED_TYPES = ('image', 'font', 'stylesheet')
+
+    def __init__(self, max_pages=2):
+        self.max_pages = max_pages
+        self._lock = threading.Lock()
+        self._loop = None
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._pages = None
+        self._browser_lock = None
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever,
+                                 name='superzhuang-browser', daemon=True).start()
+            return self._loop
+
+    async def _ensure_browser(self):
+        # 只在事件循环线程里执行，锁的懒创建本身不会并发
+        if self._browser_lock is None:
+            self._browser_lock = asyncio.Lock()
+        async with self._browser_lock:
+            if self._context is None:
+                from playwright.async_api import async_playwright
+                self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=True)
+                self._context = await self._browser.new_context()
+                self._pages = asyncio.Semaphore(self.max_pages)
+        return self._context
+
+    def _is_video(self, url):
+        path = url.split('?', 1)[0]
+        return path.endswith('.mp4') and not any(h in url for h in self.AD_HOSTS)
+
+    async def _sniff(self, detail_url, timeout):
+        context = await self._ensure_browser()
+        async with self._pages:
+            page = await context.new_page()
+            found = asyncio.get_running_loop().create_future()
+
+            async def route(r):
+                req = r.request
+                if self._is_video(req.url):
+                    if not found.done():
+                        found.set_result(req.url)
+                    await r.abort()
+                elif req.resource_type in self.BLOCKED_TYPES:
+                    await r.abort()
+                else:
+                    await r.continue_()
+
+            try:
+                await page.route('**/*', route)
+                try:
+                    await page.goto(detail_url, timeout=timeout * 1000, wait_until='domcontentloaded')
+                except Exception as e:
+                    if not found.done():
+                        print(f"Playwright 加载页面出错: {e}")
+                if not found.done():
+                    # 尝试点击常见的播放按钮
+                    try:
+                        await page.click('button, .play, .vjs-big-play-button', timeout=2000)
+                    except Exception:
+                        pass  # 有些页面可能不需要点击
+                return await asyncio.wait_for(asyncio.shield(found), timeout)
+            except asyncio.TimeoutError:
+                return None
+            finally:
+                await page.close()
+
+    def sniff(self, detail_url, timeout=10):
+        """同步接口：返回 mp4 直链，超时或失败返回 None"""
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self._sniff(detail_url, timeout), loop)
+        try:
+            return future.result(timeout * 3)
+        except Exception as e:
+            print(f"Playwright 嗅探出错: {e}")
+            future.cancel()
+            return None
+
+    async def _close(self):
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._browser = self._context = self._playwright = None
+        self._pages = self._browser_lock = None
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), loop).result(10)
+        except Exception as e:
+            print(f"关闭 Playwright 出错: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+
 
 class Spider(Spider):
     def init(self, extend=""):
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        self.session = HttpClient(headers=self.headers)
+        # 每个实例独占一个浏览器池，destroy() 只关闭自己的
+        self.browser_pool = BrowserPool(max_pages=2)
         print("超级装 initialized")
         return
 
@@ -30,7 +152,8 @@ class Spider(Spider):
         pass
 
     def destroy(self):
-        pass
+        self.browser_pool.close()
+        self.session.close()
 
     # 基础配置
     source_url = 'https://raw.githubusercontent.com/boleechat/collect/refs/heads/main/superzhuang.txt'
@@ -47,6 +170,14 @@ class Spider(Spider):
     # 缓存抓取的数据
     data_cache = None
 
+    # Playwright 兜底：常驻浏览器池（init 中按实例创建）+ 按详情页缓存嗅探结果（mp4 的 vkey 会过期）
+    sniff_cache = {}
+    sniff_cache_ttl = 3600
+
+    # 详情页 → 提取到的播放地址（mp4 的 vkey 会过期）
+    play_cache = {}
+    play_cache_ttl = 3600
+
     def homeContent(self, filter):
         """生成首页内容"""
         result = {}
@@ -156,37 +287,21 @@ class Spider(Spider):
         return {'list': results, 'page': pg, 'pagecount': 1, 'limit': 50, 'total': len(results)}
 
     def get_real_video_url_by_playwright(self, detail_url):
-        """使用Playwright自动嗅探详情页中的真实视频直链（过滤广告）"""
+        """使用常驻浏览器池嗅探详情页中的真实视频直链（过滤广告，结果缓存）"""
+        cached = self.sniff_cache.get(detail_url)
+        if cached and cached[1] > time.time():
+            return cached[0]
+
         try:
-            from playwright.sync_api import sync_playwright
+            import playwright  # noqa: F401
         except ImportError:
             print("Playwright 未安装，无法自动嗅探视频直链。")
             return None
 
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            video_url = None
-
-            def handle_response(response):
-                url = response.url
-                if url.endswith('.mp4') and 'ugchsy.gtimg.com' not in url:
-                    nonlocal video_url
-                    video_url = url
-
-            page.on("response", handle_response)
-            try:
-                page.goto(detail_url, timeout=15000)
-                # 尝试点击常见的播放按钮
-                try:
-                    page.click('button, .play, .vjs-big-play-button', timeout=5000)
-                except Exception:
-                    pass  # 有些页面可能不需要点击
-                page.wait_for_timeout(5000)  # 等待视频加载
-            except Exception as e:
-                print(f"Playwright 加载页面出错: {e}")
-            browser.close()
-            return video_url
+        video_url = self.browser_pool.sniff(detail_url)
+        if video_url:
+            self.sniff_cache[detail_url] = (video_url, time.time() + self.sniff_cache_ttl)
+        return video_url
 
     def playerContent(self, flag, id, vipFlags):
         """获取视频播放信息 - 修复版"""
@@ -197,69 +312,13 @@ class Spider(Spider):
             print(f"正在解析URL: {id}")
             
             try:
-                # 1. 发送请求获取页面内容
-                response = self.session.get(id, headers=headers, timeout=10)
-                response.raise_for_status()
-                html_content = response.text
-                
-                # 2. 提取视频ID和模板信息
-                # 多种提取方法，应对可能的变化
-                
-                # 方法1: 直接寻找腾讯视频链接
-                tc_qq_matches = re.findall(r'(https?://[^\'"\s]*?\.tc\.qq\.com[^\'"\s]*?\.mp4[^\'"\s]*)', html_content)
-                if tc_qq_matches and len(tc_qq_matches) > 0:
-                    video_url = tc_qq_matches[0].replace('\\/', '/').replace('\\u002F', '/')
-                    print(f"方法1成功: {video_url[:100]}...")
-                    return {'parse': 0, 'url': video_url, 'header': headers}
-                
-                # 方法2: 查找vid和视频模板
-                vid_match = re.search(r'vid\s*[=:]\s*[\'\"]([^\'\"]+)[\'\"]', html_content)
-                template_match = re.search(r'templatePath\s*[=:]\s*[\'\"]([^\'\"]+)[\'\"]', html_content)
-                
-                if vid_match and template_match:
-                    vid = vid_match.group(1)
-                    template = template_match.group(1)
-                    video_url = f"https://v.qq.com/x/page/{vid}.html"
-                    print(f"方法2成功: VID={vid}, Template={template}")
-                    # 返回腾讯视频页面，让TVBox的解析器处理
-                    return {'parse': 1, 'url': video_url, 'header': headers}
-                
-                # 方法3: 寻找video标签
-                video_match = re.search(r'<video[^>]*src=[\'\"]([^\'\"]+)[\'\"]', html_content)
-                if video_match:
-                    video_url = video_match.group(1)
-                    if video_url.startswith('//'):
-                        video_url = 'https:' + video_url
-                    print(f"方法3成功: {video_url[:100]}...")
-                    return {'parse': 0, 'url': video_url, 'header': headers}
-                
-                # 方法4: 查找播放器初始化代码
-                player_match = re.search(r'new\s+Player\s*\(\s*\{\s*url\s*:\s*[\'\"]([^\'\"]+)[\'\"]', html_content)
-                if player_match:
-                    video_url = player_match.group(1)
-                    if video_url.startswith('//'):
-                        video_url = 'https:' + video_url
-                    print(f"方法4成功: {video_url[:100]}...")
-                    return {'parse': 0, 'url': video_url, 'header': headers}
-                
-                # 方法5: 查找iframe嵌入
-                iframe_match = re.search(r'<iframe[^>]*src=[\'\"]([^\'\"]+)[\'\"]', html_content)
-                if iframe_match:
-                    iframe_url = iframe_match.group(1)
-                    if iframe_url.startswith('//'):
-                        iframe_url = 'https:' + iframe_url
-                    
-                    # 如果是腾讯视频的iframe
-                    if 'v.qq.com' in iframe_url:
-                        print(f"方法5成功: 找到腾讯视频iframe - {iframe_url}")
-                        return {'parse': 1, 'url': iframe_url, 'header': headers}
-                
-                # 方法6: 通用搜索所有可能的视频链接
-                video_urls = re.findall(r'(https?://[^\'"\s]*?(?:\.mp4|\.m3u8)[^\'"\s]*)', html_content)
-                if video_urls and len(video_urls) > 0:
-                    video_url = video_urls[0].replace('\\/', '/').replace('\\u002F', '/')
-                    print(f"方法6成功: {video_url[:100]}...")
-                    return {'parse': 0, 'url': video_url, 'header': headers}
+                # 单次扫描页面，按 方法1~6 的优先级取结果
+                found = extract_url(self.session, id, headers,
+                                    cache=self.play_cache, ttl=self.play_cache_ttl)
+                if found:
+                    parse, video_url, method = found
+                    print(f"{method}成功: {video_url[:100]}...")
+                    return {'parse': parse, 'url': video_url, 'header': headers}
                 
                 # Playwright兜底方案
                 print("尝试用 Playwright 自动嗅探视频直链...")
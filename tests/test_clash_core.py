@@ -0,0 +1,71 @@
+import os
+
+from clash_core import StubCore
+from clash_latency import LatencyTester
+
+import update_clash_config
+
+
+def test_latency_tester_ranks_through_stub_core():
+    delays = {'SG-1': 120, 'SG-2': 45, 'SG-3': 80, 'SG-dead': None}
+    with StubCore(delays) as core:
+        ranking = LatencyTester(probe=core.probe, timeout=1, samples=2,
+                                max_workers=8).run({name: ['http://t/204'] for name in delays})
+
+    assert [stats.node for stats in ranking] == ['SG-2', 'SG-3', 'SG-1', 'SG-dead']
+    assert ranking[0].median == 45
+    assert not ranking[-1].alive
+    assert ('SG-dead', 'http://t/204') in core.requests
+
+
+def test_unknown_proxy_and_secret():
+    with StubCore({'a': 10}, secret='s3cret') as core:
+        assert core.probe('a', 'http://t/204', 1) == 10
+        assert core.probe('missing', 'http://t/204', 1) is None
+
+
+def test_find_fastest_proxies_through_stub_core():
+    region_nodes = {'SG': ['SG-slow', 'SG-fast', 'SG group'], 'HK': ['HK-1', 'HK-2']}
+    groups = [{'name': 'SG group', 'type': 'url-test', 'url': 'http://group/204'}]
+    delays = {'SG-slow': 300, 'SG-fast': 30, 'SG group': 60, 'HK-1': None, 'HK-2': 90}
+    with StubCore(delays) as core:
+        fastest = update_clash_config.find_fastest_proxies(region_nodes, groups, core.probe)
+
+    assert fastest == {'SG': 'SG-fast', 'HK': 'HK-2'}
+    # Groups with their own test URL are probed on it, the rest on TEST_URLS
+    assert {url for name, url in core.requests if name == 'SG group'} == {'http://group/204'}
+    assert ({url for name, url in core.requests if name == 'SG-fast'}
+            <= set(update_clash_config.TEST_URLS))
+
+
+def test_all_nodes_dead_falls_back_to_first():
+    with StubCore({'SG-1': None, 'SG-2': None}) as core:
+        fastest = update_clash_config.find_fastest_proxies({'SG': ['SG-1', 'SG-2']}, [], core.probe)
+    assert fastest == {'SG': 'SG-1'}
+
+
+def test_direct_fallback_leaves_history_alone(tmp_path, monkeypatch):
+    with open(os.path.join(os.path.dirname(update_clash_config.__file__), 'cll2.yml'), 'rb') as f:
+        source = f.read()
+    rules = tmp_path / 'rules.txt'
+    rules.write_text('DOMAIN,example.com,PLACEHOLDER\n', encoding='utf-8')
+    history = tmp_path / 'latency_history.csv'
+    calls = []
+
+    def fastest(region_nodes, groups, probe=None, history=None):
+        calls.append(history)
+        return {region: nodes[0] for region, nodes in region_nodes.items() if nodes}
+
+    monkeypatch.setenv('SOURCE_URL', 'http://example.com/cll2.yml')
+    monkeypatch.setenv('OUTPUT_FILE_NAME', str(tmp_path / 'out.yml'))
+    monkeypatch.setenv('RULES_FILE_NAME', str(rules))
+    monkeypatch.setenv('PLACEHOLDER_PROXY', 'PLACEHOLDER')
+    monkeypatch.setattr(update_clash_config, 'fetch_content', lambda url: (source.decode(), source))
+    monkeypatch.setattr(update_clash_config.ClashCore, 'available', staticmethod(lambda: False))
+    monkeypatch.setattr(update_clash_config, 'find_fastest_proxies', fastest)
+    monkeypatch.setattr(update_clash_config, 'HISTORY_FILE', str(history))
+    update_clash_config.main()
+
+    assert calls == [None]
+    assert not history.exists()
+    assert (tmp_path / 'out.yml').exists()
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from clash_regions import PREFIXES, RegionClassifier, parse_prefixes
+from clash_yaml import load_sections
+
+
+@pytest.mark.parametrize('name', ['RUSSIA', 'AUSTRALIA', 'BELARUS', 'AUS', 'Russia', 'plus',
+                                  'NETWORK', 'TWITTER', 'Twitter'])
+def test_codes_inside_words_do_not_match(name):
+    assert RegionClassifier().classify(name) is None
+
+
+@pytest.mark.parametrize('name, region', [
+    ('akile-us4837', 'US'), ('US-BWGDC01', 'US'), ('USA-L', 'US'), ('USS-2ISP', 'US'),
+    ('sg3-zf', 'SG'), ('SG-L', 'SG'), ('SGG193', 'SG'), ('SSGLXCC', 'SG'),
+    ('Relay-YXVM-SG3', 'SG'), ('BANDWAGON-HK', 'HK'), ('YXVM-HKK', 'HK'),
+    ('HKHEN0402', 'HK'), ('🇹🇼 TW-01', 'TW'), ('东京 01', 'JP'),
+])
+def test_node_names(name, region):
+    assert RegionClassifier().classify(name) == region
+
+
+def test_classify_all_keeps_order():
+    names = ['SGG193', 'TWITTER', 'USS-2ISP', 'sg3', 'RUSSIA-01']
+    assert RegionClassifier().classify_all(names, ['SG', 'US']) == {
+        'SG': ['SGG193', 'sg3'], 'US': ['USS-2ISP']}
+
+
+def test_prefixes_match_nodes_of_the_checked_in_config():
+    # PREFIXES are the provider's node names; this fails when it renames them
+    with open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'cll2.yml'), 'rb') as f:
+        sections = load_sections(f.read(), ('proxies', 'proxy-groups'))
+    names = [p['name'] for p in sections['proxies']] + [g['name'] for g in sections['proxy-groups']]
+    for code, prefixes in PREFIXES.items():
+        for prefix in prefixes:
+            only = RegionClassifier(regions={code: []}, prefixes={code: [prefix]})
+            assert any(only.classify(name) == code for name in names), \
+                f'{code} prefix {prefix!r} matches no node in cll2.yml'
+
+
+def test_parse_prefixes():
+    prefixes = parse_prefixes('HK=HKX, HKY\nUS=; JP=JPN')
+    assert prefixes['HK'] == ['HKX', 'HKY']
+    assert prefixes['US'] == []
+    assert prefixes['JP'] == ['JPN']
+    assert prefixes['SG'] == PREFIXES['SG']
+    classifier = RegionClassifier(prefixes=prefixes)
+    assert classifier.classify('USS-2ISP') is None
+    assert classifier.classify('HKX01') == 'HK'
@@ -0,0 +1,63 @@
+from clash_rules import RuleSet, linear_match, parse_rule, parse_rules
+
+
+def kept(lines):
+    ruleset = RuleSet(parse_rules(lines))
+    return [rule.text for rule in ruleset.rules if rule.type], ruleset
+
+
+def test_duplicates_and_domain_shadowing():
+    rules, ruleset = kept([
+        'DOMAIN-SUFFIX,google.com,Proxy',
+        'DOMAIN,www.google.com,DIRECT',
+        'DOMAIN-SUFFIX,mail.google.com,Proxy',
+        'DOMAIN-KEYWORD,tube,Proxy',
+        'DOMAIN-SUFFIX,youtube.com,DIRECT',
+        'DOMAIN-SUFFIX,GOOGLE.com,DIRECT',
+        'MATCH,Final',
+        'DOMAIN,after.match,DIRECT',
+    ])
+    assert rules == ['DOMAIN-SUFFIX,google.com,Proxy', 'DOMAIN-KEYWORD,tube,Proxy', 'MATCH,Final']
+    assert len(ruleset.shadowed) == 5
+    assert [(r.text, by.text) for r, by in ruleset.conflicts()][0] == (
+        'DOMAIN,www.google.com,DIRECT', 'DOMAIN-SUFFIX,google.com,Proxy')
+
+
+def test_no_resolve_is_part_of_ip_keys():
+    # The earlier rule does not resolve, so the later one still matches
+    # domains that resolve into the network
+    rules, _ = kept(['IP-CIDR,10.0.0.0/8,DIRECT,no-resolve',
+                     'IP-CIDR,10.0.0.0/8,Proxy'])
+    assert rules == ['IP-CIDR,10.0.0.0/8,DIRECT,no-resolve', 'IP-CIDR,10.0.0.0/8,Proxy']
+
+    rules, _ = kept(['IP-CIDR,10.0.0.0/8,DIRECT',
+                     'IP-CIDR,10.0.0.0/8,Proxy,no-resolve',
+                     'IP-CIDR,10.1.0.0/16,Proxy'])
+    assert rules == ['IP-CIDR,10.0.0.0/8,DIRECT']
+
+
+def test_logical_rules_are_opaque():
+    rule = parse_rule('- AND,((DOMAIN,example.com),(NETWORK,UDP)),REJECT')
+    assert (rule.type, rule.payload, rule.target, rule.options) == (
+        'AND', '((DOMAIN,example.com),(NETWORK,UDP))', 'REJECT', ())
+    rule = parse_rule('OR,((DOMAIN-SUFFIX,a.com),(DST-PORT,443)),Proxy,no-resolve')
+    assert (rule.target, rule.options) == ('Proxy', ('no-resolve',))
+
+    lines = ['DOMAIN-SUFFIX,example.com,Proxy',
+             'AND,((DOMAIN,example.com),(NETWORK,UDP)),REJECT',
+             'AND,((DOMAIN,example.com),(NETWORK,UDP)),REJECT',
+             'NOT,((DOMAIN-KEYWORD,ads)),DIRECT',
+             'MATCH,Final',
+             'SUB-RULE,(NETWORK,TCP),sub']
+    rules, ruleset = kept(lines)
+    assert rules == lines
+    assert ruleset.shadowed == []
+
+
+def test_match_agrees_with_linear_scan():
+    rules = parse_rules(['DOMAIN,a.example.com,A', 'DOMAIN-SUFFIX,example.com,B',
+                         'DOMAIN-KEYWORD,track,C', 'DOMAIN-SUFFIX,qlogo.cn,D', 'MATCH,E'])
+    ruleset = RuleSet(rules)
+    for domain in ('a.example.com', 'x.example.com', 'example.com', 'tracker.net',
+                   'p.qlogo.cn', 'other.org', 'EXAMPLE.COM.'):
+        assert ruleset.match(domain) is linear_match(ruleset.rules, domain)
@@ -0,0 +1,56 @@
+import os
+
+from clash_rules import split_rules_section
+from clash_yaml import load_sections
+from config_patch import ConfigPatch
+
+CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cll2.yml')
+SECTIONS = ('proxies', 'proxy-groups', 'rules')
+
+
+def original():
+    with open(CONFIG, 'rb') as f:
+        return f.read()
+
+
+def patched(rules, substitutions=None):
+    patch = ConfigPatch()
+    patch.insert_rules(rules, 'top')
+    for old, new in (substitutions or {}).items():
+        patch.substitute(old, new)
+    return patch, patch.apply(original())
+
+
+def test_rules_go_in_at_the_top():
+    rules = ['DOMAIN-SUFFIX,example.com,SGG193', 'DOMAIN-KEYWORD,example-cdn,DIRECT']
+    patch, text = patched(['# comment', *rules, ''])
+    before = load_sections(original(), ('rules',))['rules']
+    after = load_sections(text, ('rules',))['rules']
+    assert after[:2] == rules
+    assert after[2:] == [rule.text for rule in patch.ruleset.rules][2:]
+    assert set(after[2:]) <= set(before)
+
+
+def test_rest_of_the_document_is_unchanged():
+    source = original().decode('utf-8-sig')
+    _, text = patched(['DOMAIN-SUFFIX,example.com,SGG193'])
+    head, _, tail = split_rules_section(source)
+    new_head, rules, new_tail = split_rules_section(text)
+    assert new_head == head
+    assert new_tail == tail
+    assert rules[0] == '  - DOMAIN-SUFFIX,example.com,SGG193\n'
+
+
+def test_placeholder_is_substituted_in_inserted_rules_only():
+    before = load_sections(original(), SECTIONS)
+    group = before['proxy-groups'][3]['name']
+    proxy = before['proxies'][0]['name']
+    _, text = patched([f'DOMAIN-SUFFIX,t.me,{group}', f'DOMAIN,example.com,{proxy}'],
+                      {group: 'SGG193', proxy: 'SGG193'})
+    after = load_sections(text, SECTIONS)
+    assert after['rules'][:2] == ['DOMAIN-SUFFIX,t.me,SGG193', 'DOMAIN,example.com,SGG193']
+    # Group and proxy names, and the rules that were already there, keep them
+    assert after['proxy-groups'] == before['proxy-groups']
+    assert after['proxies'] == before['proxies']
+    assert set(after['rules'][2:]) <= set(before['rules'])
+    assert any(group in rule for rule in after['rules'][2:])
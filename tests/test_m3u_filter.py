@@ -0,0 +1,17 @@
+from m3u import Entry
+from m3u_filter import compile_filter
+from processfh_m3u import FH_FILTER
+
+
+def entry(name, group):
+    return Entry(name, f'http://a/{name}', {'tvg-name': name, 'group-title': group})
+
+
+def test_fh_filter_keeps_the_published_groups():
+    keep = compile_filter(FH_FILTER)
+    kept = [entry('更新日期', '公告'), entry('凤凰资讯', '📡  卫视频道'),
+            entry('湖南卫视', '📡  卫视频道'), entry('江西都市', '📡  江西频道'),
+            entry('广西新闻', '📡  广西频道'), entry('翡翠台', '📡  香港频道')]
+    dropped = [entry('CCTV1', '📡  央视频道'), entry('明珠台', '📡  香港频道'),
+               entry('东森新闻', '📡  台湾频道')]
+    assert [e.name for e in keep.filter(kept + dropped)] == [e.name for e in kept]
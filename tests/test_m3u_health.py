@@ -0,0 +1,99 @@
+import asyncio
+
+from m3u import Entry
+from m3u_health import HealthChecker, classify, load_results, prune, save_results
+
+TS_DATA = bytes([0x47] + [0] * 187) * 100
+PLAYLIST = b'#EXTM3U\n#EXT-X-TARGETDURATION:4\n#EXTINF:4,\nseg1.ts\n'
+
+
+def _response(status, body=b'', headers=()):
+    head = [f'HTTP/1.1 {status}', 'Connection: close', *headers]
+    if body is not None:
+        head.append(f'Content-Length: {len(body)}')
+    return ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + (body or b'')
+
+
+async def _handle(reader, writer):
+    """Minimal stand-in for a stream relay"""
+    request = await reader.readuntil(b'\r\n\r\n')
+    path = request.split(b' ', 2)[1].decode()
+    try:
+        if path == '/live.ts':
+            writer.write(_response('200 OK', TS_DATA, ['Content-Type: video/mp2t']))
+        elif path == '/live.m3u8':
+            writer.write(_response('200 OK', PLAYLIST))
+        elif path == '/redirect':
+            writer.write(_response('302 Found', b'', ['Location: /live.ts']))
+        elif path == '/chunked':
+            writer.write(_response('200 OK', None, ['Transfer-Encoding: chunked']))
+            for i in range(0, len(TS_DATA), 1000):
+                chunk = TS_DATA[i:i + 1000]
+                writer.write(f'{len(chunk):x}\r\n'.encode() + chunk + b'\r\n')
+                await writer.drain()
+            writer.write(b'0\r\n\r\n')
+        elif path == '/page.html':
+            writer.write(_response('200 OK', b'<html><body>not a stream</body></html>'))
+        elif path == '/hang':
+            writer.write(_response('200 OK', None, ['Content-Type: video/mp2t']))
+            await writer.drain()
+            await asyncio.sleep(30)
+        else:
+            writer.write(_response('404 Not Found', b'missing'))
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+def _check(paths, **options):
+    async def run():
+        server = await asyncio.start_server(_handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        urls = [f'http://127.0.0.1:{port}{path}' for path in paths]
+        try:
+            results = await HealthChecker(**options).check_async(urls)
+        finally:
+            server.close()
+        return {path: results[url] for path, url in zip(paths, urls)}
+    return asyncio.run(run())
+
+
+def test_stream_kinds():
+    results = _check(['/live.ts', '/live.m3u8', '/redirect', '/chunked'], timeout=2)
+    assert (results['/live.ts'].ok, results['/live.ts'].kind) == (True, 'ts')
+    assert (results['/live.m3u8'].ok, results['/live.m3u8'].kind) == (True, 'hls')
+    assert (results['/redirect'].ok, results['/redirect'].kind) == (True, 'ts')
+    assert (results['/chunked'].ok, results['/chunked'].kind) == (True, 'ts')
+    assert all(result.latency >= 0 for result in results.values())
+
+
+def test_dead_streams():
+    results = _check(['/page.html', '/missing', '/hang'], timeout=0.5)
+    assert results['/page.html'].error == 'not a TS/HLS stream'
+    assert results['/missing'].error == 'HTTP 404'
+    assert results['/hang'].error == 'timeout'
+    assert not any(result.ok for result in results.values())
+
+
+def test_read_bytes_limit():
+    results = _check(['/chunked'], timeout=2, read_bytes=188 * 3)
+    assert results['/chunked'].ok
+
+
+def test_classify_needs_aligned_packets():
+    assert classify(TS_DATA[5:]) == 'ts'
+    assert classify(b'\x47' * 100) is None
+    assert classify(b'  #EXTM3U\n') == 'hls'
+
+
+def test_prune_and_results_roundtrip(tmp_path):
+    results = _check(['/live.ts', '/missing', '/live.m3u8'], timeout=2)
+    entries = [Entry(path, path) for path in ('/missing', '/live.m3u8', '/live.ts')]
+    results['/live.ts'].latency, results['/live.m3u8'].latency = 5.0, 50.0
+    assert [e.url for e in prune(entries, results)] == ['/live.ts', '/live.m3u8']
+    assert [e.url for e in prune(entries, results, keep_order=True)] == ['/live.m3u8', '/live.ts']
+
+    path = tmp_path / 'health.json'
+    save_results(path, results)
+    loaded = load_results(path)
+    assert loaded['/live.ts'].to_dict() == results['/live.ts'].to_dict()
@@ -0,0 +1,37 @@
+import pytest
+
+from m3u import Entry
+from m3u_merge import group_channels, normalize_name
+
+
+@pytest.mark.parametrize('name, key', [
+    ('CCTV1综合', 'CCTV1'),
+    ('CCTV-1', 'CCTV1'),
+    ('CCTV 13 新闻', 'CCTV13'),
+    ('CCTV5+体育赛事', 'CCTV5+'),
+    ('CCTV4欧洲', 'CCTV4欧洲'),
+    ('CCTV4', 'CCTV4'),
+    ('CCTV4K', 'CCTV4K'),
+    ('CCTV-4K', 'CCTV4K'),
+    ('CCTV4K超高清', 'CCTV4K'),
+    ('cctv 4k', 'CCTV4K'),
+    ('CCTV8', 'CCTV8'),
+    ('CCTV8K超高清', 'CCTV8K'),
+    ('湖南卫视高清', '湖南卫视'),
+    ('翡翠台 HD', '翡翠台'),
+])
+def test_normalize_name(name, key):
+    assert normalize_name(name) == key
+
+
+def test_uhd_channels_are_not_merged_with_regular_ones():
+    entries = [Entry('CCTV4', 'http://a/4'), Entry('CCTV4K超高清', 'http://a/4k'),
+               Entry('CCTV-4K', 'http://b/4k'), Entry('CCTV8K', 'http://a/8k'),
+               Entry('CCTV-8', 'http://a/8')]
+    channels = group_channels(entries)
+    assert {key: list(channel.urls) for key, channel in channels.items()} == {
+        'CCTV4': ['http://a/4'],
+        'CCTV4K': ['http://a/4k', 'http://b/4k'],
+        'CCTV8K': ['http://a/8k'],
+        'CCTV8': ['http://a/8'],
+    }
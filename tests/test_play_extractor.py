@@ -0,0 +1,63 @@
+from play_extractor import PlayExtractor, extract, extract_url
+
+TC_MP4 = 'https://ugc.tc.qq.com/abc/video.mp4?vkey=123'
+
+
+def test_tc_mp4_inside_foreign_iframe():
+    # Not a v.qq.com iframe, but its src is the direct mp4 the old 方法1 found
+    html = f'<div><iframe src="{TC_MP4}"></iframe></div>'
+    assert extract(html) == (0, TC_MP4, '方法1')
+
+
+def test_media_inside_foreign_iframe():
+    url = 'https://cdn.example.com/live/index.m3u8'
+    html = f'<iframe src="{url}"></iframe>'
+    assert extract(html) == (0, url, '方法6')
+
+
+def test_foreign_iframe_alone_is_ignored():
+    assert extract('<iframe src="https://player.example.com/embed/1"></iframe>') is None
+
+
+def test_tencent_iframe():
+    html = '<iframe src="//v.qq.com/txp/iframe/player.html?vid=x1"></iframe>'
+    assert extract(html) == (1, 'https://v.qq.com/txp/iframe/player.html?vid=x1', '方法5')
+
+
+def test_priority_follows_original_methods():
+    html = ('<video src="//cdn.example.com/a.mp4"></video>'
+            'var vid = "v123"; templatePath: "tpl";')
+    assert extract(html) == (1, 'https://v.qq.com/x/page/v123.html', '方法2')
+
+
+def test_chunked_feed_matches_whole_page():
+    html = 'x' * 3000 + f'<iframe src="{TC_MP4}"></iframe>' + 'y' * 3000
+    extractor = PlayExtractor()
+    done = False
+    for i in range(0, len(html), 7):
+        if extractor.feed(html[i:i + 7]):
+            done = True
+            break
+    if not done:
+        extractor.feed('', final=True)
+    assert extractor.result() == extract(html)
+
+
+class FakeSession:
+    def __init__(self, body):
+        self.body = body
+        self.requests = 0
+
+    def iter_bytes(self, url, headers=None, timeout=None):
+        self.requests += 1
+        for i in range(0, len(self.body), 5):
+            yield self.body[i:i + 5]
+
+
+def test_extract_url_streams_and_caches():
+    session = FakeSession(f'<iframe src="{TC_MP4}">'.encode('utf-8'))
+    cache = {}
+    first = extract_url(session, 'https://m.superzhuang.com/p/1', cache=cache)
+    second = extract_url(session, 'https://m.superzhuang.com/p/1', cache=cache)
+    assert first == second == (0, TC_MP4, '方法1')
+    assert session.requests == 1
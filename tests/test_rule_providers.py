@@ -0,0 +1,57 @@
+import os
+
+from clash_yaml import load_sections
+from rule_providers import BASE_URL, convert_config, prune_directory
+
+FOREIGN = {'type': 'http', 'behavior': 'classical', 'format': 'yaml',
+           'url': 'https://example.com/lists/ads.yaml', 'path': './ruleset/ads.yaml',
+           'interval': 86400}
+
+
+def config(domains, target='Proxy'):
+    rules = '\n'.join(f'  - DOMAIN-SUFFIX,{domain},{target}' for domain in domains)
+    return ('mixed-port: 7890\n'
+            'rule-providers:\n'
+            '  ads:\n' + ''.join(f'    {key}: {value}\n' for key, value in FOREIGN.items()) +
+            'rules:\n'
+            '  - RULE-SET,ads,REJECT\n' + rules + '\n  - MATCH,DIRECT\n')
+
+
+def convert(text, directory):
+    text, keep = convert_config(text, str(directory), min_size=4, mrs=False)
+    prune_directory(str(directory), keep)
+    return text, load_sections(text, ('rule-providers', 'rules'))
+
+
+def generated(sections):
+    return {name for name, entry in sections['rule-providers'].items()
+            if entry['url'].startswith(BASE_URL)}
+
+
+def test_rules_move_to_a_provider(tmp_path):
+    text, sections = convert(config([f'site{i}.com' for i in range(6)]), tmp_path)
+    [name] = generated(sections)
+    assert sections['rules'] == ['RULE-SET,ads,REJECT', f'RULE-SET,{name},Proxy', 'MATCH,DIRECT']
+    assert sections['rule-providers']['ads'] == FOREIGN
+    assert os.listdir(tmp_path) == [f'{name}.yaml']
+
+    # A second run over its own output changes nothing
+    again, _ = convert(text, tmp_path)
+    assert again == text
+    assert os.listdir(tmp_path) == [f'{name}.yaml']
+
+
+def test_stale_generated_providers_are_dropped(tmp_path):
+    first, sections = convert(config([f'site{i}.com' for i in range(6)]), tmp_path)
+    [old] = generated(sections)
+
+    # The next source has different rules; feed it the previous output's
+    # rule-providers, as a config carried over between runs would have
+    head = first.split('rules:\n')[0]
+    source = head + 'rules:\n' + config([f'other{i}.com' for i in range(6)]).split('rules:\n')[1]
+    _, sections = convert(source, tmp_path)
+    [new] = generated(sections)
+
+    assert new != old
+    assert set(sections['rule-providers']) == {'ads', new}
+    assert os.listdir(tmp_path) == [f'{new}.yaml']
@@ -0,0 +1,61 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tvbox_http import HttpClient
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """503 for the first `failures` requests, then a fixed body"""
+
+    failures = 0
+    requests = 0
+    body = b'x' * 40000
+
+    def do_GET(self):
+        type(self).requests += 1
+        if type(self).requests <= self.failures:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    FlakyHandler.requests = 0
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}/'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_iter_bytes_retries_like_get(server, monkeypatch):
+    monkeypatch.setattr(FlakyHandler, 'failures', 2)
+    client = HttpClient(retries=2)
+    try:
+        body = b''.join(client.iter_bytes(server, chunk_size=4096))
+    finally:
+        client.close()
+    assert body == FlakyHandler.body
+    assert FlakyHandler.requests == 3
+
+
+def test_iter_bytes_gives_up_after_retries(server, monkeypatch):
+    monkeypatch.setattr(FlakyHandler, 'failures', 5)
+    client = HttpClient(retries=1)
+    try:
+        with pytest.raises(Exception):
+            b''.join(client.iter_bytes(server))
+    finally:
+        client.close()
+    assert FlakyHandler.requests == 2
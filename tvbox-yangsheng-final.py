@@ -3,22 +3,27 @@
 # TVBox养生堂爬虫 - 完全修复版
 
 import json
+import os
 import sys
 import re
 import time
 from urllib.parse import urljoin, quote, urlparse
-import requests
 from datetime import datetime, timezone, timedelta
 
 sys.path.append('..')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from base.spider import Spider
+from tvbox_http import HttpClient
+from btime_cache import MonthCache
+from search_index import SearchIndex
 
 
 class Spider(Spider):
     def init(self, extend=""):
         """初始化爬虫"""
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        self.session = HttpClient(headers=self.headers)
+        # 按月持久化的磁盘缓存，重启后无需重新抓取已结束的月份
+        self.month_cache = MonthCache('yangsheng', ttl=self._cache_duration)
         print("[养生堂] Spider initialized successfully")
         pass  # TVBox要求不返回任何值或返回pass
 
@@ -32,13 +37,14 @@ class Spider(Spider):
         pass
 
     def destroy(self):
-        pass
+        self.session.close()
 
     # 基础配置
     host = 'https://www.btime.com'
     base_url = 'https://www.btime.com/btv/btvws_yst'
     
     # API模板
+    list_id = 'btv_08da67cea600bf3c78973427bfaba12d_s0'
     api_url_template = "https://pc.api.btime.com/btimeweb/infoFlow?list_id=btv_08da67cea600bf3c78973427bfaba12d_s0_{year}_{month:02d}&refresh=1&count=50&cursor={cursor}"
     
     # 请求头
@@ -54,6 +60,10 @@ class Spider(Spider):
     _cache = {}
     _cache_time = {}
     _cache_duration = 1800  # 30分钟
+    _max_pages = 20  # 每月最多翻页数，防止 cursor 循环时无限请求
+    
+    # 标题/简介 n-gram 搜索索引，随月份缓存一起增量建立
+    _search_index = SearchIndex()
 
     def homeContent(self, filter):
         """首页分类"""
@@ -195,23 +205,21 @@ class Spider(Spider):
         try:
             print(f"[养生堂] 搜索关键词: {key}")
             
-            all_videos = self._getAllCachedVideos()
-            results = []
+            page = int(pg) if pg else 1
+            page_size = 50
             
-            key_lower = key.lower()
-            for item in all_videos:
-                title = item.get('vod_name', '').lower()
-                if key_lower in title:
-                    results.append(item)
+            # 确保已有缓存数据（同时建立搜索索引）
+            self._getAllCachedVideos()
+            results, total = self._search_index.search(key, page, page_size)
             
-            print(f"[养生堂] 搜索到 {len(results)} 个结果")
+            print(f"[养生堂] 搜索到 {total} 个结果")
             
             return {
-                'list': results[:50],
-                'page': 1,
-                'pagecount': 1,
-                'limit': 50,
-                'total': len(results)
+                'list': results,
+                'page': page,
+                'pagecount': max(1, (total + page_size - 1) // page_size),
+                'limit': page_size,
+                'total': total
             }
             
         except Exception as e:
@@ -308,15 +316,30 @@ class Spider(Spider):
             cache_time = self._cache_time.get(cache_key, 0)
             if time.time() - cache_time < self._cache_duration:
                 print(f"[养生堂] 使用缓存: {cache_key}")
-                return self._cache[cache_key]
+                return self._unseen(self._cache[cache_key], seen_ids)
+        
+        # 检查磁盘缓存
+        videos = self.month_cache.get(self.list_id, year, month)
+        if videos is not None:
+            print(f"[养生堂] 使用磁盘缓存: {cache_key}")
+            self._cache[cache_key] = videos
+            self._cache_time[cache_key] = time.time()
+            self._search_index.add_all(videos)
+            return self._unseen(videos, seen_ids)
         
         print(f"[养生堂] 正在获取 {year}-{month:02d}...")
         
         videos = []
+        month_ids = set()
         cursor = '0'
         max_tries = 3
+        complete = False
+        attempt = 0
+        pages = 0
         
-        for attempt in range(max_tries):
+        # 沿 cursor 链逐页获取，每页最多重试 max_tries 次，最多 _max_pages 页；
+        # 只有走到链尾才算完整，才写入磁盘缓存
+        while attempt < max_tries and pages < self._max_pages:
             try:
                 api_url = self.api_url_template.format(
                     year=year,
@@ -354,16 +377,20 @@ class Spider(Spider):
                 
                 items = data['data']['list']
                 if not items:
+                    complete = True
                     break
                 
-                # 解析视频
+                # 解析视频；这里只在本月内去重，跨月去重在返回时做，
+                # 这样写入缓存的是完整的月份列表
+                new_items_count = 0
                 for item in items:
                     try:
                         gid = item.get('gid', '')
-                        if not gid or gid in seen_ids:
+                        if not gid or gid in month_ids:
                             continue
                         
-                        seen_ids.add(gid)
+                        month_ids.add(gid)
+                        new_items_count += 1
                         
                         item_data = item.get('data', {})
                         title = item_data.get('title', '无标题')
@@ -407,17 +434,21 @@ class Spider(Spider):
                 
                 print(f"[养生堂] {year}-{month:02d} 获取 {len(videos)} 个视频")
                 
-                # 检查是否还有更多
+                # 检查是否还有更多：没有新视频、cursor 为空、'0' 或重复都是链尾
                 next_cursor = data['data'].get('cursor')
-                if not next_cursor or next_cursor == cursor:
+                if (new_items_count == 0 or not next_cursor
+                        or next_cursor == '0' or next_cursor == cursor):
+                    complete = True
                     break
                 
                 cursor = next_cursor
-                break  # 成功后跳出重试循环
+                pages += 1
+                attempt = 0  # 下一页重新计算重试次数
                 
             except Exception as e:
-                print(f"[养生堂] 获取失败 (尝试 {attempt+1}/{max_tries}): {e}")
-                if attempt < max_tries - 1:
+                attempt += 1
+                print(f"[养生堂] 获取失败 (尝试 {attempt}/{max_tries}): {e}")
+                if attempt < max_tries:
                     time.sleep(1)
                 continue
         
@@ -425,8 +456,21 @@ class Spider(Spider):
         if videos:
             self._cache[cache_key] = videos
             self._cache_time[cache_key] = time.time()
+            self._search_index.add_all(videos)
+        if complete:
+            self.month_cache.put(self.list_id, year, month, videos)
         
-        return videos
+        return self._unseen(videos, seen_ids)
+    
+    def _unseen(self, videos, seen_ids):
+        """跨月去重：返回 gid 未出现过的视频，并记入 seen_ids"""
+        unseen = []
+        for video in videos:
+            if video['vod_id'] in seen_ids:
+                continue
+            seen_ids.add(video['vod_id'])
+            unseen.append(video)
+        return unseen
     
     def _getAllCachedVideos(self):
         """获取所有缓存的视频"""
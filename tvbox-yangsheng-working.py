@@ -3,22 +3,23 @@
 # TVBox养生堂爬虫 - 根据实际API响应修复版
 
 import json
+import os
 import sys
 import re
 import time
 from urllib.parse import urljoin, quote, urlparse
-import requests
 from datetime import datetime, timezone, timedelta
 
 sys.path.append('..')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from base.spider import Spider
+from tvbox_http import HttpClient
 
 
 class Spider(Spider):
     def init(self, extend=""):
         """初始化"""
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        self.session = HttpClient(headers=self.headers)
         print("[养生堂] 爬虫初始化成功")
         pass
 
@@ -32,7 +33,7 @@ class Spider(Spider):
         pass
 
     def destroy(self):
-        pass
+        self.session.close()
 
     # ==================== 配置 ====================
     host = 'https://www.btime.com'
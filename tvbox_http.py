@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# TVBox 爬虫共用的 HTTP 客户端
+#
+# - AsyncClient: 基于 httpx 的异步客户端，连接池 + keep-alive，装了 h2 时走 HTTP/2，
+#   每个 host 独立并发上限，连接错误 / 429 / 5xx 按指数退避（带随机抖动）重试
+# - HttpClient: 给爬虫用的同步外观，接口与 requests.Session 的 get/post 一致
+#   （self.session.get(url, headers=..., timeout=...) 无需改动），另有 gather()
+#   一次并发发出多个请求，iter_bytes() 流式读取响应体、可随时中止下载。
+#   没有安装 httpx 时退化为带连接池的 requests.Session，
+#   重试、host 并发限制和 gather() 行为不变。
+# 需要与爬虫文件放在同一目录。
+
+import asyncio
+import importlib.util
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+DEFAULT_TIMEOUT = 10
+RETRY_STATUS = frozenset((429, 500, 502, 503, 504))
+
+
+def backoff_delay(attempt, base=0.3, cap=5.0):
+    """第 attempt 次重试前的等待秒数（指数退避 + full jitter）"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _host(url):
+    return urlsplit(url).netloc
+
+
+def _httpx_kwargs(kwargs):
+    """把 requests 风格的参数转换成 httpx 的"""
+    kwargs = dict(kwargs)
+    data = kwargs.get('data')
+    if isinstance(data, (bytes, str)):
+        kwargs['content'] = kwargs.pop('data')
+    if 'allow_redirects' in kwargs:
+        kwargs['follow_redirects'] = kwargs.pop('allow_redirects')
+    return kwargs
+
+
+class AsyncClient:
+    """带 host 并发限制和重试的 httpx.AsyncClient 包装"""
+
+    def __init__(self, headers=None, timeout=DEFAULT_TIMEOUT, retries=2,
+                 per_host=6, max_connections=64, http2=True):
+        if httpx is None:
+            raise RuntimeError('AsyncClient 需要安装 httpx')
+        self.retries = retries
+        self.per_host = per_host
+        self._host_limits = {}
+        self._client = httpx.AsyncClient(
+            headers=headers,
+            timeout=timeout,
+            http2=http2 and importlib.util.find_spec('h2') is not None,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections))
+
+    def _limit(self, url):
+        host = _host(url)
+        sem = self._host_limits.get(host)
+        if sem is None:
+            sem = self._host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+        return sem
+
+    async def request(self, method, url, retries=None, stream=False, **kwargs):
+        """stream=True 时只读到响应头，响应体由调用方读取并 aclose()"""
+        retries = self.retries if retries is None else retries
+        kwargs = _httpx_kwargs(kwargs)
+        for attempt in range(retries + 1):
+            try:
+                async with self._limit(url):
+                    response = await self._send(method, url, stream, kwargs)
+            except httpx.TransportError:
+                if attempt >= retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS or attempt >= retries:
+                    return response
+                await response.aclose()
+            await asyncio.sleep(backoff_delay(attempt))
+
+    async def _send(self, method, url, stream, kwargs):
+        if not stream:
+            return await self._client.request(method, url, **kwargs)
+        kwargs = dict(kwargs)
+        follow = kwargs.pop('follow_redirects', self._client.follow_redirects)
+        request = self._client.build_request(method, url, **kwargs)
+        return await self._client.send(request, stream=True, follow_redirects=follow)
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def gather(self, calls):
+        """并发执行 [(method, url, kwargs), ...]，按顺序返回响应或异常"""
+        return await asyncio.gather(
+            *(self.request(method, url, **kwargs) for method, url, kwargs in calls),
+            return_exceptions=True)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+class HttpClient:
+    """同步外观：可直接替换爬虫里的 requests.Session"""
+
+    def __init__(self, headers=None, timeout=DEFAULT_TIMEOUT, retries=2,
+                 per_host=6, max_connections=64, http2=True):
+        # 与 requests.Session 一样，每次请求都会带上这些头
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        self.retries = retries
+        self.per_host = per_host
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        self._host_limits = {}
+        self._loop = None
+        self._async = None
+        self._session = None
+
+        if httpx is not None:
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(target=self._loop.run_forever,
+                             name='tvbox-http', daemon=True).start()
+            self._async = AsyncClient(timeout=timeout, retries=retries,
+                                      per_host=per_host,
+                                      max_connections=max_connections,
+                                      http2=http2)
+        else:
+            import requests
+            from requests.adapters import HTTPAdapter
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max_connections)
+            self._session.mount('http://', adapter)
+            self._session.mount('https://', adapter)
+
+    def _merge(self, kwargs):
+        kwargs = dict(kwargs)
+        kwargs['headers'] = {**self.headers, **(kwargs.get('headers') or {})}
+        kwargs.setdefault('timeout', self.timeout)
+        return kwargs
+
+    def request(self, method, url, retries=None, **kwargs):
+        kwargs = self._merge(kwargs)
+        if self._async is not None:
+            future = asyncio.run_coroutine_threadsafe(
+                self._async.request(method, url, retries=retries, **kwargs), self._loop)
+            return future.result()
+        return self._request_sync(method, url, retries, kwargs)
+
+    def _request_sync(self, method, url, retries, kwargs):
+        import requests
+        retries = self.retries if retries is None else retries
+        host = _host(url)
+        with self._lock:
+            sem = self._host_limits.setdefault(host, threading.BoundedSemaphore(self.per_host))
+        for attempt in range(retries + 1):
+            try:
+                with sem:
+                    response = self._session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS or attempt >= retries:
+                    return response
+                response.close()
+            time.sleep(backoff_delay(attempt))
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def iter_bytes(self, url, chunk_size=16384, **kwargs):
+        """流式 GET，逐块产出响应体；调用方提前关闭生成器即断开下载。
+
+        建立连接、读到响应头之前与 get() 一样受 host 并发限制并按需重试。
+        """
+        kwargs = self._merge(kwargs)
+        if self._async is None:
+            kwargs['stream'] = True
+            with self._request_sync('GET', url, None, kwargs) as response:
+                response.raise_for_status()
+                yield from response.iter_content(chunk_size)
+            return
+
+        def run(coro):
+            return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+        response = run(self._async.request('GET', url, stream=True, **kwargs))
+        chunks = response.aiter_bytes(chunk_size)
+
+        async def next_chunk():
+            try:
+                return await chunks.__anext__()
+            except StopAsyncIteration:
+                return None
+
+        try:
+            response.raise_for_status()
+            while True:
+                chunk = run(next_chunk())
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            run(chunks.aclose())
+            run(response.aclose())
+
+    def gather(self, calls):
+        """并发执行 [(method, url, kwargs), ...]，按顺序返回响应或异常"""
+        calls = [(method, url, self._merge(kwargs)) for method, url, kwargs in calls]
+        if not calls:
+            return []
+        if self._async is not None:
+            future = asyncio.run_coroutine_threadsafe(self._async.gather(calls), self._loop)
+            return future.result()
+
+        def run(call):
+            method, url, kwargs = call
+            try:
+                return self._request_sync(method, url, None, kwargs)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=min(len(calls), self.max_connections)) as pool:
+            return list(pool.map(run, calls))
+
+    def close(self):
+        if self._async is not None:
+            asyncio.run_coroutine_threadsafe(self._async.aclose(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._async = None
+        if self._session is not None:
+            self._session.close()
+            self._session = None
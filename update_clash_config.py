@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""Fetch cll2.yml, pick the fastest node per region and inject clashrules.txt.
+
+Run by .github/workflows/update-clash-config.yml and configured through the
+same environment variables (SOURCE_URL, OUTPUT_FILE_NAME, RULES_FILE_NAME,
+PLACEHOLDER_PROXY, REGION_PLACEHOLDERS).
+
+PLACEHOLDER_PROXY is replaced by the fastest Singapore node. REGION_PLACEHOLDERS
+adds more placeholders, one "placeholder=REGION" per line or separated by ';',
+e.g. "🇭🇰 香港节点=HK; 🇯🇵 日本节点=JP". Only placeholders that occur in the
+rules file are tested.
+
+REGION_PREFIXES replaces clash_regions.PREFIXES per region when the provider
+renames its nodes, e.g. "SG=SG,SSG; HK=HKK,HKHEN; US=USS".
+"""
+
+import os
+import sys
+
+import requests
+import yaml
+
+from clash_core import ClashCore
+from clash_latency import LatencyTester, http_probe
+from clash_regions import RegionClassifier, parse_prefixes
+from config_patch import ConfigPatch
+from latency_history import LatencyHistory
+from proxy_dedupe import dedupe_config
+
+# --- Configuration ---
+# China Telecom Wuhan to Singapore test configuration
+PRIMARY_REGION = 'SG'  # Region of PLACEHOLDER_PROXY; keywords are in clash_regions.REGIONS
+
+# Test servers and URLs
+# Modified to use servers that are accessible from GitHub Actions but
+# represent connection quality from China Telecom Wuhan to Singapore
+TEST_URLS = [
+    "https://cp.cloudflare.com/generate_204",  # Cloudflare
+    "https://www.google.com/generate_204",     # Google
+    "https://connectivitycheck.gstatic.com/generate_204"  # Google connectivity check
+]
+TEST_TIMEOUT = 5  # seconds for latency test request
+TEST_SAMPLES = int(os.environ.get('TEST_SAMPLES', 3))  # max samples per node/URL pair
+TEST_WORKERS = int(os.environ.get('TEST_WORKERS', 32))  # concurrent probes
+HISTORY_FILE = os.environ.get('HISTORY_FILE', 'latency_history.csv')  # committed run history
+# --- End Configuration ---
+
+
+def fetch_content(url):
+    print(f"Fetching content from {url}...")
+    try:
+        response = requests.get(url, timeout=15)
+        response.raise_for_status() # Raise error for bad status codes
+        print("Fetch successful.")
+        return response.text, response.content
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching {url}: {e}")
+        sys.exit(1)
+
+
+def region_placeholders(placeholder_proxy, extra=''):
+    """{placeholder: region} from PLACEHOLDER_PROXY and REGION_PLACEHOLDERS"""
+    placeholders = {placeholder_proxy: PRIMARY_REGION}
+    for item in extra.replace(';', '\n').splitlines():
+        placeholder, sep, region = item.rpartition('=')
+        if sep and placeholder.strip():
+            placeholders[placeholder.strip()] = region.strip().upper()
+    return placeholders
+
+
+def find_region_nodes(proxies_data, groups_data, regions, classifier=None):
+    """{region: [proxy and group names]} for the wanted regions, in one pass"""
+    classifier = classifier or RegionClassifier()
+    names = [proxy['name'] for proxy in proxies_data] + [group['name'] for group in groups_data]
+    region_nodes = classifier.classify_all(names, regions)
+    for region, nodes in region_nodes.items():
+        print(f"Total {region} nodes found: {len(nodes)} ({', '.join(nodes)})")
+    return region_nodes
+
+
+def node_test_urls(nodes, groups_by_name):
+    """Map each node to its group's test URL if it has one, else TEST_URLS"""
+    node_urls = {}
+    for node in nodes:
+        group = groups_by_name.get(node)
+        if group is not None and 'url' in group:
+            node_urls[node] = [group['url']]
+            print(f"Using group's URL for {node}: {group['url']}")
+        else:
+            node_urls[node] = TEST_URLS
+    return node_urls
+
+
+def find_fastest_proxy(region, nodes, groups_by_name, probe=http_probe, history=None):
+    """Test the nodes of one region and return the fastest from China Telecom Wuhan.
+
+    With a LatencyHistory, the run is recorded and the choice is made on
+    long-term scores instead of this run alone.
+    """
+    print(f"\n--- Starting China Telecom Wuhan to {region} Latency Tests ---")
+
+    # All node x URL probes run concurrently, sampled over several rounds
+    tester = LatencyTester(probe=probe, timeout=TEST_TIMEOUT, samples=TEST_SAMPLES,
+                           max_workers=TEST_WORKERS)
+    ranking = tester.run(node_test_urls(nodes, groups_by_name))
+
+    print("\n--- Latency Tests Finished ---")
+    for stats in ranking:
+        if stats.alive:
+            print(f"{stats.node}: median {stats.median:.2f} ms, p90 {stats.p90:.2f} ms, "
+                  f"loss {stats.loss:.0%} ({stats.attempts} samples)")
+        else:
+            print(f"All tests failed for {stats.node}")
+
+    if not ranking or not ranking[0].alive:
+        print("Error: No valid latency results obtained.")
+        return nodes[0] if nodes else None  # Return first node as fallback
+
+    fastest = ranking[0]
+    print(f"\nFastest {region} node from China Telecom Wuhan: {fastest.node} "
+          f"(median {fastest.median:.2f} ms)")
+    if history is None:
+        return fastest.node
+    history.record(ranking)
+    chosen = history.select([stats.node for stats in ranking if stats.alive], pool=nodes)
+    print(f"Selected {chosen} on latency history")
+    return chosen
+
+
+def find_fastest_proxies(region_nodes, groups_data, probe=http_probe, history=None):
+    """{region: fastest node} for every region that has nodes"""
+    groups_by_name = {group['name']: group for group in groups_data}
+    fastest = {}
+    for region, nodes in region_nodes.items():
+        if nodes:
+            fastest[region] = find_fastest_proxy(region, nodes, groups_by_name, probe, history)
+    return fastest
+
+
+def read_rules(rules_file_name):
+    print(f"Reading custom rules from {rules_file_name}...")
+    try:
+        with open(rules_file_name, 'r', encoding='utf-8') as f:
+            custom_rules_lines = f.readlines()
+        print(f"Read {len(custom_rules_lines)} lines from {rules_file_name}.")
+        return custom_rules_lines
+    except FileNotFoundError:
+        print(f"Error: Rules file '{rules_file_name}' not found in repository.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error reading rules file: {e}")
+        sys.exit(1)
+
+
+def main():
+    source_url = os.environ['SOURCE_URL']
+    output_file_name = os.environ['OUTPUT_FILE_NAME']
+    rules_file_name = os.environ['RULES_FILE_NAME']
+    placeholder_proxy = os.environ['PLACEHOLDER_PROXY']
+
+    # 1. Fetch the original cll2.yml
+    original_text, original_bytes = fetch_content(source_url)
+    if not original_text:
+        sys.exit(1)
+
+    # 2. Parse YAML to get proxy/group info for testing
+    try:
+        config_data = yaml.safe_load(original_bytes)
+    except yaml.YAMLError as e:
+        print(f"Error parsing YAML: {e}")
+        sys.exit(1)
+
+    # Same endpoint under several names: test it once
+    config_data = dedupe_config(config_data)
+    proxies_data = config_data.get('proxies', [])
+    groups_data = config_data.get('proxy-groups', [])
+
+    # 3. Read custom rules from the local file, and see which region
+    #    placeholders they use
+    custom_rules_lines = read_rules(rules_file_name)
+    rules_text = ''.join(custom_rules_lines)
+    placeholders = {placeholder: region for placeholder, region in
+                    region_placeholders(placeholder_proxy,
+                                        os.environ.get('REGION_PLACEHOLDERS', '')).items()
+                    if placeholder == placeholder_proxy or placeholder in rules_text}
+
+    classifier = RegionClassifier(prefixes=parse_prefixes(os.environ.get('REGION_PREFIXES', '')))
+    region_nodes = find_region_nodes(proxies_data, groups_data,
+                                     dict.fromkeys(placeholders.values()), classifier)
+    if not region_nodes.get(PRIMARY_REGION):
+        print(f"No {PRIMARY_REGION} nodes found in the configuration. Exiting.")
+        sys.exit(1)
+
+    # 4. Find the fastest proxy per region, measured through each proxy by a
+    #    local clash core when one is installed, and chosen on the latency
+    #    history of earlier runs. Direct probes from the runner measure the
+    #    runner's own network, so they are neither recorded nor scored.
+    history = None
+    if ClashCore.available():
+        history = LatencyHistory(HISTORY_FILE)
+        try:
+            with ClashCore(config_data) as core:
+                fastest = find_fastest_proxies(region_nodes, groups_data, core.probe, history)
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    else:
+        print("Warning: no clash core found (set CLASH_CORE_BIN); "
+              "falling back to direct latency tests from this runner.")
+        fastest = find_fastest_proxies(region_nodes, groups_data)
+
+    if not fastest.get(PRIMARY_REGION):
+        print(f"Could not determine fastest {PRIMARY_REGION} proxy. Exiting.")
+        sys.exit(1)
+
+    # 5. Put the custom rules in front of the config's rules, with the
+    #    placeholder replaced, in one pass over the original document
+    patch = ConfigPatch()
+    patch.insert_rules(custom_rules_lines, 'top')
+    for placeholder, region in placeholders.items():
+        node = fastest.get(region)
+        if node is None:
+            node = fastest[PRIMARY_REGION]
+            print(f"Warning: no {region} node for '{placeholder}', using {node} instead.")
+        patch.substitute(placeholder, node)
+        print(f"Replaced '{placeholder}' with '{node}' in custom rules.")
+    try:
+        final_content = patch.apply(original_bytes)
+    except (yaml.YAMLError, ValueError) as e:
+        print(f"Error patching configuration: {e}")
+        sys.exit(1)
+    print(f"{len(patch.ruleset)} rules after merging; dropped {len(patch.ruleset.shadowed)} "
+          "duplicate or shadowed rules.")
+    for rule, by in patch.ruleset.conflicts():
+        print(f"  '{rule.text}' never matches: '{by.text}' comes first")
+
+    # 6. Save the final configuration
+    print(f"Saving updated configuration to {output_file_name}...")
+    try:
+        with open(output_file_name, 'w', encoding='utf-8') as f:
+            f.write(final_content)
+        print("Save successful.")
+    except Exception as e:
+        print(f"Error writing output file: {e}")
+        sys.exit(1)
+    if history is not None:
+        history.save()
+        print(f"Latency history saved to {HISTORY_FILE}.")
+
+    print("\nScript finished successfully.")
+
+
+if __name__ == '__main__':
+    main()